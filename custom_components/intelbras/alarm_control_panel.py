@@ -20,7 +20,7 @@ from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .config_flow import CONF_REQUIRE_CODE
 from .const import DOMAIN
-from .coordinator import AMTCoordinator
+from .coordinator import CONTEXT_ALARM, AMTCoordinator
 from .protocol import OpenZoneError, WrongPasswordError
 
 PARALLEL_UPDATES = 0
@@ -39,7 +39,7 @@ class AMTAlarm(CoordinatorEntity[AMTCoordinator], AlarmControlPanelEntity):  # p
     def __init__(
         self, coordinator: AMTCoordinator, config_entry: ConfigEntry[AMTCoordinator]
     ) -> None:
-        super().__init__(coordinator)
+        super().__init__(coordinator, context=CONTEXT_ALARM)
         self._config_entry = config_entry
         self._attr_unique_id = format_mac(coordinator.client.mac.hex(":"))
         self._attr_has_entity_name = True
@@ -50,7 +50,7 @@ class AMTAlarm(CoordinatorEntity[AMTCoordinator], AlarmControlPanelEntity):  # p
             name=coordinator.data["messages"]["name"],
             manufacturer="Intelbras",
             model="AN-24 Net",
-            sw_version=str(coordinator.data["status"]["version"]),
+            sw_version=str(coordinator.data["status"].version),
         )
         self._apply_state()
 
@@ -60,7 +60,7 @@ class AMTAlarm(CoordinatorEntity[AMTCoordinator], AlarmControlPanelEntity):  # p
         self._attr_code_arm_required = require_code
 
         status = self.coordinator.data["status"]
-        stay = any(zone["enabled"] and zone["stay"] for zone in status["zones"])
+        stay = bool(status.enabled_mask & status.stay_mask)
         features = (
             AlarmControlPanelEntityFeature.ARM_AWAY
             | AlarmControlPanelEntityFeature.TRIGGER
@@ -69,11 +69,11 @@ class AMTAlarm(CoordinatorEntity[AMTCoordinator], AlarmControlPanelEntity):  # p
             features |= AlarmControlPanelEntityFeature.ARM_HOME
         self._attr_supported_features = features
 
-        if status["sirenTriggered"]:
+        if status.siren_triggered:
             self._attr_alarm_state = AlarmControlPanelState.TRIGGERED
-        elif status["partitionAArmed"]:
+        elif status.partition_a_armed:
             self._attr_alarm_state = AlarmControlPanelState.ARMED_AWAY
-        elif status["partitionBArmed"]:
+        elif status.partition_b_armed:
             self._attr_alarm_state = AlarmControlPanelState.ARMED_HOME
         else:
             self._attr_alarm_state = AlarmControlPanelState.DISARMED
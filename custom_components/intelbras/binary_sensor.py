@@ -10,7 +10,8 @@ from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import DOMAIN
-from .coordinator import AMTCoordinator
+from .coordinator import CONTEXT_ENERGY, AMTCoordinator, zone_context
+from .protocol import mask_to_zones
 
 PARALLEL_UPDATES = 0
 
@@ -34,9 +35,10 @@ async def async_setup_entry(
 
     def _check_device() -> None:
         current_devices = {
-            i
-            for i, zone in enumerate(config_entry.runtime_data.data["status"]["zones"])
-            if zone["enabled"]
+            zone - 1
+            for zone in mask_to_zones(
+                config_entry.runtime_data.data["status"].enabled_mask
+            )
         }
         new_devices = current_devices - enabled_zones
         enabled_zones.update(new_devices)
@@ -54,7 +56,7 @@ async def async_setup_entry(
 
 class AMTEnergySensor(CoordinatorEntity[AMTCoordinator], BinarySensorEntity):  # pyright: ignore[reportIncompatibleVariableOverride]
     def __init__(self, coordinator: AMTCoordinator) -> None:
-        super().__init__(coordinator)
+        super().__init__(coordinator, context=CONTEXT_ENERGY)
         self._attr_unique_id = format_mac(coordinator.client.mac.hex(":")) + "_energy"
         self._attr_device_info = DeviceInfo(
             identifiers={(DOMAIN, format_mac(coordinator.client.mac.hex(":")))},
@@ -66,12 +68,12 @@ class AMTEnergySensor(CoordinatorEntity[AMTCoordinator], BinarySensorEntity):  #
         self._attr_entity_category = EntityCategory.DIAGNOSTIC
         self._attr_has_entity_name = True
         self._attr_translation_key = "energy"
-        self._attr_is_on = not coordinator.data["status"]["no_energy"]
+        self._attr_is_on = not coordinator.data["status"].no_energy
 
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        self._attr_is_on = not self.coordinator.data["status"]["no_energy"]
+        self._attr_is_on = not self.coordinator.data["status"].no_energy
         self.async_write_ha_state()
 
 
@@ -84,7 +86,7 @@ class AMTSensor(CoordinatorEntity[AMTCoordinator], BinarySensorEntity):  # pyrig
         device_class: BinarySensorDeviceClass | None,
         category: EntityCategory | None,
     ) -> None:
-        super().__init__(coordinator, context=index)
+        super().__init__(coordinator, context=zone_context(index, property))
         mac = format_mac(coordinator.client.mac.hex(":"))
         zone = coordinator.data["messages"]["zones"][index] or f"Zone {index + 1:02}"
         self._index = index
@@ -102,14 +104,14 @@ class AMTSensor(CoordinatorEntity[AMTCoordinator], BinarySensorEntity):  # pyrig
             self._attr_name = None
         self._attr_device_class = device_class
         self._attr_entity_category = category
-        zone_state = coordinator.data["status"]["zones"][index]
+        zone_state = coordinator.data["status"].zone(index)
         self._attr_is_on = zone_state[property]
-        self._attr_available = zone_state["enabled"]
+        self._attr_available = zone_state.enabled
 
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        state = self.coordinator.data["status"]["zones"][self._index]
+        state = self.coordinator.data["status"].zone(self._index)
         self._attr_is_on = state[self._property]
-        self._attr_available = state["enabled"]
+        self._attr_available = state.enabled
         self.async_write_ha_state()
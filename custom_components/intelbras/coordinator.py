@@ -20,17 +20,65 @@ from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, Upda
 from .const import DOMAIN
 from .protocol import (
     CID_EVENT_TYPES,
+    PUSH_COMMAND,
     SYNC_NAME,
     SYNC_ZONE,
+    ZONE_FIELDS,
     ClientAMT,
+    Event,
     EventRecord,
+    EventType,
     Status,
+    StatusDiff,
     WrongPasswordError,
+    diff_status,
+    mask_to_zones,
     parse_push_event,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
+# Listener contexts: entities register with the value they display so that
+# updates only wake the entities whose backing bits changed.
+CONTEXT_ALARM = "alarm"
+CONTEXT_PGM = "pgm"
+CONTEXT_ENERGY = "no_energy"
+CONTEXT_UPSTREAM_PUSH = "upstream_push"
+
+_ALARM_FLAGS = {"partitionAArmed", "partitionBArmed", "sirenTriggered"}
+
+POLL_INTERVAL = timedelta(seconds=5)
+# Once the proxy pushes status changes, polling only checks the connection.
+PROXY_POLL_INTERVAL = timedelta(seconds=60)
+
+
+def zone_context(index: int, prop: str) -> tuple[int, str]:
+    """Listener context for a zone property (0-based index)."""
+    return index, prop
+
+
+def diff_contexts(diff: StatusDiff) -> set[object]:
+    """Return the listener contexts affected by a status change."""
+    changed: set[object] = set()
+    zones = diff.zones
+    for prop, mask in zones.items():
+        for zone in mask_to_zones(mask):
+            if prop == "enabled":
+                # Availability of every entity of the zone follows "enabled".
+                changed.update(zone_context(zone - 1, p) for p in ZONE_FIELDS)
+            else:
+                changed.add(zone_context(zone - 1, prop))
+    flags = diff.flags
+    if flags & _ALARM_FLAGS or "stay" in zones or "enabled" in zones:
+        changed.add(CONTEXT_ALARM)
+    if "pgm" in flags:
+        changed.add(CONTEXT_PGM)
+    if "no_energy" in flags:
+        changed.add(CONTEXT_ENERGY)
+    if "upstream_push" in flags:
+        changed.add(CONTEXT_UPSTREAM_PUSH)
+    return changed
+
 
 class Messages(TypedDict):
     name: str
@@ -52,18 +100,38 @@ class AMTCoordinator(DataUpdateCoordinator[Data]):
             hass,
             _LOGGER,
             name="Alarme AMT",
-            update_interval=timedelta(seconds=5),
+            update_interval=POLL_INTERVAL,
         )
         self.client = client
         self.__messages: Messages = {
             "name": "AN24Net",
             "zones": [f"Zone {index + 1:02}" for index in range(24)],
         }
-        self.__events: list[EventRecord] = []
+        self.__events: list[Event] = []
         self.__last_failed = False
         self.__messages_last_sync = 0.0
         self.__low_battery_zones: set[int] | None = None
-        self.client.on_push = self._handle_push
+        self.__status: Status | None = None
+        self.__changed: set[object] | None = None
+        self.client.subscribe(PUSH_COMMAND, self._handle_push)
+        self.client.watch_status(self._handle_status)
+        self.client.watch_connection(self._handle_connect)
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update the listeners affected by the last change.
+
+        Falls back to updating every listener when the change is unknown
+        (first refresh, failures, recovery). Listeners registered without a
+        context are always called.
+        """
+        changed, self.__changed = self.__changed, None
+        if changed is None:
+            super().async_update_listeners()
+            return
+        for update_callback, context in list(self._listeners.values()):
+            if context is None or context in changed:
+                update_callback()
 
     @callback
     def _handle_push(self, data: bytes) -> None:
@@ -75,12 +143,35 @@ class AMTCoordinator(DataUpdateCoordinator[Data]):
         except Exception:
             _LOGGER.warning("Failed to parse push event: %s", data.hex(":"))
 
+    @callback
+    def _handle_connect(self) -> None:
+        """Poll until the proxy confirms the renewed status subscription."""
+        if self.update_interval != POLL_INTERVAL:
+            self.update_interval = POLL_INTERVAL
+            self.hass.async_create_task(self.async_request_refresh())
+
+    @callback
+    def _handle_status(self, status: Status) -> None:
+        """Handle a status change pushed by the proxy."""
+        # The subscription is confirmed by the first status it sends.
+        self.update_interval = PROXY_POLL_INTERVAL
+        if self.data is None or self.__last_failed:
+            return
+        changed = diff_contexts(diff_status(self.data["status"].raw, status.raw))
+        self.__status = status
+        self._reconcile_low_battery(status)
+        if not changed:
+            return
+        self.__changed = changed
+        self.async_set_updated_data({**self.data, "status": status})
+
     @callback
     def _apply_push_to_status(self, event: EventRecord) -> None:
         """Update coordinator status from a push event."""
         status = self.data["status"]
         event_type = CID_EVENT_TYPES.get((event["qualifier"], event["code"]))
         zone = event["zone"]
+        previous = status.raw
 
         if event_type == "arm":
             status["partitionAArmed"] = True
@@ -89,18 +180,18 @@ class AMTCoordinator(DataUpdateCoordinator[Data]):
             status["partitionBArmed"] = False
             status["sirenTriggered"] = False
         elif event_type == "burglary" and 1 <= zone <= 24:
-            status["zones"][zone - 1]["violated"] = True
+            status.set_zone(zone - 1, "violated", True)
             status["sirenTriggered"] = True
         elif event_type == "burglary_restore" and 1 <= zone <= 24:
-            status["zones"][zone - 1]["violated"] = False
+            status.set_zone(zone - 1, "violated", False)
         elif event_type == "power_failure":
             status["no_energy"] = True
         elif event_type == "power_restore":
             status["no_energy"] = False
         elif event_type == "low_battery" and 1 <= zone <= 24:
-            status["zones"][zone - 1]["low_battery"] = True
+            status.set_zone(zone - 1, "low_battery", True)
         elif event_type == "battery_restore" and 1 <= zone <= 24:
-            status["zones"][zone - 1]["low_battery"] = False
+            status.set_zone(zone - 1, "low_battery", False)
         elif event_type == "pgm_activate":
             status["pgm"] = True
         elif event_type == "pgm_deactivate":
@@ -108,6 +199,10 @@ class AMTCoordinator(DataUpdateCoordinator[Data]):
         else:
             return
 
+        changed = diff_contexts(diff_status(previous, status.raw))
+        if not changed:
+            return
+        self.__changed = changed
         self.async_set_updated_data(self.data)
 
     def _zone_name(self, zone: int) -> str:
@@ -172,30 +267,32 @@ class AMTCoordinator(DataUpdateCoordinator[Data]):
         low_battery is reconciled directly from the live status bitmask in
         _async_update_data, so no ring-buffer scan is needed for it.
         """
-        rf_status: dict[int, str] = {}
-        system_battery: str | None = None
+        rf_status: dict[int, EventType] = {}
+        system_battery: EventType | None = None
 
         for event in self.__events:  # newest first
-            zone = event["zone"]
-            event_type = CID_EVENT_TYPES.get((event["qualifier"], event["code"]))
+            zone = event.zone
+            event_type = event.type
             if (
-                event_type in ("system_battery_low", "system_battery_restore")
+                event_type
+                in (EventType.SYSTEM_BATTERY_LOW, EventType.SYSTEM_BATTERY_RESTORE)
                 and system_battery is None
             ):
                 system_battery = event_type
             if zone == 0:
                 continue
             if (
-                event_type in ("rf_supervision_failure", "rf_supervision_restore")
+                event_type
+                in (EventType.RF_SUPERVISION_FAILURE, EventType.RF_SUPERVISION_RESTORE)
                 and zone not in rf_status
             ):
                 rf_status[zone] = event_type
 
         for zone, event_type in rf_status.items():
-            if event_type == "rf_supervision_failure" and zone in enabled_zones:
+            if event_type == EventType.RF_SUPERVISION_FAILURE and zone in enabled_zones:
                 self._create_zone_issue("rf_supervision_failure", zone)
 
-        if system_battery == "system_battery_low":
+        if system_battery == EventType.SYSTEM_BATTERY_LOW:
             async_create_issue(
                 self.hass,
                 DOMAIN,
@@ -208,12 +305,13 @@ class AMTCoordinator(DataUpdateCoordinator[Data]):
     async def _sync_messages(self) -> None:
         """Fetch device name and zone labels from the panel."""
         try:
-            [name] = await self.client.sync(SYNC_NAME)
-
-            zones: list[str] = []
-            for indexes in batched(range(24), n=8):
-                data = await self.client.sync(SYNC_ZONE, bytes(indexes))
-                zones.extend(data)
+            zone_requests = [
+                (SYNC_ZONE, bytes(indexes)) for indexes in batched(range(24), n=8)
+            ]
+            [name], *zone_batches = await self.client.sync_many(
+                [(SYNC_NAME, bytes([0x00])), *zone_requests]
+            )
+            zones = [zone for batch in zone_batches for zone in batch]
 
             self.__messages = {
                 "name": name,
@@ -229,9 +327,7 @@ class AMTCoordinator(DataUpdateCoordinator[Data]):
             self.__events = await self.client.fetch_events()
             if status is None:
                 status = await self.client.status()
-            enabled_zones = {
-                i + 1 for i, z in enumerate(status["zones"]) if z["enabled"]
-            }
+            enabled_zones = set(mask_to_zones(status.enabled_mask))
             self._scan_unresolved_issues(enabled_zones)
         except Exception:
             _LOGGER.warning("Failed to fetch event log")
@@ -250,6 +346,10 @@ class AMTCoordinator(DataUpdateCoordinator[Data]):
             self.__last_failed = True
             raise UpdateFailed("Erro ao atualizar os dados") from ex
 
+        if self.__status is not None and not self.__last_failed:
+            self.__changed = diff_contexts(diff_status(self.__status.raw, data.raw))
+        self.__status = data
+
         if self.__last_failed:
             self.__last_failed = False
             _LOGGER.info("Connection recovered, re-fetching events and messages")
@@ -258,11 +358,21 @@ class AMTCoordinator(DataUpdateCoordinator[Data]):
         elif monotonic() - self.__messages_last_sync > 1800:
             await self._sync_messages()
 
-        current_low_battery = {
-            i + 1
-            for i, zone in enumerate(data["zones"])
-            if zone["enabled"] and zone["low_battery"]
+        self._reconcile_low_battery(data)
+        self.update_interval = (
+            PROXY_POLL_INTERVAL if self.client.status_watched else POLL_INTERVAL
+        )
+
+        return {
+            "status": data,
+            "messages": self.__messages,
         }
+
+    def _reconcile_low_battery(self, data: Status) -> None:
+        """Create or delete low battery issues from the status bitmask."""
+        current_low_battery = set(
+            mask_to_zones(data.low_battery_mask & data.enabled_mask)
+        )
         if self.__low_battery_zones is None:
             for zone_num in range(1, 25):
                 if zone_num not in current_low_battery:
@@ -275,8 +385,3 @@ class AMTCoordinator(DataUpdateCoordinator[Data]):
             for zone_num in self.__low_battery_zones - current_low_battery:
                 async_delete_issue(self.hass, DOMAIN, f"low_battery_{zone_num}")
         self.__low_battery_zones = current_low_battery
-
-        return {
-            "status": data,
-            "messages": self.__messages,
-        }
@@ -17,6 +17,6 @@ async def async_get_config_entry_diagnostics(
     """Return diagnostics for a config entry."""
     coordinator = entry.runtime_data
     return {
-        "status": coordinator.data["status"],
+        "status": coordinator.data["status"].as_dict(),
         "messages": coordinator.data["messages"],
     }
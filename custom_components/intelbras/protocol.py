@@ -1,10 +1,13 @@
 import asyncio
 import contextlib
-from collections.abc import Callable
-from enum import Enum
-from functools import reduce
-from operator import xor
-from typing import TypedDict
+import struct
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from enum import Enum, StrEnum
+from functools import cache
+from itertools import count
+from typing import Any, NamedTuple, TypedDict, cast
 
 START_COMMAND = 0x94
 MAC_COMMAND = 0xC4
@@ -21,6 +24,21 @@ PROXY_COMMAND = 0xF2
 
 # Proxy subcommands
 PROXY_UPSTREAM_PUSH = 0x01
+# Client → proxy: subscribe with STATUS MY_HOME data. Proxy → client:
+# status updates, see encode_status_update.
+PROXY_STATUS = 0x02
+# Client → proxy: query the pushes the proxy stored, see history_request.
+# Proxy → client: a page of them, see encode_history.
+PROXY_HISTORY = 0x03
+# Several MY_HOME requests, and their responses, see encode_batch.
+PROXY_BATCH = 0x04
+# Proxy → client: [PROXY_TIMEOUT] [command], in place of the response to a
+# request the panel didn't answer.
+PROXY_TIMEOUT = 0x05
+
+# Status update kinds
+STATUS_FULL = 0x00
+STATUS_DELTA = 0x01
 
 # MY_HOME framing
 DELIMITER = 0x21
@@ -46,6 +64,9 @@ CONN_SUCCESS = 0xE6
 CONN_NOT_FOUND = 0xE4
 CONN_BUSY = 0xE8
 CONN_PROXY = 0x0F
+# Added to CONN_PROXY by a proxy that answers every request in order and
+# sends PROXY_TIMEOUT for those the panel doesn't answer.
+CONN_PIPELINE = 0x10
 
 # MY_HOME error responses
 ERR_WRONG_PASSWORD = 0xE1
@@ -110,22 +131,19 @@ def _sync_type_name(t: int) -> str:
 
 def status_to_str(s: "Status") -> str:
     parts: list[str] = []
-    if s["sirenTriggered"]:
+    if s.siren_triggered:
         parts.append("triggered")
-    elif s["partitionAArmed"]:
+    elif s.partition_a_armed:
         parts.append("armed_away")
-    elif s["partitionBArmed"]:
+    elif s.partition_b_armed:
         parts.append("armed_stay")
     else:
         parts.append("disarmed")
-    open_z = [i + 1 for i, z in enumerate(s["zones"]) if z["enabled"] and z["open"]]
-    violated_z = [
-        i + 1 for i, z in enumerate(s["zones"]) if z["enabled"] and z["violated"]
-    ]
-    stay_z = [i + 1 for i, z in enumerate(s["zones"]) if z["enabled"] and z["stay"]]
-    annulled_z = [
-        i + 1 for i, z in enumerate(s["zones"]) if z["enabled"] and z["annulled"]
-    ]
+    enabled = s.enabled_mask
+    open_z = mask_to_zones(s.open_mask & enabled)
+    violated_z = mask_to_zones(s.violated_mask & enabled)
+    stay_z = mask_to_zones(s.stay_mask & enabled)
+    annulled_z = mask_to_zones(s.annulled_mask & enabled)
     if open_z:
         parts.append(f"open={_compact_ranges(open_z)}")
     if violated_z:
@@ -134,9 +152,9 @@ def status_to_str(s: "Status") -> str:
         parts.append(f"stay={_compact_ranges(stay_z)}")
     if annulled_z:
         parts.append(f"annulled={_compact_ranges(annulled_z)}")
-    if s["pgm"]:
+    if s.pgm:
         parts.append("pgm=on")
-    if s["no_energy"]:
+    if s.no_energy:
         parts.append("NO_ENERGY")
     return " ".join(parts)
 
@@ -257,7 +275,8 @@ def command_to_str(command: int, data: bytes) -> str:
             return "TIME"
         if len(data) == 1:
             return f"TIME: tz={-data[0]}"
-        return f"TIME: 20{bcd(data[0]):02d}-{bcd(data[1]):02d}-{bcd(data[2]):02d} {bcd(data[4]):02d}:{bcd(data[5]):02d}:{bcd(data[6]):02d}"
+        year, month, day, _, hour, minute, second = bcd_bytes(data[:7])
+        return f"TIME: 20{year:02d}-{month:02d}-{day:02d} {hour:02d}:{minute:02d}:{second:02d}"
     if command == PING_COMMAND:
         return "PING"
     if command == PUSH_COMMAND:
@@ -277,13 +296,37 @@ def command_to_str(command: int, data: bytes) -> str:
         if data[0] == PROXY_UPSTREAM_PUSH:
             state = "enabled" if data[1] else "disabled"
             return f"PROXY: upstream push {state}"
+        if data[0] == PROXY_STATUS and len(data) > 1:
+            if data[1] == STATUS_FULL:
+                return f"PROXY: status {status_to_str(parse_status(data[2:]))}"
+            if data[1] == STATUS_DELTA:
+                return f"PROXY: status delta {data[2:].hex(':')}"
+            return "PROXY: status subscribe"
+        if data[0] == PROXY_HISTORY and len(data) == HISTORY_REQUEST.size:
+            _, after, start, end = HISTORY_REQUEST.unpack(data)
+            return f"PROXY: history after {after} from {start} to {end or '-'}"
+        if data[0] == PROXY_HISTORY and len(data) == 1:
+            return "PROXY: history rejected"
+        if data[0] == PROXY_HISTORY and len(data) >= HISTORY_HEADER.size:
+            more, last, pushes = parse_history(data)
+            return f"PROXY: history {len(pushes)} pushes up to {last}" + (
+                ", more" if more else ""
+            )
+        if data[0] == PROXY_BATCH:
+            with contextlib.suppress(ValueError):
+                batch, total, items = parse_batch(data)
+                return f"PROXY: batch {batch} {len(items)} of {total}"
+        if data[0] == PROXY_TIMEOUT and len(data) > 1:
+            return f"PROXY: timeout 0x{data[1]:02x}"
         return f"PROXY: 0x{data[0]:02x} {data[1:].hex(':')}"
     return f"0x{command:02x}" + (f": {data.hex(':')}" if data else "")
 
 
 def create_command(command: int, data: bytes = b"") -> bytes:
-    data = bytes([len(data) + 1, command, *data])
-    return bytes([*data, checksum(data)])
+    frame = bytearray((len(data) + 1, command))
+    frame += data
+    frame.append(checksum(frame))
+    return bytes(frame)
 
 
 def connection_data(mac: bytes) -> bytes:
@@ -304,8 +347,14 @@ def connection_data(mac: bytes) -> bytes:
     )
 
 
+@cache
+def xor_table(key: int) -> bytes:
+    """bytes.translate table that XORs every byte with `key`."""
+    return bytes(x ^ key for x in range(256))
+
+
 def encrypt(data: bytes, key: int) -> bytes:
-    return bytes([x ^ key for x in data])
+    return data.translate(xor_table(key))
 
 
 class BatteryStatus(TypedDict):
@@ -325,55 +374,543 @@ class ZoneStatus(TypedDict):
     low_battery: bool
 
 
-class Status(TypedDict):
-    version: int
-    partitionedPanel: bool
-    partitionAArmed: bool
-    partitionBArmed: bool
-    sirenTriggered: bool
-    battery: BatteryStatus
-    zones: list[ZoneStatus]
-    pgm: bool
-    no_energy: bool
-    upstream_push: bool | None
+# Zone bitmasks in the STATUS payload: property -> offset of the 3-byte mask.
+ZONE_FIELDS: dict[str, int] = {
+    "open": 0,
+    "violated": 6,
+    "annulled": 12,
+    "stay": 50,
+    "enabled": 47,
+    "low_battery": 38,
+}
+
+# Panel flags in the STATUS payload: key -> (byte offset, bit).
+STATUS_FLAGS: dict[str, tuple[int, int]] = {
+    "partitionedPanel": (20, 0),
+    "partitionAArmed": (21, 0),
+    "partitionBArmed": (21, 1),
+    "sirenTriggered": (37, 2),
+    "pgm": (37, 6),
+    "no_energy": (28, 0),
+}
+
+BATTERY_OFFSET = 30
+VERSION_OFFSET = 19
+UPSTREAM_PUSH_OFFSET = 54
+
+_STATUS_KEYS = (
+    "version",
+    "partitionedPanel",
+    "partitionAArmed",
+    "partitionBArmed",
+    "sirenTriggered",
+    "battery",
+    "zones",
+    "pgm",
+    "no_energy",
+    "upstream_push",
+)
+
+
+def mask_to_zones(mask: int) -> list[int]:
+    """Return the 1-based zone numbers set in a 24-bit zone mask."""
+    zones: list[int] = []
+    while mask:
+        low = mask & -mask
+        zones.append(low.bit_length())
+        mask ^= low
+    return zones
+
+
+class ZoneView(Mapping[str, bool]):
+    """Read/write view of one zone of a Status."""
+
+    __slots__ = ("_status", "index")
+
+    def __init__(self, status: "Status", index: int) -> None:
+        self._status = status
+        self.index = index
+
+    @property
+    def open(self) -> bool:
+        return bool(self._status.open_mask >> self.index & 1)
+
+    @property
+    def violated(self) -> bool:
+        return bool(self._status.violated_mask >> self.index & 1)
+
+    @property
+    def annulled(self) -> bool:
+        return bool(self._status.annulled_mask >> self.index & 1)
+
+    @property
+    def stay(self) -> bool:
+        return bool(self._status.stay_mask >> self.index & 1)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._status.enabled_mask >> self.index & 1)
+
+    @property
+    def low_battery(self) -> bool:
+        return bool(self._status.low_battery_mask >> self.index & 1)
+
+    def __getitem__(self, key: str) -> bool:
+        return bool(self._status.zone_mask(key) >> self.index & 1)
+
+    def __setitem__(self, key: str, value: bool) -> None:
+        self._status.set_zone(self.index, key, value)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(ZONE_FIELDS)
+
+    def __len__(self) -> int:
+        return len(ZONE_FIELDS)
+
+    def __repr__(self) -> str:
+        return f"ZoneView({self.index + 1}, {dict(self)})"
+
+
+class Status(Mapping[str, Any]):
+    """Panel status backed by the raw STATUS payload.
+
+    Zone fields are kept as 24-bit masks (bit N = zone N+1) and panel flags
+    are read from the payload on access. Mapping-style access follows the
+    layout of the former Status dict, so status["zones"][i]["open"] and
+    status["pgm"] keep working.
+    """
+
+    __slots__ = (
+        "_raw",
+        "_open",
+        "_violated",
+        "_annulled",
+        "_stay",
+        "_enabled",
+        "_low_battery",
+        "upstream_push",
+    )
+
+    def __init__(self, data: bytes, upstream_push: bool | None = None) -> None:
+        self._raw = bytearray(data)
+        self._open = int.from_bytes(data[0:3], byteorder="little")
+        self._violated = int.from_bytes(data[6:9], byteorder="little")
+        self._annulled = int.from_bytes(data[12:15], byteorder="little")
+        self._stay = int.from_bytes(data[50:53], byteorder="little")
+        self._enabled = int.from_bytes(data[47:50], byteorder="little")
+        self._low_battery = int.from_bytes(data[38:41], byteorder="little")
+        self.upstream_push = upstream_push
+
+    @property
+    def raw(self) -> bytes:
+        """STATUS payload, including changes made through the setters."""
+        return bytes(self._raw)
+
+    @property
+    def open_mask(self) -> int:
+        return self._open
+
+    @property
+    def violated_mask(self) -> int:
+        return self._violated
+
+    @property
+    def annulled_mask(self) -> int:
+        return self._annulled
+
+    @property
+    def stay_mask(self) -> int:
+        return self._stay
+
+    @property
+    def enabled_mask(self) -> int:
+        return self._enabled
+
+    @property
+    def low_battery_mask(self) -> int:
+        return self._low_battery
+
+    @property
+    def version(self) -> int:
+        return self._raw[VERSION_OFFSET]
+
+    @property
+    def partitioned_panel(self) -> bool:
+        return self.flag("partitionedPanel")
+
+    @property
+    def partition_a_armed(self) -> bool:
+        return self.flag("partitionAArmed")
+
+    @property
+    def partition_b_armed(self) -> bool:
+        return self.flag("partitionBArmed")
+
+    @property
+    def siren_triggered(self) -> bool:
+        return self.flag("sirenTriggered")
+
+    @property
+    def pgm(self) -> bool:
+        return self.flag("pgm")
+
+    @property
+    def no_energy(self) -> bool:
+        return self.flag("no_energy")
+
+    @property
+    def battery(self) -> BatteryStatus:
+        value = self._raw[BATTERY_OFFSET]
+        return {
+            "envoltorio": bool(value & (1 << 0)),
+            "primeiroNivel": bool(value & (1 << 1)),
+            "segundoNivel": bool(value & (1 << 2)),
+            "terceiroNivel": bool(value & (1 << 3)),
+            "envoltorioPisc": bool(value & (1 << 4)),
+        }
+
+    @property
+    def zones(self) -> list[ZoneView]:
+        return [ZoneView(self, i) for i in range(24)]
+
+    def zone(self, index: int) -> ZoneView:
+        """Return a view of zone `index` (0-based)."""
+        return ZoneView(self, index)
+
+    def zone_mask(self, key: str) -> int:
+        """Return the 24-bit mask for a zone property (see ZONE_FIELDS)."""
+        if key not in ZONE_FIELDS:
+            raise KeyError(key)
+        return getattr(self, f"_{key}")
+
+    def flag(self, key: str) -> bool:
+        offset, bit = STATUS_FLAGS[key]
+        return bool(self._raw[offset] >> bit & 1)
+
+    def set_flag(self, key: str, value: bool) -> None:
+        offset, bit = STATUS_FLAGS[key]
+        if value:
+            self._raw[offset] |= 1 << bit
+        else:
+            self._raw[offset] &= ~(1 << bit) & 0xFF
+
+    def set_zone(self, index: int, key: str, value: bool) -> None:
+        """Set a zone property, keeping the mask and the payload in sync."""
+        mask = self.zone_mask(key)
+        mask = mask | (1 << index) if value else mask & ~(1 << index)
+        setattr(self, f"_{key}", mask)
+        offset = ZONE_FIELDS[key]
+        self._raw[offset : offset + 3] = mask.to_bytes(3, byteorder="little")
+
+    def __getitem__(self, key: str) -> Any:
+        if key in STATUS_FLAGS:
+            return self.flag(key)
+        if key == "zones":
+            return self.zones
+        if key == "version":
+            return self.version
+        if key == "battery":
+            return self.battery
+        if key == "upstream_push":
+            return self.upstream_push
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in STATUS_FLAGS:
+            self.set_flag(key, bool(value))
+        elif key == "upstream_push":
+            self.upstream_push = value
+        else:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(_STATUS_KEYS)
+
+    def __len__(self) -> int:
+        return len(_STATUS_KEYS)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Status):
+            return self._raw == other._raw and self.upstream_push == other.upstream_push
+        return super().__eq__(other)
+
+    def __repr__(self) -> str:
+        return f"Status({status_to_str(self)})"
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the status as plain, JSON-serializable data."""
+        return {
+            **{key: self[key] for key in _STATUS_KEYS if key != "zones"},
+            "zones": [dict(zone) for zone in self.zones],
+        }
 
 
 def parse_status(data: bytes) -> Status:
-    open_zones = int.from_bytes(data[:3], byteorder="little")
-    violated_zones = int.from_bytes(data[6:9], byteorder="little")
-    annulled_zones = int.from_bytes(data[12:15], byteorder="little")
-    stay_zones = int.from_bytes(data[50:53], byteorder="little")
-    enabled_zones = int.from_bytes(data[47:50], byteorder="little")
-    low_battery = int.from_bytes(data[38:41], byteorder="little")
+    return Status(data)
 
-    return {
-        "version": int(data[19]),
-        "partitionedPanel": bool(data[20] & (1 << 0)),
-        "partitionAArmed": bool(data[21] & (1 << 0)),
-        "partitionBArmed": bool(data[21] & (1 << 1)),
-        "sirenTriggered": bool(data[37] & (1 << 2)),
-        "battery": {
-            "envoltorio": bool(data[30] & (1 << 0)),
-            "primeiroNivel": bool(data[30] & (1 << 1)),
-            "segundoNivel": bool(data[30] & (1 << 2)),
-            "terceiroNivel": bool(data[30] & (1 << 3)),
-            "envoltorioPisc": bool(data[30] & (1 << 4)),
-        },
-        "zones": [
-            {
-                "open": bool(open_zones & (1 << i)),
-                "violated": bool(violated_zones & (1 << i)),
-                "annulled": bool(annulled_zones & (1 << i)),
-                "stay": bool(stay_zones & (1 << i)),
-                "enabled": bool(enabled_zones & (1 << i)),
-                "low_battery": bool(low_battery & (1 << i)),
-            }
-            for i in range(24)
-        ],
-        "pgm": bool(data[37] & (1 << 6)),
-        "no_energy": bool(data[28] & (1 << 0)),
-        "upstream_push": None,
-    }
+
+_ZONE_MASK = 0xFFFFFF
+
+
+class StatusDiff:
+    """Changes between two STATUS payloads, computed by XOR.
+
+    Zone changes are 24-bit masks per property (see ZONE_FIELDS); panel
+    changes are reported by key: the STATUS_FLAGS keys, "battery",
+    "version" and "upstream_push".
+    """
+
+    __slots__ = ("_old", "_new", "_changed", "_upstream_push")
+
+    def __init__(self, old: int, new: int, upstream_push: bool) -> None:
+        self._old = old
+        self._new = new
+        self._changed = old ^ new
+        self._upstream_push = upstream_push
+
+    def __bool__(self) -> bool:
+        return bool(self._changed) or self._upstream_push
+
+    def __repr__(self) -> str:
+        zones = {key: mask_to_zones(mask) for key, mask in self.zones.items()}
+        return f"StatusDiff(zones={zones}, flags={sorted(self.flags)})"
+
+    def _field(self, value: int, key: str) -> int:
+        return value >> (ZONE_FIELDS[key] * 8) & _ZONE_MASK
+
+    def zone_mask(self, key: str) -> int:
+        """Zones whose `key` property changed."""
+        return self._field(self._changed, key)
+
+    def set_zones(self, key: str) -> int:
+        """Zones whose `key` property went from False to True."""
+        return self._field(self._changed & self._new, key)
+
+    def cleared_zones(self, key: str) -> int:
+        """Zones whose `key` property went from True to False."""
+        return self._field(self._changed & self._old, key)
+
+    @property
+    def zones(self) -> dict[str, int]:
+        """Changed-zone mask per zone property, for properties that changed."""
+        if not self._changed:
+            return {}
+        masks = {key: self.zone_mask(key) for key in ZONE_FIELDS}
+        return {key: mask for key, mask in masks.items() if mask}
+
+    @property
+    def changed_zones(self) -> int:
+        """Zones with any changed property."""
+        mask = 0
+        for key in ZONE_FIELDS:
+            mask |= self.zone_mask(key)
+        return mask
+
+    @property
+    def opened(self) -> int:
+        return self.set_zones("open")
+
+    @property
+    def closed(self) -> int:
+        return self.cleared_zones("open")
+
+    def flag(self, key: str) -> bool:
+        """Whether the panel flag `key` changed."""
+        offset, bit = STATUS_FLAGS[key]
+        return bool(self._changed >> (offset * 8 + bit) & 1)
+
+    @property
+    def flags(self) -> set[str]:
+        """Changed panel-level keys."""
+        changed = self._changed
+        flags = {key for key in STATUS_FLAGS if self.flag(key)}
+        if changed >> (BATTERY_OFFSET * 8) & 0xFF:
+            flags.add("battery")
+        if changed >> (VERSION_OFFSET * 8) & 0xFF:
+            flags.add("version")
+        if self._upstream_push:
+            flags.add("upstream_push")
+        return flags
+
+
+def diff_status(old: bytes, new: bytes) -> StatusDiff:
+    """Compare two STATUS payloads.
+
+    Both may carry the proxy's upstream push byte at UPSTREAM_PUSH_OFFSET.
+    """
+    if old == new:
+        return StatusDiff(0, 0, False)
+    return StatusDiff(
+        int.from_bytes(old[:UPSTREAM_PUSH_OFFSET], byteorder="little"),
+        int.from_bytes(new[:UPSTREAM_PUSH_OFFSET], byteorder="little"),
+        old[UPSTREAM_PUSH_OFFSET:] != new[UPSTREAM_PUSH_OFFSET:],
+    )
+
+
+def encode_status_update(old: bytes | None, new: bytes) -> bytes | None:
+    """PROXY_STATUS data turning STATUS payload `old` into `new`.
+
+    [PROXY_STATUS, STATUS_FULL, payload...] when there is no previous
+    payload, else [PROXY_STATUS, STATUS_DELTA, (offset, value)...] for the
+    changed bytes. None when nothing changed.
+    """
+    if old == new:
+        return None
+    if old is not None and len(old) == len(new):
+        delta = [PROXY_STATUS, STATUS_DELTA]
+        for offset, (a, b) in enumerate(zip(old, new, strict=True)):
+            if a != b:
+                delta += (offset, b)
+        if len(delta) < len(new) + 2:
+            return bytes(delta)
+    return bytes([PROXY_STATUS, STATUS_FULL, *new])
+
+
+def apply_status_update(old: bytes | None, data: bytes) -> bytes:
+    """Apply PROXY_STATUS data from encode_status_update to `old`."""
+    if data[1] == STATUS_FULL:
+        return bytes(data[2:])
+    if old is None:
+        raise ValueError("Status delta without a previous status")
+    status = bytearray(old)
+    for i in range(2, len(data) - 1, 2):
+        status[data[i]] = data[i + 1]
+    return bytes(status)
+
+
+class StoredPush(NamedTuple):
+    """A push stored by the proxy.
+
+    `seq` counts the pushes of the panel from 1, `time` is when the proxy
+    received it in seconds since the epoch.
+    """
+
+    seq: int
+    time: int
+    data: bytes
+
+
+# [PROXY_HISTORY] [after*4] [start*4] [end*4]
+HISTORY_REQUEST = struct.Struct(">BIII")
+# [PROXY_HISTORY] [more] [last*4]; [PROXY_HISTORY] alone rejects a request
+# shorter than HISTORY_REQUEST.
+HISTORY_HEADER = struct.Struct(">BBI")
+# [seq*4] [time*4] [length], followed by the push data
+HISTORY_PUSH = struct.Struct(">IIB")
+# Most data a frame built by the proxy carries: frames of 246 and 253 data
+# bytes would start with the PING and OK bytes.
+MAX_FRAME_DATA = 245
+# Most pushes one response can hold.
+HISTORY_MAX_PUSHES = (MAX_FRAME_DATA - HISTORY_HEADER.size) // HISTORY_PUSH.size
+
+
+def history_request(after: int = 0, start: int = 0, end: int = 0) -> bytes:
+    """PROXY_HISTORY data querying stored pushes.
+
+    Selects the pushes after sequence number `after`, received from
+    `start` up to, but not including, `end` (seconds since the epoch, 0
+    for no end).
+    """
+    return HISTORY_REQUEST.pack(PROXY_HISTORY, after, start, end)
+
+
+def encode_history(
+    after: int, pushes: list[StoredPush], *, more: bool = False
+) -> bytes:
+    """PROXY_HISTORY response with as many of `pushes` as fit in a frame.
+
+    [PROXY_HISTORY] [more] [last*4], then [seq*4] [time*4] [length] [data...]
+    per push. `last` is the sequence number the next page starts after;
+    `more` is set when not all of `pushes` fit, or the caller has more
+    beyond them. A push too large for a frame is skipped.
+    """
+    records = bytearray()
+    last = after
+    consumed = 0
+    for push in pushes:
+        size = HISTORY_PUSH.size + len(push.data)
+        if HISTORY_HEADER.size + size > MAX_FRAME_DATA:
+            # Never fits; skip it rather than stall the pagination.
+            last = push.seq
+            consumed += 1
+            continue
+        if HISTORY_HEADER.size + len(records) + size > MAX_FRAME_DATA:
+            break
+        records += HISTORY_PUSH.pack(push.seq, push.time, len(push.data))
+        records += push.data
+        last = push.seq
+        consumed += 1
+    more = more or consumed < len(pushes)
+    return HISTORY_HEADER.pack(PROXY_HISTORY, more, last) + records
+
+
+def parse_history(data: bytes) -> tuple[bool, int, list[StoredPush]]:
+    """Decode a PROXY_HISTORY response into (more, last, pushes).
+
+    Raises ValueError if the proxy rejected the request.
+    """
+    if len(data) < HISTORY_HEADER.size:
+        raise ValueError("The proxy rejected the history request")
+    _, more, last = HISTORY_HEADER.unpack_from(data)
+    pushes: list[StoredPush] = []
+    pos = HISTORY_HEADER.size
+    while pos + HISTORY_PUSH.size <= len(data):
+        seq, time_, length = HISTORY_PUSH.unpack_from(data, pos)
+        pos += HISTORY_PUSH.size
+        pushes.append(StoredPush(seq, time_, bytes(data[pos : pos + length])))
+        pos += length
+    return bool(more), last, pushes
+
+
+# [PROXY_BATCH] [batch id] [count]
+BATCH_HEADER = struct.Struct(">BBB")
+# Largest request or response a batch frame can carry.
+BATCH_MAX_ITEM = MAX_FRAME_DATA - BATCH_HEADER.size - 1
+
+
+def encode_batch(batch: int, items: list[bytes]) -> list[bytes]:
+    """PROXY_BATCH frames carrying the MY_HOME payloads `items`.
+
+    Each frame is [PROXY_BATCH] [batch id] [count] followed by as many
+    [length] [payload...] items as fit; `count` is the number of items in
+    the whole batch. Requests and responses are encoded alike, responses
+    in request order, with an empty payload for a request the panel
+    didn't answer.
+    """
+    frames: list[bytes] = []
+    frame = bytearray()
+    for item in items:
+        if len(item) > BATCH_MAX_ITEM:
+            raise ValueError(f"Batch item of {len(item)} bytes doesn't fit a frame")
+        if frame and len(frame) + 1 + len(item) > MAX_FRAME_DATA:
+            frames.append(bytes(frame))
+            frame.clear()
+        if not frame:
+            frame += BATCH_HEADER.pack(PROXY_BATCH, batch, len(items))
+        frame.append(len(item))
+        frame += item
+    if frame:
+        frames.append(bytes(frame))
+    return frames
+
+
+def parse_batch(data: bytes) -> tuple[int, int, list[bytes]]:
+    """Decode a PROXY_BATCH frame into (batch id, count, items).
+
+    Raises ValueError if the frame is cut short of its header or items.
+    """
+    if len(data) < BATCH_HEADER.size:
+        raise ValueError(f"Batch frame of {len(data)} bytes has no header")
+    _, batch, total = BATCH_HEADER.unpack_from(data)
+    items: list[bytes] = []
+    pos = BATCH_HEADER.size
+    while pos < len(data):
+        start = pos + 1
+        pos = start + data[pos]
+        if pos > len(data):
+            raise ValueError(f"Batch item overruns the frame at {start - 1}")
+        items.append(bytes(data[start:pos]))
+    return batch, total, items
 
 
 CHAR_MAP = {
@@ -410,27 +947,43 @@ CHAR_MAP = {
 }
 
 
+# str.translate table applied to latin-1 decoded panel text.
+CHAR_TABLE = {char: chr(code) for char, code in CHAR_MAP.items()}
+
+NAME_LENGTH = 14
+
+
 def parse_char(char: int) -> str:
     return chr(CHAR_MAP.get(char, char))
 
 
+def decode_text(data: bytes) -> str:
+    """Decode panel text using CHAR_MAP."""
+    return data.decode("latin-1").translate(CHAR_TABLE)
+
+
 def parse_sync(data: bytes) -> tuple[int, list[str]]:
     if data[1] != MyHomeCommands.MESSAGES.code or data[7] != SYNC_MARKER:
         raise ValueError("Invalid sync data")
     type = data[6]
+    text = decode_text(data[9:])
     result: list[str] = []
-    buffer = ""
-    idx = 9
-    while idx < len(data):
-        if data[idx] == 0x00 or len(buffer) >= 14:
-            result.append(buffer.strip())
-            buffer = ""
+    # Names are up to 14 characters, each followed by a separator byte; the
+    # last one is followed by the checksum instead.
+    idx = 0
+    end = len(text)
+    while idx < end:
+        stop = idx + NAME_LENGTH
+        nul = text.find("\0", idx, stop)
+        if nul != -1:
+            result.append(text[idx:nul].strip())
+            idx = nul + 1
+        elif stop < end:
+            result.append(text[idx:stop].strip())
+            idx = stop + 1
         else:
-            buffer += parse_char(data[idx])
-        idx += 1
-
-    if buffer:
-        result.append(buffer[:-1].strip())
+            result.append(text[idx:-1].strip())
+            break
 
     return type, result
 
@@ -447,9 +1000,17 @@ def null_zone_data(zones: list[int]) -> bytes:
     return bytes(data)
 
 
+BCD_TABLE = bytes((b >> 4) * 10 + (b & 0x0F) for b in range(256))
+
+
 def bcd(b: int) -> int:
     """Decode BCD byte."""
-    return (b >> 4) * 10 + (b & 0x0F)
+    return BCD_TABLE[b]
+
+
+def bcd_bytes(data: bytes) -> bytes:
+    """Decode a run of BCD bytes in one call."""
+    return data.translate(BCD_TABLE)
 
 
 def cid_decode(b8: int, b9: int) -> tuple[int, int]:
@@ -464,21 +1025,38 @@ def cid_decode(b8: int, b9: int) -> tuple[int, int]:
     return q, d1 * 100 + d2 * 10 + d3
 
 
-CID_EVENT_TYPES: dict[tuple[int, int], str] = {
-    (1, 130): "burglary",
-    (3, 130): "burglary_restore",
-    (1, 147): "rf_supervision_failure",
-    (3, 147): "rf_supervision_restore",
-    (1, 301): "power_failure",
-    (3, 301): "power_restore",
-    (1, 302): "system_battery_low",
-    (3, 302): "system_battery_restore",
-    (1, 384): "low_battery",
-    (3, 384): "battery_restore",
-    (1, 401): "disarm",
-    (3, 401): "arm",
-    (1, 422): "pgm_activate",
-    (3, 422): "pgm_deactivate",
+class EventType(StrEnum):
+    BURGLARY = "burglary"
+    BURGLARY_RESTORE = "burglary_restore"
+    RF_SUPERVISION_FAILURE = "rf_supervision_failure"
+    RF_SUPERVISION_RESTORE = "rf_supervision_restore"
+    POWER_FAILURE = "power_failure"
+    POWER_RESTORE = "power_restore"
+    SYSTEM_BATTERY_LOW = "system_battery_low"
+    SYSTEM_BATTERY_RESTORE = "system_battery_restore"
+    LOW_BATTERY = "low_battery"
+    BATTERY_RESTORE = "battery_restore"
+    DISARM = "disarm"
+    ARM = "arm"
+    PGM_ACTIVATE = "pgm_activate"
+    PGM_DEACTIVATE = "pgm_deactivate"
+
+
+CID_EVENT_TYPES: dict[tuple[int, int], EventType] = {
+    (1, 130): EventType.BURGLARY,
+    (3, 130): EventType.BURGLARY_RESTORE,
+    (1, 147): EventType.RF_SUPERVISION_FAILURE,
+    (3, 147): EventType.RF_SUPERVISION_RESTORE,
+    (1, 301): EventType.POWER_FAILURE,
+    (3, 301): EventType.POWER_RESTORE,
+    (1, 302): EventType.SYSTEM_BATTERY_LOW,
+    (3, 302): EventType.SYSTEM_BATTERY_RESTORE,
+    (1, 384): EventType.LOW_BATTERY,
+    (3, 384): EventType.BATTERY_RESTORE,
+    (1, 401): EventType.DISARM,
+    (3, 401): EventType.ARM,
+    (1, 422): EventType.PGM_ACTIVATE,
+    (3, 422): EventType.PGM_DEACTIVATE,
 }
 
 ZONE_EVENT_TYPES = [
@@ -511,10 +1089,10 @@ class EventRecord(TypedDict):
 def parse_event_record(rec: bytes) -> EventRecord:
     """Parse a 15-byte event record from the ring buffer."""
     q, code = cid_decode(rec[8], rec[9])
+    year, month, day, hour, minute, second = bcd_bytes(rec[2:8])
     return {
         "timestamp": (
-            f"20{bcd(rec[2]):02d}-{bcd(rec[3]):02d}-{bcd(rec[4]):02d}"
-            f"T{bcd(rec[5]):02d}:{bcd(rec[6]):02d}:{bcd(rec[7]):02d}"
+            f"20{year:02d}-{month:02d}-{day:02d}T{hour:02d}:{minute:02d}:{second:02d}"
         ),
         "qualifier": q,
         "code": code,
@@ -523,6 +1101,101 @@ def parse_event_record(rec: bytes) -> EventRecord:
     }
 
 
+EVENT_RECORD_SIZE = 15
+
+# [pad] [ring index] [BCD y m d h m s] [CID b8 b9] [0xAA 0x0A] [zone] [zone] [0]
+EVENT_RECORD = struct.Struct("xB6B2B2xB2x")
+# Fields of an EVENT_RECORD: index, year, month, day, hour, minute, second,
+# the two Contact ID bytes and the zone.
+_EventFields = tuple[int, int, int, int, int, int, int, int, int, int]
+
+_MONTH_DAYS = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+# Days before the first of each month in a non-leap year, indexed by month;
+# out-of-range months (empty or corrupt slots) count as 0.
+_DAYS_BEFORE_MONTH = tuple(
+    sum(_MONTH_DAYS[: month - 1]) if 1 <= month <= 12 else 0 for month in range(256)
+)
+
+# (b8 << 8 | b9) -> (qualifier, code, event type), filled on first use.
+_CID_CACHE: dict[int, tuple[int, int, EventType | None]] = {}
+
+
+class Event(NamedTuple):
+    """Compact event log record.
+
+    `time` is the panel's local wall-clock time as seconds since the epoch,
+    i.e. interpreted as UTC.
+    """
+
+    ring_index: int
+    time: int
+    qualifier: int
+    code: int
+    zone: int
+    type: EventType | None
+
+    @property
+    def timestamp(self) -> str:
+        """ISO 8601 timestamp, as in EventRecord."""
+        return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(self.time))
+
+
+def _cid(key: int) -> tuple[int, int, EventType | None]:
+    q, code = cid_decode(key >> 8, key & 0xFF)
+    decoded = _CID_CACHE[key] = (q, code, CID_EVENT_TYPES.get((q, code)))
+    return decoded
+
+
+def parse_event_records(data: bytes | bytearray | memoryview) -> list[Event]:
+    """Parse consecutive 15-byte event records in a single pass.
+
+    A trailing partial record is ignored.
+    """
+    view = memoryview(data)
+    view = view[: len(view) - len(view) % EVENT_RECORD_SIZE]
+    bcd_ = BCD_TABLE
+    days_before_month = _DAYS_BEFORE_MONTH
+    cid_cache = _CID_CACHE
+    events: list[Event] = []
+    append = events.append
+    for (
+        index,
+        year,
+        month,
+        day,
+        hour,
+        minute,
+        second,
+        b8,
+        b9,
+        zone,
+    ) in cast(Iterator[_EventFields], EVENT_RECORD.iter_unpack(view)):
+        year = 2000 + bcd_[year]
+        month = bcd_[month]
+        days = (
+            (year - 1970) * 365
+            + (year - 1969) // 4
+            + days_before_month[month]
+            + bcd_[day]
+            - 1
+        )
+        if month > 2 and year % 4 == 0:
+            days += 1
+        key = b8 << 8 | b9
+        q, code, event_type = cid_cache.get(key) or _cid(key)
+        append(
+            Event(
+                index,
+                ((days * 24 + bcd_[hour]) * 60 + bcd_[minute]) * 60 + bcd_[second],
+                q,
+                code,
+                zone if zone != 0x0A else 0,
+                event_type,
+            )
+        )
+    return events
+
+
 def parse_push_event(data: bytes) -> EventRecord:
     """Parse a PUSH_COMMAND (0xB4) payload.
 
@@ -570,8 +1243,50 @@ def sync_data(type: int, indexes: bytes = b"\x00") -> bytes:
     return bytes([*data, checksum(data)])
 
 
-def checksum(data: bytes) -> int:
-    return reduce(xor, data, 0) ^ 0xFF
+def event_pointer_data() -> bytes:
+    """SYNC payload requesting the event ring's write pointer."""
+    payload = bytes(
+        [
+            0x00,
+            0x00,
+            MyHomeCommands.MESSAGES.code,
+            0x00,
+            0x03,
+            SYNC_EVENT,
+            0x03,
+            0x00,
+        ]
+    )
+    return bytes([*payload, checksum(payload)])
+
+
+def event_fetch_data(indices: Iterable[int]) -> bytes:
+    """SYNC payload fetching the event ring slots `indices`."""
+    index_bytes: list[int] = []
+    for index in indices:
+        index_bytes.extend([0x00, index])
+    payload = bytes(
+        [
+            0x00,
+            0x00,
+            MyHomeCommands.MESSAGES.code,
+            0x00,
+            len(index_bytes) + 2,
+            SYNC_FETCH,
+            0x00,
+            *index_bytes,
+        ]
+    )
+    return bytes([*payload, checksum(payload)])
+
+
+def checksum(data: bytes | bytearray | memoryview) -> int:
+    # A plain loop beats reduce(xor) and int.from_bytes() folding on
+    # frame-sized inputs.
+    x = 0xFF
+    for byte in data:
+        x ^= byte
+    return x
 
 
 class ChecksumError(Exception):
@@ -589,32 +1304,187 @@ async def read_command(reader: asyncio.StreamReader) -> tuple[int, bytes]:
     if length == OK:
         return OK, b""
 
-    data = await reader.readexactly(length)
-    [checksum_] = await reader.readexactly(1)
-    if checksum_ != checksum(bytes([length, *data])):
+    frame = await reader.readexactly(length + 1)
+    data = frame[:-1]
+    checksum_ = frame[-1]
+    if checksum_ != checksum(data) ^ length:
         if data[0] == MY_HOME and data[1] == SYNC_COMMAND:
-            return data[0], bytes([*data[1:], checksum_])
+            return data[0], frame[1:]
         raise ChecksumError(bytes([length, *data]), checksum_)
 
     return data[0], data[1:]
 
 
+READ_SIZE = 4096
+
+_EMPTY = memoryview(b"")
+
+
+class Frame(NamedTuple):
+    """A decoded frame.
+
+    `raw` is the frame as received, when it can be forwarded unchanged.
+    """
+
+    command: int
+    data: bytes
+    raw: bytes | memoryview | None = None
+
+
+class FrameDecoder:
+    """Incremental, sans-IO decoder for AMT frames.
+
+    Chunks of any size are passed to feed(); complete frames are queued as
+    (command, payload) tuples, where payload is a memoryview into the
+    received chunk, and consumed by iterating the decoder. Partial frames
+    are kept until the rest arrives, so the same instance can be driven
+    from asyncio.Protocol.data_received or through read().
+
+    `raw` is the frame last consumed as it was on the wire, for
+    forwarding it without re-encoding.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        # Bytes the pending frame still needs before it can be decoded.
+        self._missing = 0
+        self._frames: deque[tuple[int, memoryview, memoryview]] = deque()
+        self.raw = _EMPTY
+
+    def __len__(self) -> int:
+        """Number of decoded frames not yet consumed."""
+        return len(self._frames)
+
+    def __iter__(self) -> Iterator[tuple[int, memoryview]]:
+        return self
+
+    def __next__(self) -> tuple[int, memoryview]:
+        if not self._frames:
+            raise StopIteration
+        command, payload, self.raw = self._frames.popleft()
+        return command, payload
+
+    def feed(self, data: bytes) -> None:
+        if self._buffer:
+            self._buffer += data
+            self._missing -= len(data)
+            if self._missing > 0:
+                return
+            data = bytes(self._buffer)
+            self._buffer.clear()
+
+        view = memoryview(data)
+        end = len(view)
+        pos = 0
+        while pos < end:
+            length = view[pos]
+            if length == PING_COMMAND or length == OK:
+                self._frames.append((length, _EMPTY, view[pos : pos + 1]))
+                pos += 1
+                continue
+
+            stop = pos + length + 2
+            if stop > end:
+                self._missing = stop - end
+                break
+            frame = view[pos:stop]
+            pos = stop
+
+            if frame[-1] != checksum(frame[:-1]):
+                # SYNC responses carry an inner checksum instead of the
+                # frame checksum, which is handed back as part of the payload.
+                if len(frame) > 3 and frame[1] == MY_HOME and frame[2] == SYNC_COMMAND:
+                    self._frames.append((MY_HOME, frame[2:], frame))
+                    continue
+                self._buffer += view[pos:]
+                self._missing = 0
+                raise ChecksumError(bytes(frame[:-1]), frame[-1])
+
+            self._frames.append((frame[1], frame[2:-1], frame))
+
+        if pos < end:
+            self._buffer += view[pos:]
+
+    async def read(self, reader: asyncio.StreamReader) -> tuple[int, memoryview]:
+        """Return the next frame, reading from the stream as needed."""
+        while not self._frames:
+            data = await reader.read(READ_SIZE)
+            if not data:
+                raise asyncio.IncompleteReadError(bytes(self._buffer), None)
+            self.feed(data)
+        return next(self)
+
+
+def encode_frame(command: int, data: bytes = b"", key: int | None = None) -> bytes:
+    """Encode a frame as sent on the wire, encrypted if `key` is given."""
+    if command in (PING_COMMAND, OK):
+        frame = bytes([command])
+    else:
+        frame = create_command(command, data)
+
+    if key is not None:
+        frame = encrypt(frame, key)
+    return frame
+
+
 async def send_command(
     writer: asyncio.StreamWriter,
     command: int,
     data: bytes = b"",
     key: int | None = None,
 ):
-    if command in (PING_COMMAND, OK):
-        data = bytes([command])
-    else:
-        data = create_command(command, data)
+    writer.write(encode_frame(command, data, key))
+    await writer.drain()
 
-    if key is not None:
-        data = encrypt(data, key)
 
-    writer.write(data)
-    await writer.drain()
+FLUSH_THRESHOLD = 4096
+
+
+class FramedWriter:
+    """Coalesces outgoing frames into one transport write per batch.
+
+    write() only encodes into a buffer, which is handed to the transport
+    once it grows past `threshold` bytes; flush() writes the rest and waits
+    for the transport to drain, so backpressure applies once per batch.
+    """
+
+    def __init__(
+        self,
+        writer: asyncio.StreamWriter,
+        key: int | None = None,
+        threshold: int = FLUSH_THRESHOLD,
+    ) -> None:
+        self.writer = writer
+        self.key = key
+        self.threshold = threshold
+        self._buffer = bytearray()
+
+    def __len__(self) -> int:
+        """Number of buffered bytes not yet handed to the transport."""
+        return len(self._buffer)
+
+    def write(self, command: int, data: bytes = b"") -> None:
+        self._buffer += encode_frame(command, data, self.key)
+        if len(self._buffer) >= self.threshold:
+            self._write_buffer()
+
+    def write_raw(self, command: int, frame: bytes | memoryview) -> None:
+        """Write `command`'s frame as already encoded, e.g. FrameDecoder.raw."""
+        if self.key is not None:
+            frame = encrypt(bytes(frame), self.key)
+        self._buffer += frame
+        if len(self._buffer) >= self.threshold:
+            self._write_buffer()
+
+    def _write_buffer(self) -> None:
+        if self._buffer:
+            # The transport may keep a reference to what it can't send yet.
+            self.writer.write(bytes(self._buffer))
+            self._buffer.clear()
+
+    async def flush(self) -> None:
+        self._write_buffer()
+        await self.writer.drain()
 
 
 class OpenZoneError(Exception): ...
@@ -623,6 +1493,14 @@ class OpenZoneError(Exception): ...
 class WrongPasswordError(Exception): ...
 
 
+def _response_key(command: int, data: bytes) -> int:
+    # Proxy responses are told apart by subcommand, since status updates
+    # arrive unsolicited.
+    if command == PROXY_COMMAND and data:
+        return command << 8 | data[0]
+    return command
+
+
 class ClientAMT:
     def __init__(self, host: str, port: int, mac: str, pin: str) -> None:
         self.host = host
@@ -630,32 +1508,158 @@ class ClientAMT:
         self.mac = bytes.fromhex(mac.replace(":", ""))
         self.pin = pin
         self._send = asyncio.Queue[tuple[int, bytes, asyncio.Future[None]]]()
-        self._receive: list[asyncio.Queue[tuple[int, bytes]]] = []
         self._request_lock = asyncio.Lock()
+        # Requests awaiting a response, per command, in the order they were sent.
+        self._pending: dict[int, deque[asyncio.Future[bytes]]] = {}
+        # Callbacks for frames that don't answer a pending request (e.g. PUSH).
+        self._subscribers: dict[int, list[Callable[[bytes], None]]] = {}
         self.is_proxy = False
-        # Called when PUSH_COMMAND (0xB4) is received from the panel.
-        # Set by the coordinator to parse Contact ID events and dispatch them.
-        self.on_push: Callable[[bytes], None] | None = None
+        # Whether requests may be pipelined, see CONN_PIPELINE.
+        self.pipelined = False
+        self._status_callbacks: list[Callable[[Status], None]] = []
+        self._connect_callbacks: list[Callable[[], None]] = []
+        # Last STATUS payload pushed by the proxy, for applying deltas.
+        self._status: bytes | None = None
+        # Batches awaiting responses by id: (count, responses, future).
+        self._batches: dict[
+            int, tuple[int, list[bytes], asyncio.Future[list[bytes]]]
+        ] = {}
+        self._batch_ids = count()
+        self.subscribe(PROXY_COMMAND, self._handle_proxy)
+
+    def subscribe(
+        self, command: int, callback: Callable[[bytes], None]
+    ) -> Callable[[], None]:
+        """Call `callback` with the payload of unsolicited `command` frames.
+
+        Returns a function that removes the subscription.
+        """
+        callbacks = self._subscribers.setdefault(command, [])
+        callbacks.append(callback)
+        return lambda: callbacks.remove(callback)
+
+    def watch_status(self, callback: Callable[[Status], None]) -> Callable[[], None]:
+        """Have the proxy push status changes to `callback`.
+
+        Only a proxy (see is_proxy) sends them, the Intelbras cloud doesn't;
+        the subscription is renewed on every reconnection. Returns a
+        function that removes the callback.
+        """
+        self._status_callbacks.append(callback)
+        if self.is_proxy:
+            self._subscribe_status()
+        return lambda: self._status_callbacks.remove(callback)
+
+    @property
+    def status_watched(self) -> bool:
+        """Whether the proxy pushes status changes on this connection.
+
+        True from its first full status on, which a proxy refusing the
+        subscription (wrong PIN) or not supporting it never sends.
+        """
+        return self.is_proxy and self._status is not None
+
+    def watch_connection(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Call `callback` after every (re)connection, with is_proxy set.
+
+        Returns a function that removes the callback.
+        """
+        self._connect_callbacks.append(callback)
+        return lambda: self._connect_callbacks.remove(callback)
+
+    def _subscribe_status(self) -> None:
+        future = asyncio.Future[None]()
+        # Nobody waits for it: a failed send is retried on reconnection.
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        data = my_home_data(
+            self.pin, MyHomeCommands.STATUS.code, MyHomeCommands.STATUS.factory()
+        )
+        self._send.put_nowait((PROXY_COMMAND, bytes([PROXY_STATUS, *data]), future))
+
+    def _handle_proxy(self, data: bytes) -> None:
+        if data[0] == PROXY_BATCH:
+            self._handle_batch(data)
+            return
+        if data[0] == PROXY_TIMEOUT:
+            waiters = self._pending.get(data[1])
+            if waiters and not (future := waiters.popleft()).done():
+                future.set_exception(TimeoutError())
+            return
+        if data[0] != PROXY_STATUS:
+            return
+        self._status = apply_status_update(self._status, data)
+        status = Status(self._status, bool(self._status[-1]))
+        for callback in list(self._status_callbacks):
+            callback(status)
+
+    def _handle_batch(self, data: bytes) -> None:
+        try:
+            batch, _, items = parse_batch(data)
+        except ValueError:
+            return
+        if batch not in self._batches:
+            return
+        expected, responses, future = self._batches[batch]
+        responses += items
+        if len(responses) >= expected:
+            del self._batches[batch]
+            if not future.done():
+                future.set_result(responses)
+
+    def _resolve(self, command: int, data: bytes) -> bool:
+        """Hand a frame to the oldest request waiting for `command`."""
+        waiters = self._pending.get(_response_key(command, data))
+        while waiters:
+            future = waiters.popleft()
+            if not future.done():
+                future.set_result(data)
+                return True
+            if self.pipelined:
+                # The proxy answers every request in order, so this is the
+                # late response to a request given up on.
+                return True
+        return False
+
+    def _fail_pending(self, ex: BaseException) -> None:
+        for waiters in self._pending.values():
+            while waiters:
+                future = waiters.popleft()
+                if not future.done():
+                    future.set_exception(ex)
+        for _, _, future in self._batches.values():
+            if not future.done():
+                future.set_exception(ex)
+        self._batches.clear()
 
     async def run(self) -> None:
         async def read(reader: asyncio.StreamReader) -> None:
+            decoder = FrameDecoder()
             while True:
-                command, data = await read_command(reader)
-                if command == PUSH_COMMAND and self.on_push is not None:
-                    self.on_push(data)
-                for queue in self._receive:
-                    with contextlib.suppress(asyncio.QueueFull):
-                        queue.put_nowait((command, data))
+                command, payload = await decoder.read(reader)
+                data = bytes(payload)
+                if self._resolve(command, data):
+                    continue
+                for callback in self._subscribers.get(command, ()):
+                    callback(data)
 
         async def write(writer: asyncio.StreamWriter) -> None:
+            framed = FramedWriter(writer)
             while True:
-                command, data, future = await self._send.get()
+                batch = [await self._send.get()]
+                while not self._send.empty():
+                    batch.append(self._send.get_nowait())
                 try:
-                    await send_command(writer, command, data)
-                    future.set_result(None)
+                    for command, data, _ in batch:
+                        framed.write(command, data)
+                    await framed.flush()
                 except Exception as ex:
-                    future.set_exception(ex)
+                    for _, _, future in batch:
+                        if not future.done():
+                            future.set_exception(ex)
                     raise
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
 
         while True:
             writer: asyncio.StreamWriter | None = None
@@ -678,7 +1682,13 @@ class ClientAMT:
                         raise Exception("Erro")
 
                     [flags] = await reader.readexactly(1)
-                    self.is_proxy = flags == CONN_PROXY
+                    self.is_proxy = flags & ~CONN_PIPELINE == CONN_PROXY
+                    self.pipelined = self.is_proxy and bool(flags & CONN_PIPELINE)
+                    self._status = None
+                    if self.is_proxy and self._status_callbacks:
+                        self._subscribe_status()
+                    for callback in list(self._connect_callbacks):
+                        callback()
 
                 async with asyncio.TaskGroup() as tg:
                     tg.create_task(read(reader))
@@ -687,6 +1697,7 @@ class ClientAMT:
                 while not self._send.empty():
                     _, _, future = self._send.get_nowait()
                     future.set_exception(ex)
+                self._fail_pending(ex)
             finally:
                 if writer is not None:
                     writer.close()
@@ -695,26 +1706,65 @@ class ClientAMT:
             await asyncio.sleep(5)
 
     async def _request(self, command: int, data: bytes = b"") -> bytes:
+        if self.pipelined:
+            # The proxy answers in order, see _resolve.
+            return await self._send_request(command, data)
+        # Nothing in a panel's responses tells apart the requests they
+        # answer, so only one may be waiting at a time.
         async with self._request_lock:
-            queue = asyncio.Queue[tuple[int, bytes]](maxsize=16)
-            self._receive.append(queue)
-            try:
-                future = asyncio.Future[None]()
-                self._send.put_nowait(
-                    (
-                        command,
-                        data,
-                        future,
-                    )
+            return await self._send_request(command, data)
+
+    async def _send_request(self, command: int, data: bytes) -> bytes:
+        response = asyncio.Future[bytes]()
+        waiters = self._pending.setdefault(_response_key(command, data), deque())
+        waiters.append(response)
+        try:
+            future = asyncio.Future[None]()
+            self._send.put_nowait(
+                (
+                    command,
+                    data,
+                    future,
                 )
-                async with asyncio.timeout(10):
-                    await future
-                    while True:
-                        _command, _data = await queue.get()
-                        if _command == command:
-                            return _data
-            finally:
-                self._receive.remove(queue)
+            )
+            async with asyncio.timeout(10):
+                await future
+                return await response
+        finally:
+            if not response.done():
+                with contextlib.suppress(ValueError):
+                    waiters.remove(response)
+
+    async def batch(self, requests: list[bytes]) -> list[bytes]:
+        """Responses to the MY_HOME requests `requests`, in order.
+
+        Through a proxy supporting it (see pipelined) they are sent as one
+        PROXY_BATCH, which costs a single round trip; otherwise they are
+        sent one after the other.
+        """
+        if not self.pipelined or len(requests) < 2:
+            return [await self._request(MY_HOME, data) for data in requests]
+
+        batch = next(self._batch_ids) % 256
+        response = asyncio.Future[list[bytes]]()
+        self._batches[batch] = (len(requests), [], response)
+        try:
+            sent: list[asyncio.Future[None]] = []
+            for data in encode_batch(batch, requests):
+                future = asyncio.Future[None]()
+                self._send.put_nowait((PROXY_COMMAND, data, future))
+                sent.append(future)
+            # The proxy waits up to 5 seconds for each response.
+            async with asyncio.timeout(10 + 5 * len(requests)):
+                await asyncio.gather(*sent)
+                responses = await response
+        finally:
+            entry = self._batches.get(batch)
+            if entry is not None and entry[2] is response:
+                del self._batches[batch]
+        if not all(responses):
+            raise TimeoutError("The panel didn't answer every request of the batch")
+        return responses
 
     async def arm(self, password: str, *, stay: bool = False) -> None:
         data = await self._request(
@@ -770,6 +1820,16 @@ class ClientAMT:
         )
         return parse_sync(data)[1]
 
+    async def sync_many(self, requests: list[tuple[int, bytes]]) -> list[list[str]]:
+        """sync() for each (type, indexes) in `requests`, as one batch."""
+        responses = await self.batch(
+            [
+                my_home_data(self.pin, SYNC_COMMAND, sync_data(type, indexes))
+                for type, indexes in requests
+            ]
+        )
+        return [parse_sync(data)[1] for data in responses]
+
     async def set_upstream_push(self, *, enabled: bool) -> None:
         """Send upstream push enable/disable command to the proxy server."""
         future = asyncio.Future[None]()
@@ -782,6 +1842,25 @@ class ClientAMT:
         )
         await future
 
+    async def push_history(
+        self, *, after: int = 0, start: int = 0, end: int = 0
+    ) -> list[StoredPush]:
+        """Pushes the proxy stored for the panel, oldest first.
+
+        Only a proxy with PUSH_LOG set keeps them, see is_proxy; the
+        selection is that of history_request. Each response carries a
+        page, so this takes one round trip per MAX_FRAME_DATA bytes.
+        """
+        pushes: list[StoredPush] = []
+        while True:
+            data = await self._request(
+                PROXY_COMMAND, history_request(after, start, end)
+            )
+            more, after, page = parse_history(data)
+            pushes += page
+            if not more:
+                return pushes
+
     async def status(self) -> Status:
         data = await self._request(
             MY_HOME,
@@ -789,32 +1868,16 @@ class ClientAMT:
                 self.pin, MyHomeCommands.STATUS.code, MyHomeCommands.STATUS.factory()
             ),
         )
-        status = parse_status(data)
-        if self.is_proxy:
-            status["upstream_push"] = bool(data[-1])
-        return status
+        return Status(data, bool(data[-1]) if self.is_proxy else None)
 
     async def get_event_pointer(self) -> int:
         """Get event log write pointer (0–127) in the 128-entry ring buffer."""
-        payload = bytes(
-            [
-                0x00,
-                0x00,
-                MyHomeCommands.MESSAGES.code,
-                0x00,
-                0x03,
-                SYNC_EVENT,
-                0x03,
-                0x00,
-            ]
-        )
-        payload = bytes([*payload, checksum(payload)])
         data = await self._request(
-            MY_HOME, my_home_data(self.pin, SYNC_COMMAND, payload)
+            MY_HOME, my_home_data(self.pin, SYNC_COMMAND, event_pointer_data())
         )
         return data[9]
 
-    async def fetch_events(self) -> list[EventRecord]:
+    async def fetch_events(self) -> list[Event]:
         """Fetch all events from the ring buffer (newest first)."""
         pointer = await self.get_event_pointer()
 
@@ -824,38 +1887,22 @@ class ClientAMT:
             indices.append(pos)
             pos = (pos - 1) % 128
 
-        events: list[EventRecord] = []
-        for batch_start in range(0, len(indices), 10):
-            batch = indices[batch_start : batch_start + 10]
-            index_bytes: list[int] = []
-            for idx in batch:
-                index_bytes.extend([0x00, idx])
-            payload = bytes(
-                [
-                    0x00,
-                    0x00,
-                    MyHomeCommands.MESSAGES.code,
-                    0x00,
-                    len(index_bytes) + 2,
-                    SYNC_FETCH,
-                    0x00,
-                    *index_bytes,
-                ]
-            )
-            payload = bytes([*payload, checksum(payload)])
-
-            data = await self._request(
-                MY_HOME, my_home_data(self.pin, SYNC_COMMAND, payload)
-            )
+        batches = [indices[start : start + 10] for start in range(0, len(indices), 10)]
+        responses = await self.batch(
+            [
+                my_home_data(self.pin, SYNC_COMMAND, event_fetch_data(batch))
+                for batch in batches
+            ]
+        )
 
+        records = bytearray()
+        for batch, data in zip(batches, responses, strict=True):
             if len(data) > 6 and data[6] == SYNC_EMPTY:
                 continue
 
-            event_data = data[8:]
-            for i in range(len(batch)):
-                offset = i * 15
-                if offset + 15 > len(event_data):
-                    break
-                events.append(parse_event_record(event_data[offset : offset + 15]))
+            event_data = data[8 : 8 + len(batch) * EVENT_RECORD_SIZE]
+            records += event_data[
+                : len(event_data) - len(event_data) % EVENT_RECORD_SIZE
+            ]
 
-        return events
+        return parse_event_records(records)
@@ -10,7 +10,13 @@ from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import DOMAIN
-from .coordinator import AMTCoordinator
+from .coordinator import (
+    CONTEXT_PGM,
+    CONTEXT_UPSTREAM_PUSH,
+    AMTCoordinator,
+    zone_context,
+)
+from .protocol import mask_to_zones
 
 PARALLEL_UPDATES = 0
 
@@ -31,9 +37,10 @@ async def async_setup_entry(
 
     def _check_device() -> None:
         current_devices = {
-            i
-            for i, zone in enumerate(config_entry.runtime_data.data["status"]["zones"])
-            if zone["enabled"]
+            zone - 1
+            for zone in mask_to_zones(
+                config_entry.runtime_data.data["status"].enabled_mask
+            )
         }
         new_devices = current_devices - enabled_zones
         enabled_zones.update(new_devices)
@@ -48,7 +55,7 @@ async def async_setup_entry(
 
 class AMTPGMSwitch(CoordinatorEntity[AMTCoordinator], SwitchEntity):  # pyright: ignore[reportIncompatibleVariableOverride]
     def __init__(self, coordinator: AMTCoordinator) -> None:
-        super().__init__(coordinator)
+        super().__init__(coordinator, context=CONTEXT_PGM)
         self._attr_unique_id = format_mac(coordinator.client.mac.hex(":")) + "_pgm"
         self._attr_has_entity_name = True
         self._attr_translation_key = "pgm"
@@ -59,7 +66,7 @@ class AMTPGMSwitch(CoordinatorEntity[AMTCoordinator], SwitchEntity):  # pyright:
             model="AN-24 Net",
         )
 
-        self._attr_is_on = coordinator.data["status"]["pgm"]
+        self._attr_is_on = coordinator.data["status"].pgm
 
     async def async_turn_on(self, **kwargs: Any) -> None:
         """Turn the entity on."""
@@ -76,13 +83,13 @@ class AMTPGMSwitch(CoordinatorEntity[AMTCoordinator], SwitchEntity):  # pyright:
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        self._attr_is_on = self.coordinator.data["status"]["pgm"]
+        self._attr_is_on = self.coordinator.data["status"].pgm
         self.async_write_ha_state()
 
 
 class AMTAnnulledSwitch(CoordinatorEntity[AMTCoordinator], SwitchEntity):  # pyright: ignore[reportIncompatibleVariableOverride]
     def __init__(self, coordinator: AMTCoordinator, index: int) -> None:
-        super().__init__(coordinator, context=index)
+        super().__init__(coordinator, context=zone_context(index, "annulled"))
         mac = format_mac(coordinator.client.mac.hex(":"))
         zone = coordinator.data["messages"]["zones"][index] or f"Zone {index + 1:02}"
         self._index = index
@@ -96,17 +103,13 @@ class AMTAnnulledSwitch(CoordinatorEntity[AMTCoordinator], SwitchEntity):  # pyr
             via_device=(DOMAIN, mac),
         )
 
-        zone_state = coordinator.data["status"]["zones"][index]
-        self._attr_is_on = zone_state["annulled"]
-        self._attr_available = zone_state["enabled"]
+        zone_state = coordinator.data["status"].zone(index)
+        self._attr_is_on = zone_state.annulled
+        self._attr_available = zone_state.enabled
 
     async def async_turn_on(self, **kwargs: Any) -> None:
         """Turn the entity on."""
-        annuled = [
-            i + 1
-            for i, zone in enumerate(self.coordinator.data["status"]["zones"])
-            if zone["annulled"]
-        ]
+        annuled = mask_to_zones(self.coordinator.data["status"].annulled_mask)
         annuled.append(self._index + 1)
         await self.coordinator.client.bypass(annuled)
         self._attr_is_on = True
@@ -114,11 +117,7 @@ class AMTAnnulledSwitch(CoordinatorEntity[AMTCoordinator], SwitchEntity):  # pyr
 
     async def async_turn_off(self, **kwargs: Any) -> None:
         """Turn the entity off."""
-        annuled = [
-            i + 1
-            for i, zone in enumerate(self.coordinator.data["status"]["zones"])
-            if zone["annulled"]
-        ]
+        annuled = mask_to_zones(self.coordinator.data["status"].annulled_mask)
         if (self._index + 1) in annuled:
             annuled.remove(self._index + 1)
         await self.coordinator.client.bypass(annuled)
@@ -128,9 +127,9 @@ class AMTAnnulledSwitch(CoordinatorEntity[AMTCoordinator], SwitchEntity):  # pyr
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        state = self.coordinator.data["status"]["zones"][self._index]
-        self._attr_is_on = state["annulled"]
-        self._attr_available = state["enabled"]
+        state = self.coordinator.data["status"].zone(self._index)
+        self._attr_is_on = state.annulled
+        self._attr_available = state.enabled
         self.async_write_ha_state()
 
 
@@ -138,7 +137,7 @@ class AMTDisableUpstreamSwitch(CoordinatorEntity[AMTCoordinator], SwitchEntity):
     """Switch to disable proxy upstream push forwarding to Intelbras cloud."""
 
     def __init__(self, coordinator: AMTCoordinator) -> None:
-        super().__init__(coordinator)
+        super().__init__(coordinator, context=CONTEXT_UPSTREAM_PUSH)
         mac = format_mac(coordinator.client.mac.hex(":"))
         self._attr_unique_id = f"{mac}_disable_upstream"
         self._attr_has_entity_name = True
@@ -150,7 +149,7 @@ class AMTDisableUpstreamSwitch(CoordinatorEntity[AMTCoordinator], SwitchEntity):
             manufacturer="Intelbras",
             model="AN-24 Net",
         )
-        self._attr_is_on = not coordinator.data["status"]["upstream_push"]
+        self._attr_is_on = not coordinator.data["status"].upstream_push
 
     def _check_proxy(self) -> None:
         if not self.coordinator.client.is_proxy:
@@ -176,5 +175,5 @@ class AMTDisableUpstreamSwitch(CoordinatorEntity[AMTCoordinator], SwitchEntity):
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        self._attr_is_on = not self.coordinator.data["status"]["upstream_push"]
+        self._attr_is_on = not self.coordinator.data["status"].upstream_push
         self.async_write_ha_state()
@@ -0,0 +1,26 @@
+"""Run the benchmarks: python -m benchmarks [codec|proxy] [--json FILE]."""
+
+import argparse
+import json
+
+from . import codec, roundtrip
+from .harness import report
+
+SUITES = {"codec": codec.run, "proxy": roundtrip.run}
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("suites", nargs="*", choices=[*SUITES])
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = [result for suite in args.suites or SUITES for result in SUITES[suite]()]
+    print(report(results))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump([result._asdict() for result in results], f, indent=2)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,120 @@
+"""Benchmarks for the frame codec and payload parsers in protocol.py."""
+
+import asyncio
+
+from an24net.protocol import (
+    EVENT_RECORD_SIZE,
+    MY_HOME,
+    FrameDecoder,
+    checksum,
+    command_to_str,
+    diff_status,
+    encode_frame,
+    encrypt,
+    parse_event_record,
+    parse_event_records,
+    parse_push_event,
+    parse_status,
+    parse_sync,
+    read_command,
+)
+
+from . import corpus
+from .harness import Result, measure
+
+
+def _count_frames(data: bytes) -> int:
+    decoder = FrameDecoder()
+    decoder.feed(data)
+    return len(decoder)
+
+
+def _decode(data: bytes, chunk: int) -> int:
+    decoder = FrameDecoder()
+    frames = 0
+    for i in range(0, len(data), chunk):
+        decoder.feed(data[i : i + chunk])
+        for _ in decoder:
+            frames += 1
+    return frames
+
+
+def _read_commands(loop: asyncio.AbstractEventLoop, data: bytes) -> int:
+    async def read_all() -> int:
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        frames = 0
+        try:
+            while True:
+                await read_command(reader)
+                frames += 1
+        except asyncio.IncompleteReadError:
+            return frames
+
+    return loop.run_until_complete(read_all())
+
+
+def run() -> list[Result]:
+    stream = corpus.stream()
+    frames = _count_frames(stream)
+    status = corpus.status_payload()
+    changed = bytearray(status)
+    changed[0] ^= 0b10
+    changed[21] = 0b11
+    records = corpus.event_records()
+    sync = corpus.zone_names_response()
+    push = corpus.push_payload()
+    handshake = b"".join(corpus.client_handshake())
+    encrypted = encode_frame(MY_HOME, status, corpus.KEY)
+    samples = list(corpus.frames().values())
+
+    loop = asyncio.new_event_loop()
+    try:
+        return [
+            measure(
+                "read_command (stream)",
+                lambda: _read_commands(loop, stream),
+                ops=frames,
+            ),
+            measure(
+                "FrameDecoder (stream)",
+                lambda: _decode(stream, len(stream)),
+                ops=frames,
+            ),
+            measure(
+                "FrameDecoder (64 B chunks)", lambda: _decode(stream, 64), ops=frames
+            ),
+            measure("FrameDecoder (handshake)", lambda: _decode(handshake, 64)),
+            measure(
+                "decrypt + decode", lambda: _decode(encrypt(encrypted, corpus.KEY), 64)
+            ),
+            measure("checksum (10 B)", lambda: checksum(push[:10])),
+            measure("checksum (status)", lambda: checksum(status)),
+            measure("encode_frame (status)", lambda: encode_frame(MY_HOME, status)),
+            measure(
+                "encode_frame (encrypted)",
+                lambda: encode_frame(MY_HOME, status, corpus.KEY),
+            ),
+            measure("parse_status", lambda: parse_status(status)),
+            measure("parse_status + as_dict", lambda: parse_status(status).as_dict()),
+            measure("diff_status", lambda: diff_status(status, changed).zones),
+            measure("parse_sync (8 zones)", lambda: parse_sync(sync)),
+            measure(
+                "parse_event_record",
+                lambda: parse_event_record(records[:EVENT_RECORD_SIZE]),
+            ),
+            measure(
+                "parse_event_records (128)",
+                lambda: parse_event_records(records),
+                ops=corpus.EVENTS,
+            ),
+            measure("parse_push_event", lambda: parse_push_event(push)),
+            measure(
+                "command_to_str (corpus)",
+                lambda: [command_to_str(command, data) for command, data in samples],
+                ops=len(samples),
+            ),
+        ]
+    finally:
+        loop.close()
@@ -0,0 +1,185 @@
+"""Representative AMT frames for the benchmarks, built from protocol.md."""
+
+from an24net.protocol import (
+    CONNECTION_COMMAND,
+    MAC_COMMAND,
+    MY_HOME,
+    PING_COMMAND,
+    PUSH_COMMAND,
+    START_COMMAND,
+    SYNC_FETCH,
+    SYNC_MARKER,
+    SYNC_ZONE,
+    VERSION_COMMAND,
+    XOR_COMMAND,
+    MyHomeCommands,
+    checksum,
+    connection_data,
+    encode_frame,
+    my_home_data,
+    null_zone_data,
+)
+
+MAC = bytes.fromhex("001a3faabbcc")
+PIN = "1234"
+KEY = 0x5A
+
+EVENTS = 128
+EVENTS_PER_BATCH = 10
+
+
+def _bcd(n: int) -> int:
+    return (n // 10) << 4 | n % 10
+
+
+def status_payload(*, upstream_push: bool | None = None) -> bytes:
+    """54-byte STATUS response: armed stay, a few open, annulled zones."""
+    data = bytearray(54)
+    data[0:3] = null_zone_data([1, 3, 9, 17])
+    data[6:9] = null_zone_data([3])
+    data[12:15] = null_zone_data([5, 6])
+    data[19] = 0x01
+    data[21] = 0b10
+    data[30] = 0b1111
+    data[37] = 0b0100_0000
+    data[38:41] = null_zone_data([9])
+    data[47:50] = null_zone_data(list(range(1, 19)))
+    data[50:53] = null_zone_data([1, 2])
+    if upstream_push is not None:
+        data.append(upstream_push)
+    return bytes(data)
+
+
+def push_payload(index: int = 0) -> bytes:
+    """PUSH event: burglary on a zone, one byte per CID digit (0x0A = 0)."""
+    zone = index % 24 + 1
+    return bytes(
+        [
+            *b"\x00\x01\x02\x03\x04\x05\x06",
+            1,  # qualifier
+            1,
+            3,
+            0x0A,  # code 130
+            0x0A,
+            0x0A,  # group
+            0x0A,
+            zone // 10 or 0x0A,
+            zone % 10 or 0x0A,
+            18,
+            10,
+            26,  # day, month, year
+            12,
+            34,
+            index % 60,  # hour, minute, second
+            *bytes(6),
+        ]
+    )
+
+
+def event_record(index: int) -> bytes:
+    """15-byte event log record, alternating zone open/close and arm/disarm."""
+    zone = index % 24 + 1
+    if index % 4 < 2:
+        b8, b9, zone_byte = (1 if index % 2 else 3) << 4 | 1, 0x3A, zone
+    else:
+        b8, b9, zone_byte = (1 if index % 2 else 3) << 4 | 4, 0xA1, 0x0A
+    day, hour, minute = index % 28 + 1, index % 24, index % 60
+    return bytes(
+        [
+            0x00,
+            index,
+            0x26,
+            0x10,
+            _bcd(day),
+            _bcd(hour),
+            _bcd(minute),
+            _bcd(index % 60),
+            b8,
+            b9,
+            0xAA,
+            0x0A,
+            zone_byte,
+            zone_byte,
+            0x00,
+        ]
+    )
+
+
+def _sync_response(type: int, body: bytes) -> bytes:
+    header = bytes([0x00, MyHomeCommands.MESSAGES.code, 0x00, 0x00, 0x00])
+    data = bytes([*header, len(body) + 2, type, SYNC_MARKER, 0x00, *body])
+    return data + bytes([checksum(data)])
+
+
+def fetch_response(indices: list[int]) -> bytes:
+    """SYNC_FETCH response carrying the records at `indices`."""
+    data = bytes([0x00, MyHomeCommands.MESSAGES.code, 0x00, 0x00, 0x00])
+    data += bytes([len(indices) * 15 + 2, SYNC_FETCH, 0x00])
+    return data + b"".join(event_record(i) for i in indices)
+
+
+def event_dump() -> list[bytes]:
+    """The 13 fetch responses of a full 128-entry ring buffer dump."""
+    indices = [(EVENTS - 1 - i) % EVENTS for i in range(EVENTS)]
+    return [
+        fetch_response(indices[i : i + EVENTS_PER_BATCH])
+        for i in range(0, EVENTS, EVENTS_PER_BATCH)
+    ]
+
+
+def event_records() -> bytes:
+    """All 128 records, as fetch_events() hands them to the parser."""
+    return b"".join(event_record(i) for i in range(EVENTS))
+
+
+def zone_names_response(count: int = 8) -> bytes:
+    """SYNC_ZONE response with `count` names, including accented ones."""
+    names = [b"Sala", b"Cozinha", b"Port\x7fo", b"Quarto ~ni", b"Garagem"]
+    slots = [names[i % len(names)].ljust(14) for i in range(count)]
+    return _sync_response(SYNC_ZONE, b"\x00".join(slots))
+
+
+def status_request() -> bytes:
+    return my_home_data(PIN, MyHomeCommands.STATUS.code)
+
+
+def alarm_handshake() -> list[bytes]:
+    """Wire frames sent by a panel connecting to the proxy."""
+    return [
+        encode_frame(START_COMMAND, b"\x45\x12\x12\x52\x57\x19"),
+        encode_frame(MAC_COMMAND, MAC),
+        encode_frame(VERSION_COMMAND, b"1.0"),
+    ]
+
+
+def client_handshake(key: int = KEY) -> list[bytes]:
+    """Wire frames sent by an app connecting with XOR encryption."""
+    return [
+        encode_frame(XOR_COMMAND),
+        encode_frame(CONNECTION_COMMAND, connection_data(MAC), key),
+    ]
+
+
+def frames() -> dict[str, tuple[int, bytes]]:
+    """(command, payload) for each representative frame kind."""
+    return {
+        "status_request": (MY_HOME, status_request()),
+        "status": (MY_HOME, status_payload()),
+        "status_proxy": (MY_HOME, status_payload(upstream_push=True)),
+        "push": (PUSH_COMMAND, push_payload()),
+        "zone_names": (MY_HOME, zone_names_response()),
+        "event_fetch": (MY_HOME, event_dump()[0]),
+        "ping": (PING_COMMAND, b""),
+    }
+
+
+def stream() -> bytes:
+    """A panel session as one byte stream: handshake, pushes and responses."""
+    chunks = alarm_handshake()
+    for i in range(16):
+        chunks.append(encode_frame(MY_HOME, status_payload()))
+        chunks.append(encode_frame(PUSH_COMMAND, push_payload(i)))
+        chunks.append(encode_frame(PING_COMMAND))
+    chunks.extend(encode_frame(MY_HOME, data) for data in event_dump())
+    chunks.append(encode_frame(MY_HOME, zone_names_response()))
+    return b"".join(chunks)
@@ -0,0 +1,67 @@
+"""Minimal timing and allocation harness built on timeit and tracemalloc."""
+
+import gc
+import timeit
+import tracemalloc
+from collections.abc import Callable
+from typing import Any, NamedTuple
+
+# Aim for this many seconds of timed calls per repeat.
+TARGET_TIME = 0.2
+REPEATS = 5
+
+
+class Result(NamedTuple):
+    name: str
+    ops_per_sec: float
+    # Median time per call, in microseconds.
+    usec: float
+    # Peak traced memory of one call, and blocks held by its result.
+    peak_bytes: int
+    blocks: int
+
+
+def _allocations(func: Callable[[], Any]) -> tuple[int, int]:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        del result
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(snapshot, "filename"))
+    return peak - before, blocks
+
+
+def measure(name: str, func: Callable[[], Any], *, ops: int = 1) -> Result:
+    """Time func() and trace the memory of a single call.
+
+    `ops` is the number of operations one call performs, e.g. the number of
+    frames in a decoded stream, so ops/sec stays comparable across inputs.
+    """
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * TARGET_TIME / max(elapsed, 1e-9)))
+    times = sorted(timer.repeat(REPEATS, number))
+    per_call = times[len(times) // 2] / number
+    peak, blocks = _allocations(func)
+    return Result(name, ops / per_call, per_call * 1e6, peak, blocks)
+
+
+def report(results: list[Result]) -> str:
+    width = max(len(r.name) for r in results)
+    lines = [
+        f"{'benchmark':<{width}}  {'ops/sec':>12}  {'usec/call':>10}"
+        f"  {'peak B':>9}  {'blocks':>6}"
+    ]
+    lines.extend(
+        f"{r.name:<{width}}  {r.ops_per_sec:>12,.0f}  {r.usec:>10.2f}"
+        f"  {r.peak_bytes:>9,}  {r.blocks:>6}"
+        for r in results
+    )
+    return "\n".join(lines)
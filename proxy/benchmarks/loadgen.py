@@ -0,0 +1,374 @@
+"""Proxy load generator: N emulated panels, M clients per panel.
+
+Runs the proxy in a subprocess (or targets one with --proxy), drives a
+weighted mix of client requests and panel PUSH traffic, and reports
+per-command throughput and latency percentiles, push fan-out delay and the
+proxy's RSS and CPU over time:
+
+    python -m benchmarks.loadgen --panels 20 --clients 3 --duration 60 \\
+        --mix status=80,arm=5,events=5,pgm=10 --storm-every 10 --json run.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import socket
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from an24net.emulator import PanelEmulator, PanelModel, mac_range
+from an24net.protocol import PUSH_COMMAND, SYNC_ZONE, ClientAMT
+
+PIN = "1234"
+# PUSH payloads carry the load generator's sequence number in the second,
+# unparsed timestamp so deliveries can be matched to sends.
+SEQ_OFFSET = 22
+
+Operation = Callable[[ClientAMT], Awaitable[Any]]
+
+
+async def _arm_disarm(client: ClientAMT) -> None:
+    await client.arm(PIN)
+    await client.disarm(PIN)
+
+
+OPERATIONS: dict[str, Operation] = {
+    "status": lambda client: client.status(),
+    "arm": _arm_disarm,
+    "pgm": lambda client: client.pgm(on=random.random() < 0.5),
+    "events": lambda client: client.fetch_events(),
+    "sync": lambda client: client.sync(SYNC_ZONE, bytes(range(8))),
+}
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    mix: dict[str, float] = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation: {name}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    """p50/p95/p99/max of `values`, in milliseconds."""
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def at(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+
+    return {"p50": at(0.50), "p95": at(0.95), "p99": at(0.99), "max": at(1.0)}
+
+
+class Stats:
+    def __init__(self) -> None:
+        self.latency: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.push_sent: dict[bytes, float] = {}
+        self.push_delay: list[float] = []
+        self.push_expected = 0
+        self.samples: list[dict[str, float]] = []
+
+    def add(self, name: str, seconds: float) -> None:
+        self.latency.setdefault(name, []).append(seconds)
+
+    def error(self, name: str) -> None:
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+
+class ProcSampler:
+    """Samples RSS and CPU of a process from /proc."""
+
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+        self._ticks = os.sysconf("SC_CLK_TCK")
+        self._last: tuple[float, float] | None = None
+
+    def _cpu_seconds(self) -> float:
+        with open(f"/proc/{self.pid}/stat") as f:
+            # Fields after the parenthesized command name; utime and stime
+            # are fields 14 and 15.
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self._ticks
+
+    def _rss_kb(self) -> int:
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+        return 0
+
+    def sample(self) -> dict[str, float]:
+        now, cpu = time.monotonic(), self._cpu_seconds()
+        usage = 0.0
+        if self._last is not None:
+            usage = (cpu - self._last[1]) / (now - self._last[0]) * 100
+        self._last = (now, cpu)
+        return {"rss_kb": self._rss_kb(), "cpu_percent": round(usage, 1)}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _spawn_proxy(port: int) -> asyncio.subprocess.Process:
+    env = {**os.environ, "PORT": str(port), "UPSTREAM": "", "LOG_LEVEL": "WARNING"}
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-c", "from an24net.main import run; run()", env=env
+    )
+    for _ in range(100):
+        with contextlib.suppress(OSError):
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return process
+        await asyncio.sleep(0.05)
+    process.kill()
+    raise RuntimeError("proxy did not start")
+
+
+async def _client_loop(
+    client: ClientAMT,
+    mix: dict[str, float],
+    rate: float,
+    stats: Stats,
+    rng: random.Random,
+) -> None:
+    names, weights = list(mix), list(mix.values())
+    while True:
+        name = rng.choices(names, weights)[0]
+        start = time.perf_counter()
+        try:
+            await OPERATIONS[name](client)
+        except Exception:
+            stats.error(name)
+        else:
+            stats.add(name, time.perf_counter() - start)
+        if rate > 0:
+            await asyncio.sleep(rng.expovariate(rate))
+
+
+async def _push_loop(
+    panel: PanelEmulator,
+    args: argparse.Namespace,
+    stats: Stats,
+    seq: list[int],
+    rng: random.Random,
+) -> None:
+    async def send(count: int) -> None:
+        payloads: list[bytes] = []
+        for _ in range(count):
+            seq[0] += 1
+            event = panel.model.event(1, 130, rng.randint(1, 8))
+            payload = event[:SEQ_OFFSET] + seq[0].to_bytes(6)
+            stats.push_sent[payload[SEQ_OFFSET:]] = time.perf_counter()
+            stats.push_expected += args.clients
+            payloads.append(payload)
+        await panel.push(payloads)
+
+    next_storm = time.monotonic() + args.storm_every if args.storm_every else None
+    while True:
+        delay = rng.expovariate(args.push_rate) if args.push_rate > 0 else 1.0
+        if next_storm is not None:
+            delay = min(delay, max(0.0, next_storm - time.monotonic()))
+        await asyncio.sleep(delay)
+        if next_storm is not None and time.monotonic() >= next_storm:
+            await send(args.storm_size)
+            next_storm += args.storm_every
+        elif args.push_rate > 0:
+            await send(1)
+
+
+async def _wait_registered(clients: list[ClientAMT], timeout: float) -> None:
+    async with asyncio.timeout(timeout):
+        await asyncio.gather(*(client.status() for client in clients))
+
+
+async def run_load(args: argparse.Namespace) -> dict[str, Any]:
+    stats = Stats()
+    rng = random.Random(args.seed)
+    process = None
+    if args.proxy:
+        host, _, port_str = args.proxy.rpartition(":")
+        port = int(port_str)
+    else:
+        host, port = "127.0.0.1", _free_port()
+        process = await _spawn_proxy(port)
+    pid = process.pid if process else args.pid
+    sampler = ProcSampler(pid) if pid else None
+
+    def on_push(data: bytes) -> None:
+        sent = stats.push_sent.get(data[SEQ_OFFSET:])
+        if sent is not None:
+            stats.push_delay.append(time.perf_counter() - sent)
+
+    base = bytes.fromhex(args.mac.replace(":", ""))
+    panels = [
+        PanelEmulator(
+            PanelModel(mac, pin=PIN),
+            host,
+            port,
+            latency=args.latency,
+            jitter=args.jitter,
+            seed=rng.randrange(1 << 32),
+        )
+        for mac in mac_range(base, args.panels)
+    ]
+    clients = [
+        ClientAMT(host, port, panel.model.mac.hex(), PIN)
+        for panel in panels
+        for _ in range(args.clients)
+    ]
+    for client in clients:
+        client.subscribe(PUSH_COMMAND, on_push)
+
+    seq = [0]
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(panel.run()) for panel in panels]
+            await asyncio.gather(*(panel.connected.wait() for panel in panels))
+            await asyncio.sleep(0.1)
+            tasks += [tg.create_task(client.run()) for client in clients]
+            # Clients connecting before the proxy registered their panel are
+            # rejected and retry after 5 s, hence the generous timeout.
+            await _wait_registered(clients, 30)
+
+            started = time.monotonic()
+            tasks += [
+                tg.create_task(_client_loop(client, args.mix, args.rate, stats, rng))
+                for client in clients
+            ]
+            tasks += [
+                tg.create_task(_push_loop(panel, args, stats, seq, rng))
+                for panel in panels
+            ]
+            while (elapsed := time.monotonic() - started) < args.duration:
+                await asyncio.sleep(min(args.interval, args.duration - elapsed))
+                if sampler:
+                    sample = sampler.sample()
+                    sample["t"] = round(time.monotonic() - started, 1)
+                    sample["requests"] = sum(map(len, stats.latency.values()))
+                    stats.samples.append(sample)
+                    print(
+                        f"{sample['t']:6.1f}s  {sample['requests']:8.0f} requests"
+                        f"  rss {sample['rss_kb'] / 1024:7.1f} MiB"
+                        f"  cpu {sample['cpu_percent']:5.1f}%",
+                        file=sys.stderr,
+                    )
+            duration = time.monotonic() - started
+            for task in tasks:
+                task.cancel()
+    finally:
+        if process:
+            process.terminate()
+            await process.wait()
+
+    return {
+        "config": {
+            "panels": args.panels,
+            "clients_per_panel": args.clients,
+            "duration": args.duration,
+            "mix": args.mix,
+            "rate": args.rate,
+            "push_rate": args.push_rate,
+            "storm_every": args.storm_every,
+            "storm_size": args.storm_size,
+            "latency": args.latency,
+            "jitter": args.jitter,
+        },
+        "commands": {
+            name: {
+                "count": len(values),
+                "errors": stats.errors.get(name, 0),
+                "per_second": len(values) / duration,
+                **percentiles(values),
+            }
+            for name, values in sorted(stats.latency.items())
+        },
+        "push": {
+            "sent": len(stats.push_sent),
+            "expected": stats.push_expected,
+            "delivered": len(stats.push_delay),
+            **percentiles(stats.push_delay),
+        },
+        "proxy": {
+            "rss_kb_max": max((s["rss_kb"] for s in stats.samples), default=0),
+            "cpu_percent_mean": (
+                sum(s["cpu_percent"] for s in stats.samples) / len(stats.samples)
+                if stats.samples
+                else 0
+            ),
+            "samples": stats.samples,
+        },
+    }
+
+
+def report(summary: dict[str, Any]) -> str:
+    lines = [
+        f"{'command':<8} {'count':>8} {'err':>5} {'/s':>8}"
+        f" {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+    ]
+    rows = {**summary["commands"], "push": summary["push"]}
+    for name, row in rows.items():
+        count = row.get("count", row.get("delivered", 0))
+        lines.append(
+            f"{name:<8} {count:>8} {row.get('errors', 0):>5}"
+            f" {row.get('per_second', 0):>8.1f}"
+            + "".join(f" {row.get(p, 0):>8.2f}" for p in ("p50", "p95", "p99", "max"))
+        )
+    push = summary["push"]
+    lines.append(f"push delivered {push['delivered']}/{push['expected']}")
+    proxy = summary["proxy"]
+    if proxy["samples"]:
+        lines.append(
+            f"proxy rss max {proxy['rss_kb_max'] / 1024:.1f} MiB,"
+            f" cpu mean {proxy['cpu_percent_mean']:.1f}%"
+        )
+    return "\n".join(lines)
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadgen")
+    parser.add_argument("--proxy", help="host:port of a running proxy")
+    parser.add_argument("--pid", type=int, help="PID of --proxy, for RSS/CPU")
+    parser.add_argument("--panels", type=int, default=10)
+    parser.add_argument("--clients", type=int, default=1, help="per panel")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=parse_mix("status=90,arm=5,events=5"),
+        help=f"weighted operations: {','.join(OPERATIONS)}",
+    )
+    parser.add_argument(
+        "--rate", type=float, default=1.0, help="requests/s per client, 0 = no pause"
+    )
+    parser.add_argument("--push-rate", type=float, default=0.1, help="per panel")
+    parser.add_argument("--storm-every", type=float, default=0.0, help="seconds")
+    parser.add_argument("--storm-size", type=int, default=50, help="pushes")
+    parser.add_argument("--latency", type=float, default=0.0, help="panel seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="panel seconds")
+    parser.add_argument("--interval", type=float, default=1.0, help="sampling")
+    parser.add_argument("--mac", default="00:1a:3f:00:00:01", help="first MAC")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--json", help="write the summary to this file")
+    args = parser.parse_args()
+
+    summary = asyncio.run(run_load(args))
+    print(report(summary))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    run()
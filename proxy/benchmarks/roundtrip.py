@@ -0,0 +1,88 @@
+"""In-process proxy round trips over loopback sockets.
+
+An emulated panel and a ClientAMT connect to handle() on 127.0.0.1, so the
+numbers cover the whole forwarding path: client encode, proxy decode,
+request correlation, panel response and the way back.
+"""
+
+import asyncio
+import contextlib
+import logging
+
+from an24net import main
+from an24net.emulator import PanelEmulator, PanelModel
+from an24net.protocol import PUSH_COMMAND, ClientAMT
+
+from . import corpus
+from .harness import Result, measure
+
+CONCURRENCY = 10
+
+
+def run() -> list[Result]:
+    # Never mirror the benchmark panel to the Intelbras cloud.
+    main.UPSTREAM = ""
+    logger = logging.getLogger("benchmarks.proxy")
+    logger.setLevel(logging.CRITICAL)
+    loop = asyncio.new_event_loop()
+
+    async def handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        assert task is not None
+        tasks.append(task)
+        with contextlib.suppress(Exception, asyncio.CancelledError):
+            await main.handle(logger, reader, writer)
+        writer.close()
+
+    async def start() -> tuple[asyncio.Server, PanelEmulator, ClientAMT]:
+        server = await asyncio.start_server(handler, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        model = PanelModel(corpus.MAC, pin=corpus.PIN)
+        panel = PanelEmulator(model, "127.0.0.1", port)
+        tasks.append(asyncio.create_task(panel.run()))
+        while corpus.MAC not in main.OPEN_CONNECTIONS:
+            await asyncio.sleep(0.001)
+        client = ClientAMT("127.0.0.1", port, corpus.MAC.hex(), corpus.PIN)
+        tasks.append(asyncio.create_task(client.run()))
+        await client.status()
+        return server, panel, client
+
+    async def sequential() -> None:
+        await client.status()
+
+    async def concurrent() -> None:
+        await asyncio.gather(*(client.status() for _ in range(CONCURRENCY)))
+
+    pushed: asyncio.Queue[bytes] = asyncio.Queue()
+    push = corpus.push_payload()
+
+    async def push_fan_out() -> None:
+        await panel.push([push])
+        await pushed.get()
+
+    tasks: list[asyncio.Task[None]] = []
+    try:
+        server, panel, client = loop.run_until_complete(start())
+        client.subscribe(PUSH_COMMAND, pushed.put_nowait)
+        results = [
+            measure(
+                "proxy status round trip",
+                lambda: loop.run_until_complete(sequential()),
+            ),
+            measure(
+                f"proxy status x{CONCURRENCY} concurrent",
+                lambda: loop.run_until_complete(concurrent()),
+                ops=CONCURRENCY,
+            ),
+            measure(
+                "proxy push panel -> client",
+                lambda: loop.run_until_complete(push_fan_out()),
+            ),
+        ]
+        server.close()
+        return results
+    finally:
+        for task in reversed(tasks):
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        loop.close()
@@ -0,0 +1,148 @@
+"""Bounded fan-out of panel pushes to the proxy's subscribers."""
+
+import asyncio
+import logging
+import os
+import weakref
+from collections import Counter
+from enum import StrEnum
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Policy(StrEnum):
+    """What happens to a subscriber that falls `capacity` items behind."""
+
+    # Skip to the oldest item still buffered.
+    DROP_OLDEST = "drop_oldest"
+    # Disconnect the subscriber.
+    DISCONNECT = "disconnect"
+    # Skip to the newest item.
+    COALESCE = "coalesce"
+
+
+PUSH_BUFFER = int(os.environ.get("PUSH_BUFFER", 256))
+PUSH_POLICY = Policy(os.environ.get("PUSH_POLICY", Policy.DROP_OLDEST))
+
+
+class SubscriberOverflow(ConnectionError):
+    def __init__(self, name: str, lag: int) -> None:
+        self.name = name
+        self.lag = lag
+        super().__init__(f"{name} fell {lag} pushes behind")
+
+
+class Subscriber:
+    """A reader of a PushBroadcaster with its own cursor."""
+
+    def __init__(self, broadcaster: "PushBroadcaster", name: str, group: str) -> None:
+        self._broadcaster = broadcaster
+        self.name = name
+        self.group = group
+        self.cursor = broadcaster.head
+        self.delivered = 0
+        self.dropped = 0
+
+    @property
+    def lag(self) -> int:
+        """Number of published items not yet read."""
+        return self._broadcaster.head - self.cursor
+
+    def _catch_up(self) -> None:
+        broadcaster = self._broadcaster
+        lag = broadcaster.head - self.cursor
+        if lag <= broadcaster.capacity:
+            return
+        if broadcaster.policy == Policy.DISCONNECT:
+            raise SubscriberOverflow(self.name, lag)
+        if broadcaster.policy == Policy.COALESCE:
+            cursor = broadcaster.head - 1
+        else:
+            cursor = broadcaster.head - broadcaster.capacity
+        skipped = cursor - self.cursor
+        self.dropped += skipped
+        broadcaster.dropped[self.group] += skipped
+        self.cursor = cursor
+        _LOGGER.warning("%s dropped %d pushes", self.name, skipped)
+
+    def get_nowait(self) -> list[bytes]:
+        """Return the items published since the last read, oldest first."""
+        self._catch_up()
+        items = self._broadcaster.read(self.cursor)
+        self.cursor += len(items)
+        self.delivered += len(items)
+        return items
+
+    async def get(self) -> list[bytes]:
+        """Wait for and return at least one item."""
+        while not self.lag:
+            await self._broadcaster.wait()
+        return self.get_nowait()
+
+    def close(self) -> None:
+        self._broadcaster.unsubscribe(self)
+
+
+class PushBroadcaster:
+    """Ring buffer of pushes shared by all subscribers of a panel.
+
+    publish() stores each item once and wakes waiting subscribers through
+    a single shared future, so its cost doesn't depend on how many
+    subscribers there are. Subscribers read from their own cursor and the
+    overflow policy is applied when they do.
+    """
+
+    def __init__(
+        self, capacity: int = PUSH_BUFFER, policy: Policy = PUSH_POLICY
+    ) -> None:
+        self.capacity = capacity
+        self.policy = policy
+        self.head = 0
+        self._ring: list[bytes] = [b""] * capacity
+        self._wakeup: asyncio.Future[None] | None = None
+        self._subscribers = weakref.WeakSet[Subscriber]()
+        # Items skipped by subscribers, by group, including closed ones.
+        self.dropped = Counter[str]()
+
+    def publish(self, item: bytes) -> None:
+        self._ring[self.head % self.capacity] = item
+        self.head += 1
+        if self._wakeup is not None:
+            if not self._wakeup.done():
+                self._wakeup.set_result(None)
+            self._wakeup = None
+
+    def read(self, cursor: int) -> list[bytes]:
+        """Return the buffered items from `cursor` to the head."""
+        start = cursor % self.capacity
+        stop = start + self.head - cursor
+        if stop <= self.capacity:
+            return self._ring[start:stop]
+        return self._ring[start:] + self._ring[: stop - self.capacity]
+
+    async def wait(self) -> None:
+        """Wait for the next publish()."""
+        if self._wakeup is None:
+            self._wakeup = asyncio.get_running_loop().create_future()
+        # Shielded, so a cancelled subscriber doesn't cancel the others.
+        await asyncio.shield(self._wakeup)
+
+    def subscribe(self, name: str, group: str | None = None) -> Subscriber:
+        """Read pushes published from now on.
+
+        `group` (default `name`) is what stats() reports the subscriber under.
+        """
+        subscriber = Subscriber(self, name, group or name)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    def stats(self) -> dict[str, tuple[int, int]]:
+        """Largest lag of each group's subscribers, and the items it dropped."""
+        stats = {group: (0, dropped) for group, dropped in self.dropped.items()}
+        for subscriber in self._subscribers:
+            lag, dropped = stats.get(subscriber.group, (0, 0))
+            stats[subscriber.group] = (max(lag, subscriber.lag), dropped)
+        return stats
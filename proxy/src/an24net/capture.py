@@ -0,0 +1,417 @@
+"""Binary frame capture for the proxy, and an offline decode/replay tool.
+
+A capture file starts with MAGIC, followed by records of
+[connection*4] [peer] [direction] [MAC*6] [time ns*8] [length*2] [frame...],
+little-endian, where time is wall-clock nanoseconds since the epoch, so
+records from rotated files and proxy restarts line up, and frame is the
+frame as it is on the wire (unencrypted).
+The peer and MAC are unknown (zero) until the connection has identified
+itself, so handshake frames are matched to a panel by connection.
+
+    python -m an24net.capture show capture.bin --mac 00:1a:3f:aa:bb:cc
+    python -m an24net.capture replay capture.bin --proxy 127.0.0.1:9009 --speed 10
+    python -m an24net.capture replay capture.bin --listen 9010
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import mmap
+import os
+import struct
+import sys
+import time
+from collections.abc import Callable, Iterator
+from enum import IntEnum
+from itertools import count
+from typing import NamedTuple
+
+from an24net.metrics import count_frame
+from an24net.protocol import (
+    CONN_PROXY,
+    CONN_SUCCESS,
+    CONNECTION_COMMAND,
+    OK,
+    PING_COMMAND,
+    XOR_COMMAND,
+    FrameDecoder,
+    FramedWriter,
+    command_to_str,
+    encode_frame,
+)
+
+MAGIC = b"AN24CAP\x01"
+RECORD = struct.Struct("<IBB6sQH")
+NO_MAC = bytes(6)
+
+CAPTURE = os.environ.get("CAPTURE", "")
+CAPTURE_MAX_BYTES = int(os.environ.get("CAPTURE_MAX_BYTES", 64 * 1024 * 1024))
+CAPTURE_BACKUPS = int(os.environ.get("CAPTURE_BACKUPS", 5))
+
+
+class Peer(IntEnum):
+    UNKNOWN = 0
+    ALARM = 1
+    CLIENT = 2
+    UPSTREAM = 3
+
+
+class Direction(IntEnum):
+    # Received by the proxy.
+    RX = 0
+    # Sent by the proxy.
+    TX = 1
+
+
+class Record(NamedTuple):
+    conn: int
+    peer: Peer
+    direction: Direction
+    mac: bytes
+    time_ns: int
+    frame: bytes
+
+    @property
+    def _framed(self) -> bool:
+        # Unframed: PING, OK and the raw CONNECTION replies.
+        return len(self.frame) > 1 and self.frame[0] + 2 == len(self.frame)
+
+    @property
+    def command(self) -> int:
+        return self.frame[1] if self._framed else self.frame[0]
+
+    @property
+    def data(self) -> bytes:
+        return self.frame[2:-1] if self._framed else self.frame[1:]
+
+
+class CaptureFile:
+    """Append-only capture writer, rotated like RotatingFileHandler.
+
+    Once the file reaches `max_bytes` it is renamed to path.1 (shifting
+    older files up to path.<backups>) and a new file is started.
+    """
+
+    def __init__(self, path: str, max_bytes: int, backups: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._file = self._open()
+
+    def _open(self) -> io.BufferedWriter:
+        file = open(self.path, "ab")
+        if file.tell() == 0:
+            file.write(MAGIC)
+        return file
+
+    def _rotate(self) -> None:
+        self._file.close()
+        for i in range(self.backups - 1, 0, -1):
+            with contextlib.suppress(FileNotFoundError):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = self._open()
+
+    def write(
+        self, conn: int, peer: Peer, direction: Direction, mac: bytes, frame: bytes
+    ) -> None:
+        header = RECORD.pack(conn, peer, direction, mac, time.time_ns(), len(frame))
+        self._file.write(header + frame)
+        if self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+_capture: CaptureFile | None = None
+_conn_ids = count(1)
+
+
+def open_capture() -> CaptureFile | None:
+    """Start capturing to CAPTURE, if set."""
+    global _capture
+    if CAPTURE:
+        _capture = CaptureFile(CAPTURE, CAPTURE_MAX_BYTES, CAPTURE_BACKUPS)
+    return _capture
+
+
+class Tap:
+    """Counts the frames of one connection, and records them if capturing."""
+
+    __slots__ = ("conn", "peer", "mac")
+
+    def __init__(
+        self,
+        peer: Peer = Peer.UNKNOWN,
+        mac: bytes = NO_MAC,
+        conn: int | None = None,
+    ) -> None:
+        self.conn = next(_conn_ids) if conn is None else conn
+        self.peer = peer
+        self.mac = mac
+
+    def frame(self, direction: Direction, command: int, data: bytes = b"") -> None:
+        # Length, command and checksum, except for the unframed PING and OK.
+        size = 1 if command in (PING_COMMAND, OK) else len(data) + 3
+        count_frame(self.peer, direction, command, size)
+        if _capture is not None:
+            frame = encode_frame(command, data)
+            _capture.write(self.conn, self.peer, direction, self.mac, frame)
+
+    def raw(
+        self,
+        direction: Direction,
+        frame: bytes | memoryview,
+        command: int | None = None,
+    ) -> None:
+        """Count and record a frame as on the wire.
+
+        `command` defaults to the first byte, for the unframed replies.
+        """
+        command = frame[0] if command is None else command
+        count_frame(self.peer, direction, command, len(frame))
+        if _capture is not None:
+            _capture.write(self.conn, self.peer, direction, self.mac, bytes(frame))
+
+
+class TappedWriter(FramedWriter):
+    """FramedWriter that records every frame it sends."""
+
+    def __init__(self, writer: asyncio.StreamWriter, tap: Tap) -> None:
+        super().__init__(writer)
+        self.tap = tap
+
+    def write(self, command: int, data: bytes = b"") -> None:
+        self.tap.frame(Direction.TX, command, data)
+        super().write(command, data)
+
+    def write_raw(self, command: int, frame: bytes | memoryview) -> None:
+        self.tap.raw(Direction.TX, frame, command)
+        super().write_raw(command, frame)
+
+
+def read_records(path: str) -> Iterator[Record]:
+    """Iterate over the records of a capture file through mmap.
+
+    A record cut short by a crash at the end of the file is ignored.
+    """
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size <= len(MAGIC):
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            if buf[: len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path}: not a capture file")
+            pos = len(MAGIC)
+            end = len(buf)
+            while pos + RECORD.size <= end:
+                conn, peer, direction, mac, time_ns, length = RECORD.unpack_from(
+                    buf, pos
+                )
+                pos += RECORD.size
+                if pos + length > end:
+                    break
+                frame = buf[pos : pos + length]
+                pos += length
+                yield Record(
+                    conn, Peer(peer), Direction(direction), mac, time_ns, frame
+                )
+
+
+def filter_records(
+    records: Callable[[], Iterator[Record]],
+    *,
+    mac: bytes | None = None,
+    commands: set[int] | None = None,
+    start: float | None = None,
+    end: float | None = None,
+) -> Iterator[Record]:
+    """Select records by MAC, command and time range.
+
+    A MAC selects whole connections, including their handshake frames, so
+    `records` is called twice. start and end are seconds since the first
+    record.
+    """
+    conns: set[int] | None = None
+    if mac is not None:
+        conns = {record.conn for record in records() if record.mac == mac}
+    first: int | None = None
+    for record in records():
+        if first is None:
+            first = record.time_ns
+        elapsed = (record.time_ns - first) / 1e9
+        if start is not None and elapsed < start:
+            continue
+        if end is not None and elapsed > end:
+            break
+        if conns is not None and record.conn not in conns:
+            continue
+        if commands is not None and record.command not in commands:
+            continue
+        yield record
+
+
+def format_record(record: Record, first_ns: int) -> str:
+    arrow = "←" if record.direction == Direction.RX else "→"
+    return (
+        f"{(record.time_ns - first_ns) / 1e9:12.6f} {record.conn:5}"
+        f" {record.mac.hex(':')} {record.peer.name.lower():8} {arrow}"
+        f" {command_to_str(record.command, record.data)}"
+        f" | {record.frame.hex(':')}"
+    )
+
+
+async def _sleep_until(start: float, offset_ns: int, speed: float) -> None:
+    delay = start + offset_ns / 1e9 / speed - time.monotonic()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+async def _drain(reader: asyncio.StreamReader) -> None:
+    with contextlib.suppress(ConnectionError):
+        while await reader.read(65536):
+            pass
+
+
+async def _send_timed(
+    writer: asyncio.StreamWriter, records: list[Record], speed: float
+) -> None:
+    start = time.monotonic()
+    first = records[0].time_ns
+    for record in records:
+        if speed:
+            await _sleep_until(start, record.time_ns - first, speed)
+        writer.write(record.frame)
+        await writer.drain()
+
+
+async def replay_to_proxy(
+    records: list[Record], host: str, port: int, speed: float
+) -> None:
+    """Play panel and client frames back into a proxy, one connection each.
+
+    Responses are read and discarded; speed 0 sends as fast as possible.
+    """
+    streams: dict[int, list[Record]] = {}
+    peers: dict[int, Peer] = {}
+    for record in records:
+        if record.peer == Peer.UPSTREAM or record.direction != Direction.RX:
+            continue
+        streams.setdefault(record.conn, []).append(record)
+        if record.peer != Peer.UNKNOWN:
+            peers.setdefault(record.conn, record.peer)
+
+    async def play(stream: list[Record]) -> None:
+        reader, writer = await asyncio.open_connection(host, port)
+        drain = asyncio.create_task(_drain(reader))
+        try:
+            await _send_timed(writer, stream, speed)
+        finally:
+            writer.close()
+            drain.cancel()
+
+    # Panels first, so clients find them registered.
+    panels = [s for conn, s in streams.items() if peers.get(conn) == Peer.ALARM]
+    clients = [s for conn, s in streams.items() if peers.get(conn) == Peer.CLIENT]
+    async with asyncio.TaskGroup() as tg:
+        for stream in panels:
+            tg.create_task(play(stream))
+        await asyncio.sleep(0.5 / speed if speed else 0.1)
+        for stream in clients:
+            tg.create_task(play(stream))
+
+
+async def replay_to_client(records: list[Record], port: int, speed: float) -> None:
+    """Serve the frames the proxy sent to clients to each ClientAMT connecting.
+
+    The handshake is answered live: no encryption and a proxied connection.
+    """
+    stream = [
+        r
+        for r in records
+        if r.peer == Peer.CLIENT
+        and r.direction == Direction.TX
+        and r.command not in (0x00, CONN_SUCCESS)
+    ]
+
+    async def handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        decoder = FrameDecoder()
+        try:
+            command, _ = await decoder.read(reader)
+            if command != XOR_COMMAND:
+                return
+            writer.write(encode_frame(0x00))
+            command, _ = await decoder.read(reader)
+            if command != CONNECTION_COMMAND:
+                return
+            writer.write(bytes([CONN_SUCCESS, CONN_PROXY]))
+            drain = asyncio.create_task(_drain(reader))
+            if stream:
+                await _send_timed(writer, stream, speed)
+            await drain
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handler, "0.0.0.0", port)
+    print(f"serving {len(stream)} frames on 0.0.0.0:{port}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def _parse_mac(value: str) -> bytes:
+    return bytes.fromhex(value.replace(":", ""))
+
+
+def _parse_commands(value: str) -> set[int]:
+    return {int(item, 16) for item in value.split(",")}
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser(prog="python -m an24net.capture")
+    parser.add_argument("action", choices=["show", "replay"])
+    parser.add_argument("files", nargs="+", help="capture files, oldest first")
+    parser.add_argument("--mac", type=_parse_mac)
+    parser.add_argument("--command", type=_parse_commands, help="hex codes, e.g. e9,b4")
+    parser.add_argument("--start", type=float, help="seconds after the first frame")
+    parser.add_argument("--end", type=float, help="seconds after the first frame")
+    parser.add_argument("--proxy", help="replay panels and clients into host:port")
+    parser.add_argument("--listen", type=int, help="replay to ClientAMT on this port")
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="time scale, 0 = no delays"
+    )
+    args = parser.parse_args()
+
+    def records() -> Iterator[Record]:
+        for path in args.files:
+            yield from read_records(path)
+
+    selected = filter_records(
+        records, mac=args.mac, commands=args.command, start=args.start, end=args.end
+    )
+
+    if args.action == "show":
+        first: int | None = None
+        for record in selected:
+            if first is None:
+                first = record.time_ns
+            print(format_record(record, first))
+        return
+
+    selected_list = list(selected)
+    if not selected_list:
+        parser.error("no frames selected")
+    if args.proxy:
+        host, _, port = args.proxy.rpartition(":")
+        asyncio.run(replay_to_proxy(selected_list, host, int(port), args.speed))
+    elif args.listen:
+        asyncio.run(replay_to_client(selected_list, args.listen, args.speed))
+    else:
+        parser.error("replay needs --proxy or --listen")
+
+
+if __name__ == "__main__":
+    run()
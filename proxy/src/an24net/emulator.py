@@ -0,0 +1,543 @@
+"""AN-24 Net panel emulator for local load and integration testing.
+
+Emulated panels connect to a proxy like real ones (START, MAC, VERSION and
+TIME handshake), answer MY_HOME requests from a modeled state and push
+events on a random or scripted schedule:
+
+    python -m an24net.emulator --proxy 127.0.0.1:9009 --panels 50 --push-rate 0.2
+
+A script has one "<seconds> <action> [args]" line per step, timed from the
+connection, e.g. "5 open 3", "6 close 3", "10 ac off", "12 battery 2 low",
+"15 arm", "20 disarm", "25 pgm on" or "30 event 1 147 4".
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+from collections.abc import Iterator
+
+from an24net.protocol import (
+    BATTERY_OFFSET,
+    CHAR_TABLE,
+    DELIMITER,
+    ERR_OPEN_ZONE,
+    ERR_WRONG_PASSWORD,
+    EVENT_RECORD_SIZE,
+    MAC_COMMAND,
+    MY_HOME,
+    NAME_LENGTH,
+    OK,
+    PING_COMMAND,
+    PUSH_COMMAND,
+    START_COMMAND,
+    SYNC_COMMAND,
+    SYNC_EMPTY,
+    SYNC_EVENT,
+    SYNC_FETCH,
+    SYNC_MARKER,
+    SYNC_NAME,
+    SYNC_USER,
+    SYNC_ZONE,
+    TIME_COMMAND,
+    VERSION_COMMAND,
+    VERSION_OFFSET,
+    FrameDecoder,
+    FramedWriter,
+    MyHomeCommands,
+    Status,
+    checksum,
+    mask_to_zones,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+EVENTS = 128
+START_DATA = b"\x45\x12\x12\x52\x57\x19"
+PING_INTERVAL = 30
+
+# Stay modifier and partition B selector in ARM requests.
+ARM_STAY = 0x50
+PARTITION_B = 0x42
+
+# Contact ID (qualifier, code) of the events the model generates.
+CID_BURGLARY = (1, 130)
+CID_BURGLARY_RESTORE = (3, 130)
+CID_POWER_FAILURE = (1, 301)
+CID_POWER_RESTORE = (3, 301)
+CID_LOW_BATTERY = (1, 384)
+CID_BATTERY_RESTORE = (3, 384)
+CID_DISARM = (1, 401)
+CID_ARM = (3, 401)
+CID_PGM_ON = (1, 422)
+CID_PGM_OFF = (3, 422)
+
+_ENCODE_TABLE = {ord(char): code for code, char in CHAR_TABLE.items()}
+
+
+def encode_text(text: str) -> bytes:
+    """Encode text with the panel's character map (inverse of decode_text)."""
+    return text.translate(_ENCODE_TABLE).encode("latin-1", "replace")
+
+
+def _digit(n: int) -> int:
+    # CID digits are one per byte, with 0 sent as 0x0A.
+    return n or 0x0A
+
+
+def _bcd(n: int) -> int:
+    return (n // 10) << 4 | n % 10
+
+
+def _messages(type: int, marker: int, body: bytes) -> bytes:
+    """MESSAGES response payload, ending with its inner checksum."""
+    header = bytes([0x00, MyHomeCommands.MESSAGES.code, 0x00, 0x00, 0x00])
+    data = bytes([*header, len(body) + 2, type, marker, 0x00, *body])
+    return data + bytes([checksum(data)])
+
+
+class PanelModel:
+    """Modeled panel state, answering MY_HOME requests without any IO.
+
+    The STATUS payload is kept in a Status; events go to a 128-entry ring
+    in the fetch record layout and are returned as PUSH payloads.
+    """
+
+    def __init__(
+        self,
+        mac: bytes,
+        *,
+        pin: str = "1234",
+        zones: int = 8,
+        name: str = "AN-24 Net",
+    ) -> None:
+        self.mac = mac
+        self.pin = pin
+        self.version = b"1.0"
+        data = bytearray(54)
+        data[VERSION_OFFSET] = 0x01
+        data[BATTERY_OFFSET] = 0b1111  # fully charged
+        self.status = Status(bytes(data))
+        for i in range(zones):
+            self.status.set_zone(i, "enabled", True)
+        self.name = name
+        self.zone_names = [f"Zona {i + 1:02d}" for i in range(24)]
+        self.user_names = [f"Usuário {i:02d}" for i in range(100)]
+        self.ring = bytearray(EVENTS * EVENT_RECORD_SIZE)
+        self.pointer = 0
+        self.written = 0
+
+    # Events
+
+    def event(self, qualifier: int, code: int, zone: int = 0) -> bytes:
+        """Log an event in the ring and return its PUSH payload."""
+        now = time.localtime()
+        year = now.tm_year % 100
+        index = self.pointer
+        record = bytes(
+            [
+                0x00,
+                index,
+                _bcd(year),
+                _bcd(now.tm_mon),
+                _bcd(now.tm_mday),
+                _bcd(now.tm_hour),
+                _bcd(now.tm_min),
+                _bcd(now.tm_sec),
+                qualifier << 4 | code // 100,
+                _digit(code // 10 % 10) << 4 | _digit(code % 10),
+                0xAA,
+                0x0A,
+                zone or 0x0A,
+                zone or 0x0A,
+                0x00,
+            ]
+        )
+        offset = index * EVENT_RECORD_SIZE
+        self.ring[offset : offset + EVENT_RECORD_SIZE] = record
+        self.pointer = (index + 1) % EVENTS
+        self.written = min(self.written + 1, EVENTS)
+
+        timestamp = [now.tm_mday, now.tm_mon, year, now.tm_hour, now.tm_min, now.tm_sec]
+        return bytes(
+            [
+                0x00,
+                *map(_digit, (1, 2, 3, 4)),  # account
+                1,
+                8,  # message type 18 (Contact ID)
+                qualifier,
+                *map(_digit, (code // 100, code // 10 % 10, code % 10)),
+                _digit(0),
+                _digit(0),  # group
+                *map(_digit, (zone // 100, zone // 10 % 10, zone % 10)),
+                *timestamp,
+                *timestamp,
+            ]
+        )
+
+    def _written(self, index: int) -> bool:
+        return (self.pointer - 1 - index) % EVENTS < self.written
+
+    # State changes, returning the PUSH payloads they generate
+
+    @property
+    def armed(self) -> bool:
+        return self.status.partition_a_armed or self.status.partition_b_armed
+
+    def set_zone_open(self, zone: int, open: bool) -> list[bytes]:
+        """Open or close `zone` (1-based), triggering the siren when armed."""
+        index = zone - 1
+        if self.status.zone(index).open == open:
+            return []
+        self.status.set_zone(index, "open", open)
+        watched = (
+            self.status.zone(index).enabled and not self.status.zone(index).annulled
+        )
+        if self.status.partition_b_armed and not self.status.partition_a_armed:
+            watched = watched and not self.status.zone(index).stay
+        if not (self.armed and watched):
+            return []
+        if open:
+            self.status.set_zone(index, "violated", True)
+            self.status.set_flag("sirenTriggered", True)
+            return [self.event(*CID_BURGLARY, zone)]
+        return [self.event(*CID_BURGLARY_RESTORE, zone)]
+
+    def set_ac(self, on: bool) -> list[bytes]:
+        if self.status.no_energy == (not on):
+            return []
+        self.status.set_flag("no_energy", not on)
+        return [self.event(*(CID_POWER_RESTORE if on else CID_POWER_FAILURE))]
+
+    def set_zone_battery(self, zone: int, low: bool) -> list[bytes]:
+        index = zone - 1
+        if self.status.zone(index).low_battery == low:
+            return []
+        self.status.set_zone(index, "low_battery", low)
+        cid = CID_LOW_BATTERY if low else CID_BATTERY_RESTORE
+        return [self.event(*cid, zone)]
+
+    def arm(self, *, stay: bool = False) -> list[bytes] | None:
+        """Arm the panel, or return None if a watched zone is open."""
+        open_zones = self.status.open_mask & self.status.enabled_mask
+        open_zones &= ~self.status.annulled_mask
+        if stay:
+            open_zones &= ~self.status.stay_mask
+        if open_zones:
+            return None
+        self.status.set_flag("partitionAArmed", not stay)
+        self.status.set_flag("partitionBArmed", True)
+        return [self.event(*CID_ARM)]
+
+    def disarm(self) -> list[bytes]:
+        was_armed = self.armed
+        self.status.set_flag("partitionAArmed", False)
+        self.status.set_flag("partitionBArmed", False)
+        self.status.set_flag("sirenTriggered", False)
+        for zone in mask_to_zones(self.status.violated_mask):
+            self.status.set_zone(zone - 1, "violated", False)
+        return [self.event(*CID_DISARM)] if was_armed else []
+
+    def set_pgm(self, on: bool) -> list[bytes]:
+        if self.status.pgm == on:
+            return []
+        self.status.set_flag("pgm", on)
+        return [self.event(*(CID_PGM_ON if on else CID_PGM_OFF))]
+
+    # Requests
+
+    def handle(self, data: bytes) -> tuple[bytes, list[bytes]]:
+        """Answer a MY_HOME request: (response payload, PUSH payloads)."""
+        if len(data) < 7 or data[0] != DELIMITER or data[-1] != DELIMITER:
+            return bytes([OK]), []
+        if data[1:5].decode("latin-1") != self.pin:
+            return bytes([ERR_WRONG_PASSWORD]), []
+        command = data[5]
+        args = data[6:-1]
+
+        pushes: list[bytes] = []
+        if command == MyHomeCommands.STATUS.code:
+            return self.status.raw, []
+        if command == MyHomeCommands.ARM.code:
+            stay = ARM_STAY in args[1:] or args[:1] == bytes([PARTITION_B])
+            armed = self.arm(stay=stay)
+            if armed is None:
+                return bytes([ERR_OPEN_ZONE]), []
+            pushes = armed
+        elif command == MyHomeCommands.DISARM.code:
+            pushes = self.disarm()
+        elif command == MyHomeCommands.PANIC.code:
+            if args[:1] == MyHomeCommands.PANIC.factory(audible=True):
+                self.status.set_flag("sirenTriggered", True)
+        elif command == MyHomeCommands.BYPASS.code:
+            mask = int.from_bytes(args[:3], byteorder="little")
+            for i in range(24):
+                self.status.set_zone(i, "annulled", bool(mask >> i & 1))
+        elif command == MyHomeCommands.PGM.code:
+            pushes = self.set_pgm(args == MyHomeCommands.PGM.factory(on=True))
+        elif command == SYNC_COMMAND:
+            return self._sync(args), []
+        return bytes([OK]), pushes
+
+    def _sync(self, args: bytes) -> bytes:
+        # [0x00, 0x00, MESSAGES, 0x00, length, type, marker, *indexes, checksum]
+        type = args[5]
+        indexes = args[7:-1]
+        if type == SYNC_EVENT:
+            return _messages(SYNC_EVENT, 0x03, bytes([self.pointer]))
+        if type == SYNC_FETCH:
+            records = bytearray()
+            for index in indexes[1::2]:
+                if index < EVENTS and self._written(index):
+                    offset = index * EVENT_RECORD_SIZE
+                    records += self.ring[offset : offset + EVENT_RECORD_SIZE]
+            if not records:
+                return _messages(SYNC_EMPTY, 0x00, b"")
+            data = bytes([0x00, MyHomeCommands.MESSAGES.code, 0x00, 0x00, 0x00])
+            return data + bytes([len(records) + 2, SYNC_FETCH, 0x00]) + records
+        if type == SYNC_NAME:
+            names = [self.name]
+        elif type == SYNC_ZONE:
+            names = [self.zone_names[i] for i in indexes if i < 24]
+        elif type == SYNC_USER:
+            names = [self.user_names[i] for i in indexes if i < 100]
+        else:
+            return _messages(SYNC_EMPTY, 0x00, b"")
+        slots = [encode_text(name)[:NAME_LENGTH].ljust(NAME_LENGTH) for name in names]
+        return _messages(type, SYNC_MARKER, b"\x00".join(slots))
+
+
+Step = tuple[float, str, list[str]]
+
+
+def parse_script(text: str) -> list[Step]:
+    """Parse "<seconds> <action> [args]" lines, ignoring blanks and # comments."""
+    steps: list[Step] = []
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        at, action, *args = line.split()
+        steps.append((float(at), action, args))
+    return sorted(steps, key=lambda step: step[0])
+
+
+def apply_step(model: PanelModel, action: str, args: list[str]) -> list[bytes]:
+    """Apply a script action to the model, returning the PUSH payloads."""
+    if action in ("open", "close"):
+        return model.set_zone_open(int(args[0]), action == "open")
+    if action == "ac":
+        return model.set_ac(args[0] == "on")
+    if action == "battery":
+        return model.set_zone_battery(int(args[0]), args[1] == "low")
+    if action == "arm":
+        return model.arm(stay=args[:1] == ["stay"]) or []
+    if action == "disarm":
+        return model.disarm()
+    if action == "pgm":
+        return model.set_pgm(args[0] == "on")
+    if action == "event":
+        qualifier, code, *zone = map(int, args)
+        return [model.event(qualifier, code, *zone)]
+    raise ValueError(f"Unknown script action: {action}")
+
+
+def random_steps(model: PanelModel, rng: random.Random) -> Iterator[list[bytes]]:
+    """Endless zone openings and closings on random enabled zones."""
+    zones = mask_to_zones(model.status.enabled_mask) or [1]
+    while True:
+        zone = rng.choice(zones)
+        opened = not model.status.zone(zone - 1).open
+        pushes = model.set_zone_open(zone, opened)
+        if not pushes:
+            # Disarmed panels don't report zones; push the event anyway so
+            # the schedule drives a steady push rate.
+            cid = CID_BURGLARY if opened else CID_BURGLARY_RESTORE
+            pushes = [model.event(*cid, zone)]
+        yield pushes
+
+
+class PanelEmulator:
+    """Drives a PanelModel over a connection to the proxy.
+
+    Responses are delayed by `latency` plus up to `jitter` seconds. Events
+    come from `script`, or at `push_rate` per second on average.
+    """
+
+    def __init__(
+        self,
+        model: PanelModel,
+        host: str,
+        port: int,
+        *,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        push_rate: float = 0.0,
+        script: list[Step] | None = None,
+        tz: int = 3,
+        seed: int | None = None,
+    ) -> None:
+        self.model = model
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.push_rate = push_rate
+        self.script = script
+        self.tz = tz
+        self.rng = random.Random(seed)
+        self.connected = asyncio.Event()
+        self._framed: FramedWriter | None = None
+        self.logger = _LOGGER.getChild(model.mac.hex(":"))
+
+    async def push(self, payloads: list[bytes]) -> None:
+        framed = self._framed
+        if framed is None or not payloads:
+            return
+        for data in payloads:
+            framed.write(PUSH_COMMAND, data)
+        await framed.flush()
+
+    async def _delay(self) -> None:
+        delay = self.latency + self.rng.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _handshake(
+        self, reader: asyncio.StreamReader, decoder: FrameDecoder, framed: FramedWriter
+    ) -> None:
+        async def expect(command: int) -> None:
+            received, _ = await decoder.read(reader)
+            if received != command:
+                raise Exception(f"Expected 0x{command:02x}, got 0x{received:02x}")
+
+        framed.write(START_COMMAND, START_DATA)
+        await framed.flush()
+        await expect(OK)
+        await expect(MAC_COMMAND)
+        framed.write(MAC_COMMAND, self.model.mac)
+        await framed.flush()
+        await expect(VERSION_COMMAND)
+        framed.write(VERSION_COMMAND, self.model.version)
+        framed.write(TIME_COMMAND, bytes([self.tz]))
+        await framed.flush()
+
+    async def _serve(self, reader: asyncio.StreamReader, decoder: FrameDecoder) -> None:
+        framed = self._framed
+        assert framed is not None
+        while True:
+            command, payload = await decoder.read(reader)
+            if command in (OK, TIME_COMMAND):
+                continue
+            if command != MY_HOME:
+                self.logger.debug("ignoring 0x%02x", command)
+                continue
+            await self._delay()
+            response, pushes = self.model.handle(bytes(payload))
+            framed.write(MY_HOME, response)
+            for data in pushes:
+                framed.write(PUSH_COMMAND, data)
+            if not decoder:
+                await framed.flush()
+
+    async def _ping(self) -> None:
+        framed = self._framed
+        assert framed is not None
+        while True:
+            await asyncio.sleep(PING_INTERVAL)
+            framed.write(PING_COMMAND)
+            await framed.flush()
+
+    async def _events(self) -> None:
+        if self.script is not None:
+            start = time.monotonic()
+            for at, action, args in self.script:
+                await asyncio.sleep(max(0, start + at - time.monotonic()))
+                await self.push(apply_step(self.model, action, args))
+        elif self.push_rate > 0:
+            for pushes in random_steps(self.model, self.rng):
+                await asyncio.sleep(self.rng.expovariate(self.push_rate))
+                await self.push(pushes)
+
+    async def connect(self) -> None:
+        """Run one connection until it is closed."""
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            decoder = FrameDecoder()
+            framed = FramedWriter(writer)
+            await self._handshake(reader, decoder, framed)
+            self._framed = framed
+            self.connected.set()
+            self.logger.info("connected to %s:%d", self.host, self.port)
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(self._serve(reader, decoder))
+                tg.create_task(self._ping())
+                tg.create_task(self._events())
+        finally:
+            self.connected.clear()
+            self._framed = None
+            writer.close()
+
+    async def run(self) -> None:
+        """Keep the panel connected, reconnecting like a real one."""
+        while True:
+            try:
+                await self.connect()
+            except* (OSError, asyncio.IncompleteReadError):
+                self.logger.info("disconnected")
+            await asyncio.sleep(5)
+
+
+def mac_range(base: bytes, count: int) -> list[bytes]:
+    start = int.from_bytes(base)
+    return [(start + i).to_bytes(6) for i in range(count)]
+
+
+async def _run_panels(args: argparse.Namespace) -> None:
+    host, _, port = args.proxy.rpartition(":")
+    script = None
+    if args.script:
+        with open(args.script) as f:
+            script = parse_script(f.read())
+    base = bytes.fromhex(args.mac.replace(":", ""))
+    panels = [
+        PanelEmulator(
+            PanelModel(mac, pin=args.pin, zones=args.zones),
+            host,
+            int(port),
+            latency=args.latency,
+            jitter=args.jitter,
+            push_rate=args.push_rate,
+            script=script,
+            seed=None if args.seed is None else args.seed + i,
+        )
+        for i, mac in enumerate(mac_range(base, args.panels))
+    ]
+    async with asyncio.TaskGroup() as tg:
+        for panel in panels:
+            tg.create_task(panel.run())
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser(prog="python -m an24net.emulator")
+    parser.add_argument("--proxy", default="127.0.0.1:9009", help="host:port")
+    parser.add_argument("--panels", type=int, default=1)
+    parser.add_argument("--mac", default="00:1a:3f:00:00:01", help="first MAC")
+    parser.add_argument("--pin", default="1234")
+    parser.add_argument("--zones", type=int, default=8, help="enabled zones")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="seconds")
+    parser.add_argument(
+        "--push-rate", type=float, default=0.0, help="random events/s per panel"
+    )
+    parser.add_argument("--script", help="file with scripted events")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_run_panels(args))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,226 @@
+"""Proxy-side mirror of each panel's 128-entry event ring.
+
+ClientAMT.fetch_events() and the Intelbras app read the event log with an
+event pointer request and 13 SYNC_FETCH batches. The mirror keeps a copy
+of the ring, reading from the panel only the slots written since its last
+refresh (all of them when the ring may have wrapped), and answers those
+requests itself. It refreshes after pushes and
+commands (see mark_stale), every EVENT_MIRROR_INTERVAL seconds, and
+before answering when it may be out of date.
+
+The panel is read with the PIN of a client request it accepted, and only
+requests with that same PIN are answered from the mirror; any other PIN
+is checked against the panel first.
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+from collections.abc import Awaitable, Callable, Hashable, Sequence
+from itertools import batched
+
+from an24net.protocol import (
+    EVENT_RECORD_SIZE,
+    MY_HOME,
+    SYNC_COMMAND,
+    SYNC_EMPTY,
+    SYNC_EVENT,
+    SYNC_FETCH,
+    Frame,
+    checksum,
+    event_fetch_data,
+    event_pointer_data,
+    my_home_data,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+EVENTS = 128
+# Slots per SYNC_FETCH, as ClientAMT.fetch_events() reads them.
+FETCH_BATCH = 10
+# Seconds between refreshes without pushes; 0 disables the mirror.
+EVENT_MIRROR_INTERVAL = float(os.environ.get("EVENT_MIRROR_INTERVAL", 300))
+
+REQUESTER = "event mirror"
+
+Request = Callable[[int, bytes, Hashable], Awaitable[Frame]]
+
+
+def sync_request(data: bytes) -> tuple[int, bytes] | None:
+    """SYNC type and indexes of MY_HOME request data, if it is a SYNC."""
+    # [DELIMITER] [PIN*4] [SYNC_COMMAND]
+    # [0x00 0x00 MESSAGES 0x00 length type marker indexes... checksum] [DELIMITER]
+    if len(data) < 15 or data[5] != SYNC_COMMAND:
+        return None
+    return data[11], data[13:-2]
+
+
+class EventMirror:
+    def __init__(self, request: Request) -> None:
+        self._request = request
+        # Ring slots by index, None when empty.
+        self.slots: list[bytes | None] = [None] * EVENTS
+        # Write pointer as of the last refresh, None before the first.
+        self.pointer: int | None = None
+        self.hits = 0
+        self._pin: bytes | None = None
+        self._pointer_response = b""
+        # Learned from the panel's SYNC_FETCH responses: the header, the
+        # length byte minus the record bytes, and whether an inner checksum
+        # follows the records.
+        self._fetch_format: tuple[bytes, int, bool] | None = None
+        self._empty_response: bytes | None = None
+        self._generation = 0
+        self._synced = -1
+        # Pushes since the last refresh.
+        self._pushes = 0
+        self._stale = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    @property
+    def current(self) -> bool:
+        return self.pointer is not None and self._synced == self._generation
+
+    def mark_stale(self) -> None:
+        """The panel may have logged events; refresh before answering."""
+        self._generation += 1
+        self._stale.set()
+
+    def pushed(self) -> None:
+        """Count a push: the panel logged at least one event."""
+        self._pushes += 1
+
+    async def answer(self, data: bytes) -> bytes | None:
+        """Response to MY_HOME request `data`, or None to forward it."""
+        if not EVENT_MIRROR_INTERVAL or (request := sync_request(data)) is None:
+            return None
+        type, indexes = request
+        if type == SYNC_EVENT:
+            if indexes != b"\x00":
+                return None
+        elif type != SYNC_FETCH or len(indexes) > 2 * FETCH_BATCH:
+            return None
+
+        pin = data[1:5]
+        if (pin != self._pin or not self.current) and not await self.refresh(pin):
+            return None
+        if type == SYNC_EVENT:
+            response = self._pointer_response
+        else:
+            response = self._fetch_response(indexes[1::2])
+        if response is not None:
+            self.hits += 1
+        return response
+
+    async def refresh(self, pin: bytes) -> bool:
+        """Bring the mirror up to date reading with `pin`.
+
+        False when the panel refused the PIN.
+        """
+        async with self._lock:
+            if pin == self._pin and self.current:
+                return True
+            return await self._refresh(pin)
+
+    async def _refresh(self, pin: bytes) -> bool:
+        generation = self._generation
+        pushes = self._pushes
+        password = pin.decode("latin-1")
+        response = (
+            await self._request(
+                MY_HOME,
+                my_home_data(password, SYNC_COMMAND, event_pointer_data()),
+                REQUESTER,
+            )
+        ).data
+        if len(response) < 10:
+            # Wrong password.
+            if pin == self._pin:
+                self._pin = None
+            return False
+        pointer = response[9] % EVENTS
+
+        indices: Sequence[int] = range(EVENTS)
+        if self.pointer is not None:
+            written = (pointer - self.pointer) % EVENTS
+            # Every push logged an event, but the pointer only tells where
+            # they ended modulo EVENTS: fewer slots than pushes means it
+            # went all the way around. Wraps through events that aren't
+            # pushed go unnoticed.
+            if written >= pushes:
+                indices = [(self.pointer + i) % EVENTS for i in range(written)]
+        for batch in batched(indices, FETCH_BATCH):
+            records = (
+                await self._request(
+                    MY_HOME,
+                    my_home_data(password, SYNC_COMMAND, event_fetch_data(batch)),
+                    REQUESTER,
+                )
+            ).data
+            if len(records) < 8:
+                return False
+            self._store(batch, records)
+
+        _LOGGER.debug("read %d event slots, pointer %d", len(indices), pointer)
+        self.pointer = pointer
+        self._pointer_response = response
+        self._pin = pin
+        self._synced = generation
+        self._pushes -= pushes
+        return True
+
+    def _store(self, batch: tuple[int, ...], response: bytes) -> None:
+        for index in batch:
+            self.slots[index] = None
+        if response[6] == SYNC_EMPTY:
+            self._empty_response = response
+            return
+        records = response[8:]
+        size = len(records) - len(records) % EVENT_RECORD_SIZE
+        self._fetch_format = (
+            response[:8],
+            response[5] - size,
+            len(records) > size,
+        )
+        for offset in range(0, size, EVENT_RECORD_SIZE):
+            record = records[offset : offset + EVENT_RECORD_SIZE]
+            if record[1] in batch:
+                self.slots[record[1]] = record
+
+    def _fetch_response(self, indices: bytes) -> bytes | None:
+        records = b"".join(
+            slot for index in indices if index < EVENTS and (slot := self.slots[index])
+        )
+        if not records:
+            return self._empty_response
+        if self._fetch_format is None:
+            return None
+        header, extra, inner_checksum = self._fetch_format
+        data = bytes([*header[:5], len(records) + extra, *header[6:]]) + records
+        if inner_checksum:
+            data += bytes([checksum(data)])
+        return data
+
+    async def run(self) -> None:
+        """Refresh after mark_stale() and every EVENT_MIRROR_INTERVAL seconds.
+
+        Nothing is read until a client's PIN is known.
+        """
+        if not EVENT_MIRROR_INTERVAL:
+            return
+        while True:
+            with contextlib.suppress(TimeoutError):
+                async with asyncio.timeout(EVENT_MIRROR_INTERVAL):
+                    await self._stale.wait()
+            self._stale.clear()
+            try:
+                async with self._lock:
+                    # Also when current: not every event is pushed.
+                    if self._pin is not None:
+                        await self._refresh(self._pin)
+            except TimeoutError:
+                _LOGGER.warning("timeout refreshing the event mirror")
+            except OSError as ex:
+                # The panel disconnected; its next session refreshes again.
+                _LOGGER.warning("event mirror refresh failed: %s", ex)
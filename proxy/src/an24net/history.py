@@ -0,0 +1,261 @@
+"""Persistent per-panel log of the pushes the proxy relays.
+
+With PUSH_LOG set to a directory, each panel's pushes are appended to
+<mac>.log there: MAGIC, then records of
+[length*2] [seq*8] [time*8] [crc32*4] [push data...], little-endian,
+where the CRC covers the rest of the header and the data. Every
+INDEX_INTERVAL-th record is also appended to <mac>.idx as
+[seq*8] [time*8] [offset*8], a sparse index locating where a query by
+sequence number or time starts without reading the whole log.
+
+Opening a log truncates a record cut short or corrupted by a crash,
+along with anything after it.
+"""
+
+import logging
+import os
+import struct
+import time
+import zlib
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterator
+
+from an24net.protocol import (
+    HISTORY_MAX_PUSHES,
+    HISTORY_REQUEST,
+    PROXY_HISTORY,
+    StoredPush,
+    encode_history,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+MAGIC = b"AN24PSH\x01"
+RECORD = struct.Struct("<HQQI")
+INDEX = struct.Struct("<QQQ")
+INDEX_INTERVAL = 64
+READ_SIZE = 64 * 1024
+
+PUSH_LOG = os.environ.get("PUSH_LOG", "")
+
+
+def _crc(header: bytes, data: bytes) -> int:
+    return zlib.crc32(data, zlib.crc32(header[: RECORD.size - 4]))
+
+
+class PushLog:
+    """Append-only log of one panel's pushes."""
+
+    def __init__(
+        self, directory: str, mac: bytes, index_interval: int = INDEX_INTERVAL
+    ) -> None:
+        base = os.path.join(directory, mac.hex())
+        self.path = f"{base}.log"
+        self.index_interval = index_interval
+        # Sequence number and time of the last record.
+        self.seq = 0
+        self.time = 0
+        self._seqs: list[int] = []
+        self._times: list[int] = []
+        self._offsets: list[int] = []
+        # Unbuffered, so each record is written by a single write().
+        self._file = open(self.path, "a+b", buffering=0)
+        self._index = open(f"{base}.idx", "a+b", buffering=0)
+        try:
+            self._size = self._recover()
+        except BaseException:
+            self.close()
+            raise
+
+    def _recover(self) -> int:
+        """Load the index and drop a damaged tail; return the log size."""
+        fd = self._file.fileno()
+        size = os.fstat(fd).st_size
+        if size < len(MAGIC):
+            self._file.truncate(0)
+            self._file.write(MAGIC)
+            self._index.truncate(0)
+            return len(MAGIC)
+        if os.pread(fd, len(MAGIC), 0) != MAGIC:
+            raise ValueError(f"{self.path}: not a push log")
+
+        index = os.pread(
+            self._index.fileno(), os.fstat(self._index.fileno()).st_size, 0
+        )
+        for seq, time_, offset in INDEX.iter_unpack(
+            index[: len(index) - len(index) % INDEX.size]
+        ):
+            if offset >= size or (self._seqs and seq <= self._seqs[-1]):
+                break
+            self._add_index(seq, time_, offset)
+
+        # Re-read from the last indexed record, which must still be valid.
+        while True:
+            start = self._offsets[-1] if self._offsets else len(MAGIC)
+            expected = self._seqs[-1] if self._seqs else 1
+            end = start
+            for offset, push in self._scan(start):
+                if push.seq != expected:
+                    break
+                if self._indexed(push.seq) and (
+                    not self._seqs or push.seq > self._seqs[-1]
+                ):
+                    self._add_index(push.seq, push.time, offset)
+                self.seq, self.time = push.seq, push.time
+                end = offset + RECORD.size + len(push.data)
+                expected += 1
+            if end > start or not self._offsets:
+                break
+            # The indexed record itself is damaged: drop its entry.
+            self._seqs.pop()
+            self._times.pop()
+            self._offsets.pop()
+
+        if end < size:
+            _LOGGER.warning(
+                "%s: dropping %d damaged bytes after push %d",
+                self.path,
+                size - end,
+                self.seq,
+            )
+            self._file.truncate(end)
+        self._index.truncate(0)
+        self._index.write(
+            b"".join(
+                INDEX.pack(*entry)
+                for entry in zip(self._seqs, self._times, self._offsets, strict=True)
+            )
+        )
+        return end
+
+    def _indexed(self, seq: int) -> bool:
+        return (seq - 1) % self.index_interval == 0
+
+    def _add_index(self, seq: int, time_: int, offset: int) -> None:
+        self._seqs.append(seq)
+        self._times.append(time_)
+        self._offsets.append(offset)
+
+    def _scan(self, offset: int) -> Iterator[tuple[int, StoredPush]]:
+        """Records from `offset` up to the first damaged one, with their offsets."""
+        fd = self._file.fileno()
+        buffer = b""
+        base = offset
+        pos = 0
+        while True:
+            if len(buffer) - pos >= RECORD.size:
+                length, seq, time_, crc = RECORD.unpack_from(buffer, pos)
+                end = pos + RECORD.size + length
+                if end <= len(buffer):
+                    data = buffer[pos + RECORD.size : end]
+                    if _crc(buffer[pos : pos + RECORD.size], data) != crc:
+                        return
+                    yield base + pos, StoredPush(seq, time_, data)
+                    pos = end
+                    continue
+            chunk = os.pread(fd, READ_SIZE, base + len(buffer))
+            if not chunk:
+                return
+            buffer = buffer[pos:] + chunk
+            base += pos
+            pos = 0
+
+    def append(self, data: bytes) -> StoredPush:
+        # Wall-clock time, kept from going backwards for the index's sake.
+        push = StoredPush(self.seq + 1, max(int(time.time()), self.time), data)
+        header = RECORD.pack(len(data), push.seq, push.time, 0)
+        header = header[:-4] + _crc(header, data).to_bytes(4, "little")
+        offset = self._size
+        try:
+            if self._file.write(header + data) != len(header) + len(data):
+                raise OSError(f"{self.path}: short write")
+        except OSError:
+            self._file.truncate(offset)
+            raise
+        self._size += len(header) + len(data)
+        self.seq, self.time = push.seq, push.time
+        if self._indexed(push.seq):
+            self._add_index(push.seq, push.time, offset)
+            self._index.write(INDEX.pack(push.seq, push.time, offset))
+        return push
+
+    def query(
+        self, after: int = 0, start: int = 0, end: int = 0, limit: int = 100
+    ) -> list[StoredPush]:
+        """Up to `limit` pushes after sequence number `after`, oldest first.
+
+        Only pushes received from `start` up to, but not including, `end`
+        are selected (seconds since the epoch, `end` 0 for no end).
+        """
+        pushes: list[StoredPush] = []
+        if after >= self.seq or limit <= 0:
+            return pushes
+        # Last indexed record that can't be past the first one selected:
+        # by sequence number, or strictly earlier than `start`.
+        i = max(bisect_right(self._seqs, after + 1), bisect_left(self._times, start))
+        offset = self._offsets[i - 1] if i else len(MAGIC)
+        for offset, push in self._scan(offset):
+            if offset >= self._size or (end and push.time >= end):
+                break
+            if push.seq <= after or push.time < start:
+                continue
+            pushes.append(push)
+            if len(pushes) == limit:
+                break
+        return pushes
+
+    def close(self) -> None:
+        self._file.close()
+        self._index.close()
+
+
+# Open logs by MAC and the number of connections using each; a panel may
+# reconnect before its old connection is closed.
+_logs: dict[bytes, tuple[PushLog, int]] = {}
+
+
+def open_push_log(mac: bytes) -> PushLog | None:
+    """The push log of panel `mac`, if PUSH_LOG is set and it can be opened.
+
+    Release it with close_push_log().
+    """
+    if not PUSH_LOG:
+        return None
+    if mac in _logs:
+        log, users = _logs[mac]
+        _logs[mac] = (log, users + 1)
+        return log
+    try:
+        os.makedirs(PUSH_LOG, exist_ok=True)
+        log = PushLog(PUSH_LOG, mac)
+    except (OSError, ValueError):
+        _LOGGER.exception("not logging pushes of %s", mac.hex(":"))
+        return None
+    _logs[mac] = (log, 1)
+    return log
+
+
+def close_push_log(mac: bytes) -> None:
+    log, users = _logs[mac]
+    if users > 1:
+        _logs[mac] = (log, users - 1)
+    else:
+        del _logs[mac]
+        log.close()
+
+
+def answer_history(log: PushLog | None, request: bytes) -> bytes:
+    """PROXY_HISTORY response to `request`; empty without a log.
+
+    A request too short to carry `after` is rejected with a bare
+    [PROXY_HISTORY]: an empty page would tell the client that nothing
+    follows whatever it meant to ask for.
+    """
+    if len(request) < HISTORY_REQUEST.size:
+        return bytes([PROXY_HISTORY])
+    _, after, start, end = HISTORY_REQUEST.unpack(request[: HISTORY_REQUEST.size])
+    if log is None:
+        return encode_history(after, [])
+    # One more than fits, to tell whether there are more.
+    pushes = log.query(after, start, end, limit=HISTORY_MAX_PUSHES + 1)
+    return encode_history(after, pushes, more=len(pushes) > HISTORY_MAX_PUSHES)
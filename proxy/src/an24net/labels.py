@@ -0,0 +1,124 @@
+"""Cache of the panel name, user and zone labels.
+
+Home Assistant reads them on startup, on every reconnection and every 30
+minutes, and they almost never change. Responses to SYNC_NAME, SYNC_USER
+and SYNC_ZONE requests are kept per panel MAC and request, across panel
+reconnections, until the panel reconnects with a different VERSION. An
+entry older than LABEL_CACHE_TTL is still served, and refreshed from the
+panel in the background.
+
+Entries are keyed by the whole request, PIN included, so only a PIN the
+panel accepted is answered from the cache.
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+from an24net.events import Request, sync_request
+from an24net.protocol import (
+    MY_HOME,
+    SYNC_MARKER,
+    SYNC_NAME,
+    SYNC_USER,
+    SYNC_ZONE,
+    MyHomeCommands,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Seconds before a label is refreshed in the background; 0 disables the cache.
+LABEL_CACHE_TTL = float(os.environ.get("LABEL_CACHE_TTL", 3600))
+
+LABEL_TYPES = (SYNC_NAME, SYNC_USER, SYNC_ZONE)
+
+REQUESTER = "label cache"
+
+
+def _is_label_request(data: bytes) -> bool:
+    request = sync_request(data)
+    return request is not None and request[0] in LABEL_TYPES
+
+
+def _is_label_response(data: bytes, response: bytes) -> bool:
+    # As parse_sync() expects it, and for the requested type.
+    return (
+        len(response) > 7
+        and response[1] == MyHomeCommands.MESSAGES.code
+        and response[6] == data[11]
+        and response[7] == SYNC_MARKER
+    )
+
+
+class LabelCache:
+    def __init__(self) -> None:
+        self.version = b""
+        # Responses by request data: (time fetched, response).
+        self._entries: dict[bytes, tuple[float, bytes]] = {}
+        self._refreshing: dict[bytes, asyncio.Task[None]] = {}
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def get(self, data: bytes, request: Request) -> bytes | None:
+        """Cached response to MY_HOME request `data`, if any.
+
+        A stale one is refreshed through `request` in the background.
+        """
+        if not LABEL_CACHE_TTL or not _is_label_request(data):
+            return None
+        entry = self._entries.get(data)
+        if entry is None:
+            return None
+        fetched, response = entry
+        if (
+            time.monotonic() - fetched > LABEL_CACHE_TTL
+            and data not in self._refreshing
+        ):
+            task = asyncio.create_task(self._refresh(data, request))
+            self._refreshing[data] = task
+            task.add_done_callback(lambda _: self._refreshing.pop(data, None))
+        self.hits += 1
+        return response
+
+    def put(self, data: bytes, response: bytes) -> None:
+        """Remember the panel's response to MY_HOME request `data`."""
+        if not LABEL_CACHE_TTL or not _is_label_request(data):
+            return
+        if _is_label_response(data, response):
+            self._entries[data] = (time.monotonic(), response)
+        else:
+            # Most likely the PIN is no longer accepted.
+            self._entries.pop(data, None)
+
+    async def _refresh(self, data: bytes, request: Request) -> None:
+        try:
+            response = (await request(MY_HOME, data, REQUESTER)).data
+        except (TimeoutError, OSError):
+            _LOGGER.debug("failed to refresh labels, retrying on next use")
+            return
+        self.put(data, response)
+
+
+_caches: dict[bytes, LabelCache] = {}
+
+
+def labels_for(mac: bytes, version: bytes) -> LabelCache:
+    """The label cache of panel `mac`, emptied if its VERSION changed."""
+    cache = _caches.setdefault(mac, LabelCache())
+    if cache.version != version:
+        if len(cache):
+            _LOGGER.info(
+                "%s: VERSION changed to %s, dropping %d cached labels",
+                mac.hex(":"),
+                version.decode("ascii", "replace"),
+                len(cache),
+            )
+        cache.clear()
+        cache.version = version
+    return cache
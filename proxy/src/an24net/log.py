@@ -0,0 +1,104 @@
+"""Logging setup and helpers for the proxy."""
+
+import logging
+import os
+import queue
+import sys
+from fnmatch import fnmatchcase
+from logging.handlers import QueueHandler, QueueListener
+
+from an24net.protocol import command_to_str, frame_hex
+
+
+class FrameLog:
+    """Log message for a frame, decoded only when a handler emits it.
+
+    Use as an argument, not as a formatted string:
+    logger.debug("%s", FrameLog("↓", command, data))
+    """
+
+    __slots__ = ("arrow", "command", "data")
+
+    def __init__(self, arrow: str, command: int, data: bytes = b"") -> None:
+        self.arrow = arrow
+        self.command = command
+        self.data = data
+
+    def __str__(self) -> str:
+        return (
+            f"{self.arrow} {command_to_str(self.command, self.data)}"
+            f" | {frame_hex(self.command, self.data)}"
+        )
+
+
+class _LoopQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    Records only cross threads within this process, so they don't need to be
+    made picklable; FrameLog arguments hold immutable bytes.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def parse_level(name: str) -> int:
+    """The level named `name`, in any case; ValueError if there is none."""
+    levels = logging.getLevelNamesMapping()
+    try:
+        return levels[name.strip().upper()]
+    except KeyError:
+        raise ValueError(
+            f"Unknown log level {name!r}, expected one of {', '.join(levels)}"
+        ) from None
+
+
+def parse_levels(spec: str) -> list[tuple[str, int]]:
+    """Parse "pattern=LEVEL,..." into (logger name pattern, level) pairs.
+
+    Patterns are matched against the full logger name with fnmatch, so a
+    panel can be selected by MAC: "*00:1a:3f:aa:bb:cc*=DEBUG".
+    """
+    levels: list[tuple[str, int]] = []
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        pattern, sep, level = item.rpartition("=")
+        if not sep:
+            raise ValueError(f"Expected pattern=LEVEL, got {item.strip()!r}")
+        levels.append((pattern.strip(), parse_level(level)))
+    return levels
+
+
+LOG_LEVEL = parse_level(os.environ.get("LOG_LEVEL", "INFO"))
+LOG_LEVELS = parse_levels(os.environ.get("LOG_LEVELS", ""))
+
+
+def child_logger(parent: logging.Logger, suffix: str) -> logging.Logger:
+    """Return parent's child logger with any LOG_LEVELS override applied."""
+    logger = parent.getChild(suffix)
+    for pattern, level in LOG_LEVELS:
+        if fnmatchcase(logger.name, pattern):
+            logger.setLevel(level)
+            break
+    return logger
+
+
+def setup_logging() -> QueueListener:
+    """Send log records through a queue to a stdout writer thread.
+
+    Returns the started listener; stop it on shutdown to flush the queue.
+    """
+    logger = logging.getLogger()
+    logger.setLevel(LOG_LEVEL)
+    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s: %(message)s")
+
+    stdout_handler = logging.StreamHandler(sys.stdout)
+    stdout_handler.setFormatter(formatter)
+
+    records = queue.SimpleQueue[logging.LogRecord]()
+    logger.addHandler(_LoopQueueHandler(records))
+
+    listener = QueueListener(records, stdout_handler)
+    listener.start()
+    return listener
@@ -1,14 +1,31 @@
 import asyncio
+import contextlib
 import logging
+import os
 import signal
-import sys
+import time
 from asyncio import StreamReader, StreamWriter, Task, TaskGroup
-from collections.abc import Callable
+from collections import deque
+from collections.abc import Callable, Hashable, Iterable
 from datetime import datetime, timedelta, timezone
 from itertools import count
 
+from an24net import metrics
+from an24net.broadcast import PushBroadcaster
+from an24net.capture import Direction, Peer, Tap, TappedWriter, open_capture
+from an24net.events import EventMirror
+from an24net.history import (
+    PushLog,
+    answer_history,
+    close_push_log,
+    open_push_log,
+)
+from an24net.labels import LabelCache, labels_for
+from an24net.log import FrameLog, child_logger, setup_logging
 from an24net.protocol import (
+    BATCH_MAX_ITEM,
     CONN_NOT_FOUND,
+    CONN_PIPELINE,
     CONN_PROXY,
     CONN_SUCCESS,
     CONNECTION_COMMAND,
@@ -16,202 +33,736 @@ from an24net.protocol import (
     MY_HOME,
     OK,
     PING_COMMAND,
+    PROXY_BATCH,
     PROXY_COMMAND,
+    PROXY_HISTORY,
+    PROXY_STATUS,
+    PROXY_TIMEOUT,
     PROXY_UPSTREAM_PUSH,
     PUSH_COMMAND,
     START_COMMAND,
+    SYNC_COMMAND,
     TIME_COMMAND,
     VERSION_COMMAND,
     XOR_COMMAND,
+    Frame,
+    FrameDecoder,
+    FramedWriter,
     MyHomeCommands,
     command_to_str,
-    frame_hex,
-    read_command,
-    send_command,
+    encode_batch,
+    encode_status_update,
+    my_home_to_str,
+    parse_batch,
+)
+from an24net.scheduler import Scheduler, classify
+from an24net.workers import (
+    WORKER_FD,
+    WORKER_INDEX,
+    WORKERS,
+    Broker,
+    WorkerLink,
+    connect,
 )
 
 
+def is_read_only(command: int, data: bytes) -> bool:
+    """STATUS and SYNC (names, zones, event pointer and records) requests."""
+    return (
+        command == MY_HOME
+        and len(data) > 5
+        and data[5] in (MyHomeCommands.STATUS.code, SYNC_COMMAND)
+    )
+
+
 class AlarmConnection:
-    def __init__(self, writer: StreamWriter) -> None:
-        self.writer = writer
-        self.on_push: list[Callable[[tuple[int, bytes]], None]] = []
-        self._lock = asyncio.Lock()
-        self._pending: asyncio.Future[tuple[int, bytes]] | None = None
+    """A panel's session, kept across its reconnections.
+
+    While the panel is away, requests wait for it to come back (see
+    attach and detach), and clients stay attached.
+    """
+
+    def __init__(
+        self,
+        writer: FramedWriter,
+        history: PushLog | None = None,
+        labels: LabelCache | None = None,
+    ) -> None:
+        self.writer: FramedWriter | None = writer
+        self._connected = asyncio.Event()
+        self._connected.set()
+        self._expiry: asyncio.TimerHandle | None = None
+        self._on_expire: Callable[[], None] = lambda: None
+        self._evicted = False
+        # Set once the panel didn't reconnect within PANEL_RECONNECT_GRACE.
+        self.closed = asyncio.Event()
+        self.reconnects = 0
+        self.pushes = PushBroadcaster()
+        self.history = history
+        self.labels = LabelCache() if labels is None else labels
+        self.events = EventMirror(self._request)
+        self.scheduler = Scheduler()
+        self._pending: asyncio.Future[Frame] | None = None
         self.upstream_enabled = True
+        self.upstream_connected = False
+        self.upstream_connects = 0
+        self.clients = 0
+        # Read-only requests in flight, by command and data.
+        self._inflight: dict[bytes, asyncio.Future[Frame]] = {}
+        # STATUS responses by request data: (expiry, response).
+        self._status_cache: dict[bytes, tuple[float, Frame]] = {}
+        self._generation = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+        self._changed = asyncio.Event()
+
+    @property
+    def connected(self) -> bool:
+        return self.writer is not None
+
+    def attach(self, writer: FramedWriter) -> None:
+        """Carry on over a new connection of the panel."""
+        if self._expiry is not None:
+            self._expiry.cancel()
+            self._expiry = None
+        if self.writer is not None:
+            # The panel reconnected before its old connection was closed.
+            self.writer.writer.close()
+            self._disconnected()
+        self.writer = writer
+        self._evicted = False
+        self.reconnects += 1
+        self._connected.set()
+        # Anything may have happened while it was away.
+        self.invalidate()
+
+    def detach(self, writer: FramedWriter, expire: Callable[[], None]) -> None:
+        """The panel's connection over `writer` closed.
 
-    async def request(self, command: int, data: bytes) -> tuple[int, bytes]:
+        Requests wait up to their timeout for it to reconnect, and
+        `expire` is called if it doesn't within PANEL_RECONNECT_GRACE.
+        """
+        if self.writer is not writer:
+            # Already replaced by a newer connection.
+            return
+        self.writer = None
+        self._connected.clear()
+        self.upstream_connected = False
+        self._disconnected()
+        self._on_expire = expire
+        self._expiry = asyncio.get_running_loop().call_later(
+            0 if self._evicted else PANEL_RECONNECT_GRACE, self._expire
+        )
+
+    def evict(self) -> None:
+        """Drop the session now: the panel reconnected to another worker.
+
+        Attached clients are disconnected, not handed over; they reconnect
+        through the broker to the panel's new worker.
+        """
+        if self.writer is not None:
+            # This connection is stale; detach() expires it once closed.
+            self._evicted = True
+            self.writer.writer.close()
+        elif self._expiry is not None:
+            self._expiry.cancel()
+            self._expire()
+
+    def _expire(self) -> None:
+        self._expiry = None
+        self.closed.set()
+        self._on_expire()
+
+    def _disconnected(self) -> None:
+        if self._pending is not None and not self._pending.done():
+            self._pending.set_exception(ConnectionResetError("alarm disconnected"))
+            # Retrieved here too, in case its request failed writing.
+            self._pending.exception()
+
+    @property
+    def changed(self) -> asyncio.Event:
+        """Set by the next invalidate()."""
+        return self._changed
+
+    def invalidate(self) -> None:
+        """Forget cached and in-flight responses; the panel state changed."""
+        self._generation += 1
+        self._status_cache.clear()
+        self._inflight.clear()
+        self.events.mark_stale()
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def with_upstream_push(self, response: bytes) -> bytes:
+        """STATUS response with the proxy's upstream push byte appended."""
+        return bytes([*response, 0x01 if self.upstream_enabled else 0x00])
+
+    async def request(
+        self,
+        command: int,
+        data: bytes,
+        requester: Hashable = None,
+        frame: bytes | memoryview | None = None,
+    ) -> Frame:
         """Send a command to the alarm and wait for its response.
 
-        Serialized by lock so only one command is in-flight at a time.
+        `frame` is the request as received, sent to the alarm unchanged.
+        The response's `raw` is set when it came from the alarm, for
+        passing it on the same way.
+
+        Requests are scheduled by priority and requester, see Scheduler.
+        Identical read-only requests share one round trip, and STATUS is
+        served from cache for STATUS_CACHE_TTL seconds. Any other command
+        invalidates both. Event log reads are answered by the EventMirror,
+        and name, user and zone labels by the LabelCache.
         """
-        async with self._lock:
-            self._pending = asyncio.Future[tuple[int, bytes]]()
+        if not is_read_only(command, data):
+            self.invalidate()
+            try:
+                return await self._request(command, data, requester, frame)
+            finally:
+                self.invalidate()
+
+        if data[5] == SYNC_COMMAND:
+            if response := await self.events.answer(data):
+                return Frame(command, response)
+            if response := self.labels.get(data, self._request):
+                return Frame(command, response)
+
+        is_status = data[5] == MyHomeCommands.STATUS.code
+        if is_status and (cached := self._status_cache.get(data)):
+            expiry, response = cached
+            if time.monotonic() < expiry:
+                self.cache_hits += 1
+                return response
+            del self._status_cache[data]
+
+        key = bytes([command, *data])
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(
+                self._request_cached(command, data, is_status, requester, frame)
+            )
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._done(key, f))
+        else:
+            self.coalesced += 1
+        # Shielded, so one requester giving up doesn't cancel the others.
+        return await asyncio.shield(future)
+
+    def _done(self, key: bytes, future: asyncio.Future[Frame]) -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if not future.cancelled():
+            # Retrieved here too, in case every requester was cancelled.
+            future.exception()
+
+    async def _request_cached(
+        self,
+        command: int,
+        data: bytes,
+        is_status: bool,
+        requester: Hashable,
+        frame: bytes | memoryview | None,
+    ) -> Frame:
+        generation = self._generation
+        response = await self._request(command, data, requester, frame)
+        if not is_status:
+            self.labels.put(data, response.data)
+        # Errors (wrong password) are a single byte; never cache them.
+        if (
+            is_status
+            and STATUS_CACHE_TTL > 0
+            and generation == self._generation
+            and len(response.data) > 1
+        ):
+            self._status_cache[data] = (time.monotonic() + STATUS_CACHE_TTL, response)
+        return response
+
+    async def _request(
+        self,
+        command: int,
+        data: bytes,
+        requester: Hashable,
+        frame: bytes | memoryview | None = None,
+    ) -> Frame:
+        # Only one command is in-flight at a time.
+        priority = classify(command, data)
+        async with self.scheduler.slot(priority, requester):
+            start = time.monotonic()
             try:
-                await send_command(self.writer, command, data)
+                # Including the wait for a reconnecting panel.
                 async with asyncio.timeout(5):
-                    return await self._pending
+                    return await self._send(command, data, frame)
+            except TimeoutError:
+                metrics.REQUEST_TIMEOUTS[priority] += 1
+                raise
             finally:
+                metrics.REQUEST_LATENCY[priority].observe(time.monotonic() - start)
                 self._pending = None
 
-    def resolve(self, command: int, data: bytes) -> bool:
+    async def _send(
+        self, command: int, data: bytes, frame: bytes | memoryview | None
+    ) -> Frame:
+        while True:
+            await self._connected.wait()
+            writer = self.writer
+            assert writer is not None
+            self._pending = asyncio.Future[Frame]()
+            try:
+                if frame is not None:
+                    writer.write_raw(command, frame)
+                else:
+                    writer.write(command, data)
+                await writer.flush()
+                return await self._pending
+            except ConnectionError:
+                if self.writer is writer:
+                    # Its connection is closing; wait for the next one.
+                    self._connected.clear()
+                # Read-only requests are repeated once the panel is back;
+                # any other may have been carried out already.
+                if not is_read_only(command, data):
+                    raise TimeoutError from None
+
+    def resolve(
+        self, command: int, data: bytes, raw: bytes | memoryview | None = None
+    ) -> bool:
         """Route a response from the alarm to the pending requester."""
         if self._pending is not None and not self._pending.done():
-            self._pending.set_result((command, data))
+            self._pending.set_result(Frame(command, data, raw))
             return True
         return False
 
 
+PORT = int(os.environ.get("PORT", 9009))
+# "host:port" of the Intelbras cloud; empty disables the upstream connection.
+UPSTREAM = os.environ.get("UPSTREAM", "amt.intelbras.com.br:9009")
+# Seconds a STATUS response may be served from cache; 0 disables the cache.
+STATUS_CACHE_TTL = float(os.environ.get("STATUS_CACHE_TTL", 0))
+# Seconds between status polls for clients subscribed with PROXY_STATUS.
+STATUS_POLL_INTERVAL = float(os.environ.get("STATUS_POLL_INTERVAL", 5))
+# Requests a client may have waiting for the alarm at once.
+CLIENT_MAX_INFLIGHT = int(os.environ.get("CLIENT_MAX_INFLIGHT", 4))
+# Seconds a panel's session and clients are kept after it disconnects.
+PANEL_RECONNECT_GRACE = float(os.environ.get("PANEL_RECONNECT_GRACE", 30))
+
 OPEN_CONNECTIONS: dict[bytes, AlarmConnection] = {}
+# Connection to the broker when running as one of several workers.
+_link: WorkerLink | None = None
 _conn_ids = count(1)
 
 
+def collect_panels() -> Iterable[str]:
+    """Per-panel metrics, labelled by MAC."""
+    panels = [(mac.hex(":"), alarm) for mac, alarm in OPEN_CONNECTIONS.items()]
+    yield metrics.sample("an24net_panels", len(panels))
+    gauges: dict[str, Callable[[AlarmConnection], float]] = {
+        "an24net_clients": lambda alarm: alarm.clients,
+        "an24net_panel_connected": lambda alarm: alarm.connected,
+        "an24net_panel_reconnects_total": lambda alarm: alarm.reconnects,
+        "an24net_upstream_connected": lambda alarm: alarm.upstream_connected,
+        "an24net_upstream_connects_total": lambda alarm: alarm.upstream_connects,
+        "an24net_pushes_total": lambda alarm: alarm.pushes.head,
+        "an24net_coalesced_total": lambda alarm: alarm.coalesced,
+        "an24net_status_cache_hits_total": lambda alarm: alarm.cache_hits,
+        "an24net_event_mirror_hits_total": lambda alarm: alarm.events.hits,
+        "an24net_label_cache_hits_total": lambda alarm: alarm.labels.hits,
+        "an24net_queued_requests": lambda alarm: alarm.scheduler.queued,
+    }
+    for name, value in gauges.items():
+        if name.endswith("_total"):
+            yield f"# TYPE {name} counter"
+        for mac, alarm in panels:
+            yield metrics.sample(name, int(value(alarm)), mac=mac)
+    # Subscribers are the upstream connection and "clients", all of them
+    # together: a label per client connection would grow without bound.
+    for name, field in (("an24net_push_lag", 0), ("an24net_push_dropped_total", 1)):
+        if name.endswith("_total"):
+            yield f"# TYPE {name} counter"
+        for mac, alarm in panels:
+            for subscriber, stats in alarm.pushes.stats().items():
+                yield metrics.sample(name, stats[field], mac=mac, subscriber=subscriber)
+    yield "# TYPE an24net_queue_wait_seconds summary"
+    for suffix, attr in (("_sum", "total"), ("_count", "count")):
+        for mac, alarm in panels:
+            for priority, wait in alarm.scheduler.wait_stats.items():
+                yield metrics.sample(
+                    f"an24net_queue_wait_seconds{suffix}",
+                    getattr(wait, attr),
+                    mac=mac,
+                    priority=priority.name.lower(),
+                )
+    for mac, alarm in panels:
+        for priority, wait in alarm.scheduler.wait_stats.items():
+            yield metrics.sample(
+                "an24net_queue_wait_max_seconds",
+                wait.max,
+                mac=mac,
+                priority=priority.name.lower(),
+            )
+
+
 async def handle(
     _logger: logging.Logger,
     reader: StreamReader,
     writer: StreamWriter,
+    handoff: bytes | None = None,
 ) -> None:
+    """Serve one connection.
+
+    `handoff` is the CONNECTION data of a client another worker handed
+    over, after it did the XOR handshake.
+    """
     peer = writer.get_extra_info("peername")
     addr = f"{peer[0]}:{peer[1]}" if peer else "unknown"
-    _logger.info(f"new connection from {addr}")
+    _logger.info("new connection from %s", addr)
+
+    decoder = FrameDecoder()
+    tap = Tap()
+    framed = TappedWriter(writer, tap)
+
+    async def read_frame() -> tuple[int, bytes]:
+        command, payload = await decoder.read(reader)
+        tap.raw(Direction.RX, decoder.raw, command)
+        return command, bytes(payload)
+
+    async def flush_idle() -> None:
+        """Flush unless more input is already decoded and waiting."""
+        if not decoder:
+            await framed.flush()
 
     async with TaskGroup() as tg:
 
         async def __downstream_client(data: bytes) -> None:
-            mac = data[9:15]
-            logger = _logger.getChild(f"client[{mac.hex(':')}]")
+            mac = bytes(data[9:15])
+            logger = child_logger(_logger, f"client[{mac.hex(':')}]")
+            tap.peer, tap.mac = Peer.CLIENT, mac
             alarm = OPEN_CONNECTIONS.get(mac, None)
+            logger.debug("%s", FrameLog("←", CONNECTION_COMMAND, data))
+            if (
+                (not alarm or not alarm.connected)
+                and _link is not None
+                and handoff is None
+            ):
+                # The panel may be connected, or reconnect, to another
+                # worker; the broker hands the client back here otherwise.
+                logger.info("routing to the worker of the alarm")
+                transport = writer.transport
+                if isinstance(transport, asyncio.ReadTransport):
+                    # Leave the client's next frames to the worker it goes to.
+                    transport.pause_reading()
+                if _link.route(mac, data, writer.get_extra_info("socket")):
+                    return
+                logger.warning("broker busy, client not routed")
+                if isinstance(transport, asyncio.ReadTransport):
+                    transport.resume_reading()
             if not alarm:
-                logger.info(f"← CONNECTION: mac={mac.hex(':')}")
-                logger.warning(f"→ CONN_NOT_FOUND | {CONN_NOT_FOUND:02x}")
+                logger.warning("→ CONN_NOT_FOUND | %02x", CONN_NOT_FOUND)
+                tap.raw(Direction.TX, bytes([CONN_NOT_FOUND]))
                 writer.write(bytes([CONN_NOT_FOUND]))
                 await writer.drain()
                 return
 
-            logger.info(f"← CONNECTION: mac={mac.hex(':')}")
-            logger.info(f"→ CONN_SUCCESS (proxy) | {CONN_SUCCESS:02x}:{CONN_PROXY:02x}")
-            writer.write(bytes([CONN_SUCCESS, CONN_PROXY]))
+            flags = CONN_PROXY | CONN_PIPELINE
+            logger.debug("→ CONN_SUCCESS (proxy) | %02x:%02x", CONN_SUCCESS, flags)
+            tap.raw(Direction.TX, bytes([CONN_SUCCESS, flags]))
+            writer.write(bytes([CONN_SUCCESS, flags]))
             await writer.drain()
 
-            push_queue = asyncio.Queue[tuple[int, bytes]]()
-            cb = push_queue.put_nowait
-            alarm.on_push.append(cb)
+            pushes = alarm.pushes.subscribe(f"client{tap.conn}", "clients")
+            alarm.clients += 1
 
             try:
 
+                async def __watch_alarm() -> None:
+                    await alarm.closed.wait()
+                    raise ConnectionResetError("alarm disconnected")
+
                 async def __handle_push() -> None:
                     while True:
-                        _, data = await push_queue.get()
-                        await send_command(writer, PUSH_COMMAND, data)
+                        for frame in await pushes.get():
+                            framed.write_raw(PUSH_COMMAND, frame)
+                        await framed.flush()
+
+                async def __watch_status(request: bytes) -> None:
+                    """Poll the alarm's status and send the changes to the client."""
+                    previous: bytes | None = None
+                    while True:
+                        changed = alarm.changed
+                        try:
+                            response = (
+                                await alarm.request(MY_HOME, request, tap.conn)
+                            ).data
+                        except TimeoutError:
+                            logger.warning("timeout waiting for alarm status")
+                        else:
+                            if len(response) == 1:
+                                logger.warning(
+                                    "status subscription refused: %s",
+                                    my_home_to_str(response),
+                                )
+                                return
+                            response = alarm.with_upstream_push(response)
+                            update = encode_status_update(previous, response)
+                            if update is not None:
+                                logger.debug("%s", FrameLog("↑", PROXY_COMMAND, update))
+                                framed.write(PROXY_COMMAND, update)
+                                await framed.flush()
+                            previous = response
+                        with contextlib.suppress(TimeoutError):
+                            async with asyncio.timeout(STATUS_POLL_INTERVAL):
+                                await changed.wait()
+
+                async def __run_batch(batch: int, requests: list[bytes]) -> None:
+                    """Run a PROXY_BATCH back to back; answer it all at once.
+
+                    Holds one `inflight` slot, taken by the caller.
+                    """
+                    try:
+                        responses: list[bytes] = []
+                        for data in requests:
+                            try:
+                                response = (
+                                    await alarm.request(MY_HOME, data, tap.conn)
+                                ).data
+                            except TimeoutError:
+                                logger.warning(
+                                    "timeout waiting for alarm response to %s",
+                                    command_to_str(MY_HOME, data),
+                                )
+                                response = b""
+                            else:
+                                if (
+                                    len(data) > 5
+                                    and data[5] == MyHomeCommands.STATUS.code
+                                ):
+                                    response = alarm.with_upstream_push(response)
+                            if len(response) > BATCH_MAX_ITEM:
+                                logger.warning("batch response too large to send")
+                                response = b""
+                            responses.append(response)
+                        for frame in encode_batch(batch, responses):
+                            logger.debug("%s", FrameLog("↑", PROXY_COMMAND, frame))
+                            framed.write(PROXY_COMMAND, frame)
+                        await framed.flush()
+                    finally:
+                        inflight.release()
 
                 async def __handle_server() -> None:
+                    watcher: Task[None] | None = None
+                    # Requests of PROXY_BATCH frames received so far, by id.
+                    batches: dict[int, list[bytes]] = {}
                     while True:
-                        command, data = await read_command(reader)
+                        command, data = await read_frame()
+                        if command == PROXY_COMMAND and data[0] == PROXY_BATCH:
+                            logger.debug("%s", FrameLog("←", command, data))
+                            try:
+                                batch, total, items = parse_batch(data)
+                            except ValueError as ex:
+                                logger.warning("invalid batch: %s", ex)
+                                continue
+                            # ClientAMT sends a batch's frames back to back,
+                            # so any other one pending won't be completed.
+                            for stale in batches.keys() - {batch}:
+                                logger.warning("incomplete batch %d dropped", stale)
+                                del batches[stale]
+                            requests = batches.setdefault(batch, [])
+                            requests += items
+                            if len(requests) >= total:
+                                del batches[batch]
+                                await inflight.acquire()
+                                tg.create_task(__run_batch(batch, requests[:total]))
+                            continue
+                        if command == PROXY_COMMAND and data[0] == PROXY_HISTORY:
+                            logger.debug("%s", FrameLog("←", command, data))
+                            response = answer_history(alarm.history, data)
+                            logger.debug("%s", FrameLog("→", command, response))
+                            framed.write(PROXY_COMMAND, response)
+                            await flush_idle()
+                            continue
                         if command == PROXY_COMMAND:
                             if data[0] == PROXY_UPSTREAM_PUSH:
                                 alarm.upstream_enabled = bool(data[1])
-                            logger.info(
-                                f"← {command_to_str(command, data)} | {frame_hex(command, data)}"
-                            )
-                            logger.info(f"→ OK | {OK:02x}")
-                            await send_command(writer, OK)
+                                # Status watchers report the new upstream byte.
+                                alarm.invalidate()
+                            elif data[0] == PROXY_STATUS:
+                                if watcher is not None:
+                                    watcher.cancel()
+                                watcher = tg.create_task(__watch_status(data[1:]))
+                            logger.debug("%s", FrameLog("←", command, data))
+                            logger.debug("→ OK | %02x", OK)
+                            framed.write(OK)
+                            await flush_idle()
                             continue
-                        logger.info(
-                            f"↓ {command_to_str(command, data)} | {frame_hex(command, data)}"
+                        logger.debug("%s", FrameLog("↓", command, data))
+                        await inflight.acquire()
+                        task = tg.create_task(__forward(command, data, decoder.raw))
+                        responses.append((command, task))
+                        queued.set()
+
+                inflight = asyncio.Semaphore(CLIENT_MAX_INFLIGHT)
+                responses: deque[tuple[int, Task[Frame | None]]] = deque()
+                queued = asyncio.Event()
+
+                async def __forward(
+                    command: int, data: bytes, frame: memoryview
+                ) -> Frame | None:
+                    try:
+                        response = await alarm.request(command, data, tap.conn, frame)
+                    except TimeoutError:
+                        logger.warning(
+                            "timeout waiting for alarm response to %s",
+                            command_to_str(command, data),
                         )
-                        try:
-                            _, response = await alarm.request(command, data)
-                        except TimeoutError:
-                            logger.warning(
-                                f"timeout waiting for alarm response to {command_to_str(command, data)}"
-                            )
-                            continue
-                        if command == MY_HOME and data[5] == MyHomeCommands.STATUS.code:
-                            response = bytes(
-                                [*response, 0x01 if alarm.upstream_enabled else 0x00]
-                            )
-                        logger.info(
-                            f"↑ {command_to_str(command, response)} | {frame_hex(command, response)}"
-                        )
-                        await send_command(writer, command, response)
+                        return None
+                    if command == MY_HOME and data[5] == MyHomeCommands.STATUS.code:
+                        # The only response not passed on as the alarm sent it.
+                        return Frame(command, alarm.with_upstream_push(response.data))
+                    return response
+
+                async def __handle_responses() -> None:
+                    """Write responses in request order.
+
+                    Requests are forwarded concurrently, but ClientAMT
+                    matches responses to requests by command and order.
+                    """
+                    while True:
+                        await queued.wait()
+                        while responses:
+                            command, task = responses[0]
+                            response = await task
+                            responses.popleft()
+                            inflight.release()
+                            if response is None:
+                                # Keeps the client's responses in step.
+                                timeout = bytes([PROXY_TIMEOUT, command])
+                                logger.debug(
+                                    "%s", FrameLog("↑", PROXY_COMMAND, timeout)
+                                )
+                                framed.write(PROXY_COMMAND, timeout)
+                            else:
+                                logger.debug(
+                                    "%s", FrameLog("↑", command, response.data)
+                                )
+                                if response.raw is not None:
+                                    framed.write_raw(command, response.raw)
+                                else:
+                                    framed.write(command, response.data)
+                            if not responses or not responses[0][1].done():
+                                await framed.flush()
+                        queued.clear()
 
                 async with asyncio.TaskGroup() as tg:
+                    tg.create_task(__watch_alarm())
                     tg.create_task(__handle_push())
                     tg.create_task(__handle_server())
+                    tg.create_task(__handle_responses())
             finally:
-                alarm.on_push.remove(cb)
+                pushes.close()
+                alarm.clients -= 1
 
         async def __downstream_alarm() -> None:
-            logger = _logger.getChild("alarm")
+            logger = child_logger(_logger, "alarm")
+            tap.peer = Peer.ALARM
 
-            logger.info(f"→ MAC | {frame_hex(MAC_COMMAND, b'')}")
-            await send_command(writer, MAC_COMMAND)
-            command, mac = await read_command(reader)
+            logger.debug("%s", FrameLog("→", MAC_COMMAND))
+            framed.write(MAC_COMMAND)
+            await framed.flush()
+            command, mac = await read_frame()
             if command != MAC_COMMAND:
                 raise Exception("Invalid data")
-            logger.info(f"← MAC: {mac.hex(':')} | {frame_hex(MAC_COMMAND, mac)}")
-
-            logger.info(f"→ VERSION | {frame_hex(VERSION_COMMAND, b'')}")
-            await send_command(writer, VERSION_COMMAND)
-            command, version = await read_command(reader)
+            logger.debug("%s", FrameLog("←", MAC_COMMAND, mac))
+            logger = child_logger(_logger, f"alarm[{mac.hex(':')}]")
+            tap.mac = mac
+
+            logger.debug("%s", FrameLog("→", VERSION_COMMAND))
+            framed.write(VERSION_COMMAND)
+            await framed.flush()
+            command, version = await read_frame()
             if command != VERSION_COMMAND:
                 raise Exception("Invalid data")
-            logger.info(
-                f"← VERSION: {version.decode('ascii', errors='replace')} | {frame_hex(VERSION_COMMAND, version)}"
-            )
+            logger.debug("%s", FrameLog("←", VERSION_COMMAND, version))
+
+            alarm = OPEN_CONNECTIONS.get(mac)
+            if alarm is None:
+                alarm = AlarmConnection(
+                    framed, open_push_log(mac), labels_for(mac, version)
+                )
+                OPEN_CONNECTIONS[mac] = alarm
+            else:
+                logger.info("resuming session, %d clients attached", alarm.clients)
+                alarm.labels = labels_for(mac, version)
+                alarm.attach(framed)
+            if _link is not None:
+                _link.register(mac)
+
+            def expire() -> None:
+                logger.info("did not reconnect, closing session")
+                if OPEN_CONNECTIONS.get(mac) is alarm:
+                    del OPEN_CONNECTIONS[mac]
+                if alarm.history is not None:
+                    close_push_log(mac)
+                if _link is not None:
+                    _link.unregister(mac)
 
-            alarm = AlarmConnection(writer)
-            OPEN_CONNECTIONS[mac] = alarm
             try:
-                tg.create_task(__upstream(alarm, mac, version))
+                if UPSTREAM:
+                    tg.create_task(__upstream(alarm, mac, version))
+                tg.create_task(alarm.events.run())
 
                 while True:
-                    command, data = await read_command(reader)
+                    command, data = await read_frame()
+                    if alarm.writer is not framed:
+                        raise ConnectionResetError("replaced by a new connection")
 
                     if command == PUSH_COMMAND:
-                        logger.info(
-                            f"↑ {command_to_str(command, data)} | {frame_hex(command, data)}"
-                        )
-                        for cb in alarm.on_push:
-                            cb((command, data))
-                        await send_command(writer, OK)
+                        logger.debug("%s", FrameLog("↑", command, data))
+                        alarm.invalidate()
+                        alarm.events.pushed()
+                        # Relayed as received.
+                        alarm.pushes.publish(bytes(decoder.raw))
+                        if alarm.history is not None:
+                            try:
+                                alarm.history.append(data)
+                            except OSError:
+                                logger.exception("failed to log push")
+                        framed.write(OK)
                     elif command == TIME_COMMAND:
                         tz = -data[0]
                         now = datetime.now(tz=timezone(timedelta(hours=tz)))
                         time_data = bytes.fromhex(
                             f"{now.year - 2000:02} {now.month:02} {now.day:02} 04 {now.hour:02} {now.minute:02} {now.second:02}"
                         )
-                        logger.info(
-                            f"← TIME: tz={tz} | {frame_hex(TIME_COMMAND, data)}"
-                        )
-                        logger.info(
-                            f"→ TIME: {now} | {frame_hex(TIME_COMMAND, time_data)}"
-                        )
-                        await send_command(writer, TIME_COMMAND, time_data)
+                        logger.debug("%s", FrameLog("←", TIME_COMMAND, data))
+                        logger.debug("%s", FrameLog("→", TIME_COMMAND, time_data))
+                        framed.write(TIME_COMMAND, time_data)
                     elif command == PING_COMMAND:
-                        logger.info(f"← PING | {PING_COMMAND:02x}")
-                        await send_command(writer, OK)
-                    elif alarm.resolve(command, data):
+                        logger.debug("← PING | %02x", PING_COMMAND)
+                        framed.write(OK)
+                    elif alarm.resolve(command, data, decoder.raw):
                         pass
                     else:
-                        logger.info(
-                            f"← {command_to_str(command, data)} | {frame_hex(command, data)}"
-                        )
-                        await send_command(writer, OK)
+                        logger.debug("%s", FrameLog("←", command, data))
+                        framed.write(OK)
+                    await flush_idle()
             finally:
-                OPEN_CONNECTIONS.pop(mac)
+                alarm.detach(framed, expire)
 
         async def __downstream() -> None:
             while True:
-                command, data = await read_command(reader)
+                command, data = await read_frame()
 
                 if command == XOR_COMMAND:
-                    _logger.info(f"← XOR | {frame_hex(XOR_COMMAND, b'')}")
-                    _logger.info(f"→ no encryption | {frame_hex(0x00, b'')}")
-                    await send_command(writer, 0x00)
+                    _logger.debug("%s", FrameLog("←", XOR_COMMAND))
+                    _logger.debug("%s", FrameLog("→ no encryption:", 0x00))
+                    framed.write(0x00)
+                    await framed.flush()
                 elif command == START_COMMAND:
-                    _logger.info("← START")
-                    _logger.info(f"→ OK | {OK:02x}")
-                    await send_command(writer, OK)
+                    _logger.debug("← START")
+                    _logger.debug("→ OK | %02x", OK)
+                    framed.write(OK)
+                    await framed.flush()
                     return await __downstream_alarm()
                 elif command == CONNECTION_COMMAND:
                     return await __downstream_client(data)
@@ -223,83 +774,99 @@ async def handle(
             mac: bytes,
             version: bytes,
         ) -> None:
-            logger = _logger.getChild("upstream")
+            logger = child_logger(_logger, f"upstream[{mac.hex(':')}]")
+            host, _, port = UPSTREAM.rpartition(":")
+            u_tap = Tap(Peer.UPSTREAM, mac, tap.conn)
 
             while True:
                 try:
                     u_reader, u_writer = await asyncio.open_connection(
-                        host="amt.intelbras.com.br",
-                        port=9009,
+                        host=host,
+                        port=int(port),
                     )
-                    logger.info("connected to amt.intelbras.com.br:9009")
+                    logger.info("connected to %s", UPSTREAM)
+                    u_decoder = FrameDecoder()
+                    u_framed = TappedWriter(u_writer, u_tap)
 
                     start_data = b"\x45\x12\x12\x52\x57\x19"
-                    logger.info(f"→ START | {frame_hex(START_COMMAND, start_data)}")
-                    await send_command(u_writer, START_COMMAND, start_data)
-                    command, _ = await read_command(u_reader)
+                    logger.debug("%s", FrameLog("→", START_COMMAND, start_data))
+                    u_framed.write(START_COMMAND, start_data)
+                    await u_framed.flush()
+                    command, _ = await u_decoder.read(u_reader)
+                    u_tap.raw(Direction.RX, u_decoder.raw, command)
                     if command != OK:
                         raise Exception("Invalid data")
-                    logger.info(f"← OK | {OK:02x}")
+                    logger.debug("← OK | %02x", OK)
+                    alarm.upstream_connected = True
+                    alarm.upstream_connects += 1
 
                     async def __ping() -> None:
                         while True:
                             await asyncio.sleep(30)
-                            logger.info(f"→ PING | {frame_hex(PING_COMMAND, b'')}")
-                            await send_command(u_writer, PING_COMMAND)
+                            logger.debug("→ PING | %02x", PING_COMMAND)
+                            u_framed.write(PING_COMMAND)
+                            await u_framed.flush()
 
-                    push_queue = asyncio.Queue[tuple[int, bytes]]()
-                    cb = push_queue.put_nowait
-                    alarm.on_push.append(cb)
+                    pushes = alarm.pushes.subscribe("upstream")
 
                     async def __handle_push() -> None:
                         try:
                             while True:
-                                _, data = await push_queue.get()
-                                if alarm.upstream_enabled:
-                                    await send_command(u_writer, PUSH_COMMAND, data)
-                                else:
-                                    logger.info(
-                                        f"upstream push suppressed | {frame_hex(PUSH_COMMAND, data)}"
-                                    )
+                                for frame in await pushes.get():
+                                    if alarm.upstream_enabled:
+                                        u_framed.write_raw(PUSH_COMMAND, frame)
+                                    else:
+                                        logger.debug(
+                                            "upstream push suppressed | %s",
+                                            FrameLog("↑", PUSH_COMMAND, frame[2:-1]),
+                                        )
+                                await u_framed.flush()
                         finally:
-                            alarm.on_push.remove(cb)
+                            pushes.close()
 
                     async def __handle_server() -> None:
                         while True:
-                            command, data = await read_command(u_reader)
-
+                            command, payload = await u_decoder.read(u_reader)
+                            data = bytes(payload)
+                            frame = u_decoder.raw
+                            u_tap.raw(Direction.RX, frame, command)
+
+                            # Every path falls through to the flush below, so
+                            # a response decoded along with an OK or a timed
+                            # out request isn't held back.
                             if command == OK:
-                                logger.info(f"← OK | {OK:02x}")
-                                continue
+                                logger.debug("← OK | %02x", OK)
                             elif command == MAC_COMMAND:
-                                logger.info(f"← MAC | {frame_hex(MAC_COMMAND, b'')}")
-                                logger.info(
-                                    f"→ MAC: {mac.hex(':')} | {frame_hex(MAC_COMMAND, mac)}"
-                                )
-                                await send_command(u_writer, MAC_COMMAND, mac)
+                                logger.debug("%s", FrameLog("←", MAC_COMMAND))
+                                logger.debug("%s", FrameLog("→", MAC_COMMAND, mac))
+                                u_framed.write(MAC_COMMAND, mac)
                             elif command == VERSION_COMMAND:
-                                logger.info(
-                                    f"← VERSION | {frame_hex(VERSION_COMMAND, b'')}"
-                                )
-                                logger.info(
-                                    f"→ VERSION: {version.decode('ascii', errors='replace')} | {frame_hex(VERSION_COMMAND, version)}"
+                                logger.debug("%s", FrameLog("←", VERSION_COMMAND))
+                                logger.debug(
+                                    "%s", FrameLog("→", VERSION_COMMAND, version)
                                 )
-                                await send_command(u_writer, VERSION_COMMAND, version)
+                                u_framed.write(VERSION_COMMAND, version)
                             else:
-                                logger.info(
-                                    f"↓ {command_to_str(command, data)} | {frame_hex(command, data)}"
-                                )
+                                logger.debug("%s", FrameLog("↓", command, data))
                                 try:
-                                    _, response = await alarm.request(command, data)
+                                    response = await alarm.request(
+                                        command, data, "upstream", frame
+                                    )
                                 except TimeoutError:
                                     logger.warning(
-                                        f"timeout waiting for alarm response to {command_to_str(command, data)}"
+                                        "timeout waiting for alarm response to %s",
+                                        command_to_str(command, data),
                                     )
-                                    continue
-                                logger.info(
-                                    f"↑ {command_to_str(command, response)} | {frame_hex(command, response)}"
-                                )
-                                await send_command(u_writer, command, response)
+                                else:
+                                    logger.debug(
+                                        "%s", FrameLog("↑", command, response.data)
+                                    )
+                                    if response.raw is not None:
+                                        u_framed.write_raw(command, response.raw)
+                                    else:
+                                        u_framed.write(command, response.data)
+                            if not u_decoder:
+                                await u_framed.flush()
 
                     async with asyncio.TaskGroup() as tg:
                         tg.create_task(__handle_push())
@@ -307,21 +874,22 @@ async def handle(
                         tg.create_task(__ping())
 
                 except Exception:
+                    alarm.upstream_connected = False
                     logger.exception("upstream connection error")
                     await asyncio.sleep(5)
 
-        tg.create_task(__downstream())
+        if handoff is not None:
+            tg.create_task(__downstream_client(handoff))
+        else:
+            tg.create_task(__downstream())
 
 
 async def main() -> None:
-    logger = logging.getLogger()
-    logger.setLevel(logging.DEBUG)
-    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s: %(message)s")
-
-    stdout_handler = logging.StreamHandler(sys.stdout)
-    stdout_handler.setLevel(logging.INFO)
-    stdout_handler.setFormatter(formatter)
-    logger.addHandler(stdout_handler)
+    global _link
+    listener = setup_logging()
+    _link = connect()
+    logger = logging.getLogger(f"worker{WORKER_INDEX}" if _link else None)
+    capture = open_capture()
 
     tasks: set[Task[None]] = set()
 
@@ -337,13 +905,15 @@ async def main() -> None:
     loop.add_signal_handler(signal.SIGINT, cancel)
     loop.add_signal_handler(signal.SIGTERM, cancel)
 
-    async def handler(reader: StreamReader, writer: StreamWriter) -> None:
+    async def handler(
+        reader: StreamReader, writer: StreamWriter, handoff: bytes | None = None
+    ) -> None:
         task = asyncio.current_task()
         if task:
             tasks.add(task)
-        conn_logger = logger.getChild(f"conn{next(_conn_ids)}")
+        conn_logger = child_logger(logger, f"conn{next(_conn_ids)}")
         try:
-            await handle(conn_logger, reader, writer)
+            await handle(conn_logger, reader, writer, handoff)
         except* (
             asyncio.IncompleteReadError,
             ConnectionResetError,
@@ -358,10 +928,54 @@ async def main() -> None:
             if task:
                 tasks.discard(task)
 
-    logger.info("Serving on 0.0.0.0:9009")
-    server = await asyncio.start_server(handler, "0.0.0.0", 9009)
-    await server.serve_forever()
+    if metrics.METRICS_PORT:
+        metrics_tasks = [
+            asyncio.create_task(
+                metrics.serve(metrics.METRICS_PORT, metrics.collect, collect_panels)
+            ),
+            asyncio.create_task(metrics.monitor_loop_lag()),
+        ]
+        tasks.update(metrics_tasks)
+
+    async def accept_handoffs(link: WorkerLink) -> None:
+        async for data, sock in link.handoffs():
+            reader, writer = await asyncio.open_connection(sock=sock)
+            tasks.add(asyncio.create_task(handler(reader, writer, data)))
+
+    def evict(mac: bytes) -> None:
+        if alarm := OPEN_CONNECTIONS.get(mac):
+            logger.info("alarm %s reconnected to another worker", mac.hex(":"))
+            alarm.evict()
+
+    if _link is not None:
+        _link.on_evict = evict
+        tasks.add(asyncio.create_task(accept_handoffs(_link)))
+
+    try:
+        logger.info("Serving on 0.0.0.0:%d", PORT)
+        server = await asyncio.start_server(
+            handler, "0.0.0.0", PORT, reuse_port=_link is not None
+        )
+        await server.serve_forever()
+    finally:
+        if capture:
+            capture.close()
+        listener.stop()
 
 
 def run() -> None:
-    asyncio.run(main())
+    if WORKERS > 1 and not WORKER_FD:
+        # Supervise the workers and route clients between them.
+        listener = setup_logging()
+        try:
+            asyncio.run(Broker(WORKERS).run())
+        finally:
+            listener.stop()
+        return
+    # SIGINT/SIGTERM cancel the main task; that is a clean shutdown.
+    with contextlib.suppress(asyncio.CancelledError):
+        asyncio.run(main())
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,185 @@
+"""Prometheus metrics for the proxy, served over HTTP when METRICS_PORT is set.
+
+Counters are plain preallocated lists indexed by peer, direction and
+command, so counting a frame costs two list increments.
+"""
+
+import asyncio
+import logging
+import os
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+
+from an24net.protocol import (
+    CONNECTION_COMMAND,
+    MAC_COMMAND,
+    MY_HOME,
+    OK,
+    PING_COMMAND,
+    PROXY_COMMAND,
+    PUSH_COMMAND,
+    START_COMMAND,
+    TIME_COMMAND,
+    VERSION_COMMAND,
+    XOR_COMMAND,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 0))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+COMMAND_NAMES = {
+    START_COMMAND: "start",
+    MAC_COMMAND: "mac",
+    VERSION_COMMAND: "version",
+    TIME_COMMAND: "time",
+    PING_COMMAND: "ping",
+    PUSH_COMMAND: "push",
+    OK: "ok",
+    MY_HOME: "my_home",
+    XOR_COMMAND: "xor",
+    CONNECTION_COMMAND: "connection",
+    PROXY_COMMAND: "proxy",
+}
+
+# Peer and Direction values of an24net.capture, which counts frames.
+PEERS = ("unknown", "alarm", "client", "upstream")
+DIRECTIONS = ("in", "out")
+
+FRAMES = [[[0] * 256 for _ in DIRECTIONS] for _ in PEERS]
+BYTES = [[[0] * 256 for _ in DIRECTIONS] for _ in PEERS]
+
+
+def count_frame(peer: int, direction: int, command: int, size: int) -> None:
+    FRAMES[peer][direction][command] += 1
+    BYTES[peer][direction][command] += size
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        # Per bucket, not cumulative; the last one is +Inf.
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+# Indexed by an24net.scheduler.Priority.
+PRIORITIES = ("control", "output", "status", "sync")
+REQUEST_LATENCY = [Histogram() for _ in PRIORITIES]
+REQUEST_TIMEOUTS = [0] * len(PRIORITIES)
+LOOP_LAG = Histogram()
+
+
+def _labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+
+def sample(name: str, value: float, **labels: str) -> str:
+    return f"{name}{_labels(labels)} {value}"
+
+
+def histogram_samples(name: str, histogram: Histogram, **labels: str) -> list[str]:
+    lines: list[str] = []
+    cumulative = 0
+    for le, count in zip(histogram.buckets, histogram.counts, strict=False):
+        cumulative += count
+        lines.append(sample(f"{name}_bucket", cumulative, **labels, le=str(le)))
+    lines.append(sample(f"{name}_bucket", histogram.count, **labels, le="+Inf"))
+    lines.append(sample(f"{name}_sum", histogram.sum, **labels))
+    lines.append(sample(f"{name}_count", histogram.count, **labels))
+    return lines
+
+
+def collect() -> Iterable[str]:
+    """Process-wide metrics."""
+    for metric, counters in (
+        ("an24net_frames_total", FRAMES),
+        ("an24net_bytes_total", BYTES),
+    ):
+        yield f"# TYPE {metric} counter"
+        for peer, name in enumerate(PEERS):
+            for direction, direction_name in enumerate(DIRECTIONS):
+                frames = FRAMES[peer][direction]
+                for command, count in enumerate(counters[peer][direction]):
+                    if not frames[command]:
+                        continue
+                    yield sample(
+                        metric,
+                        count,
+                        peer=name,
+                        direction=direction_name,
+                        command=COMMAND_NAMES.get(command, f"0x{command:02x}"),
+                    )
+
+    yield "# TYPE an24net_request_seconds histogram"
+    for priority, name in enumerate(PRIORITIES):
+        yield from histogram_samples(
+            "an24net_request_seconds", REQUEST_LATENCY[priority], priority=name
+        )
+    yield "# TYPE an24net_request_timeouts_total counter"
+    for priority, name in enumerate(PRIORITIES):
+        yield sample(
+            "an24net_request_timeouts_total", REQUEST_TIMEOUTS[priority], priority=name
+        )
+
+    yield "# TYPE an24net_event_loop_lag_seconds histogram"
+    yield from histogram_samples("an24net_event_loop_lag_seconds", LOOP_LAG)
+
+
+async def monitor_loop_lag(interval: float = 1.0) -> None:
+    """Measure how late the event loop wakes up a sleeping task."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        LOOP_LAG.observe(max(0.0, loop.time() - start - interval))
+
+
+async def serve(port: int, *collectors: Callable[[], Iterable[str]]) -> None:
+    """Serve GET /metrics on `port` until cancelled."""
+
+    async def handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            async with asyncio.timeout(10):
+                request = await reader.readuntil(b"\r\n\r\n")
+            path = request.split(b" ", 2)[1] if request.count(b" ") >= 2 else b""
+            if path.split(b"?")[0] == b"/metrics":
+                lines = [line for c in collectors for line in c()]
+                body = ("\n".join(lines) + "\n").encode()
+                status = b"200 OK"
+            else:
+                body = b"not found\n"
+                status = b"404 Not Found"
+            writer.write(
+                b"HTTP/1.1 %s\r\n"
+                b"Content-Type: text/plain; version=0.0.4\r\n"
+                b"Content-Length: %d\r\n"
+                b"Connection: close\r\n\r\n%s" % (status, len(body), body)
+            )
+            await writer.drain()
+        except (
+            TimeoutError,
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,
+            ConnectionError,
+        ):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handler, "0.0.0.0", port)
+    _LOGGER.info("Serving metrics on 0.0.0.0:%d", port)
+    async with server:
+        await server.serve_forever()
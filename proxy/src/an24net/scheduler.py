@@ -0,0 +1,119 @@
+"""Priority scheduling of requests to a panel."""
+
+import asyncio
+import contextlib
+import time
+from collections import deque
+from collections.abc import AsyncGenerator, Hashable
+from enum import IntEnum
+
+from an24net.protocol import MY_HOME, SYNC_COMMAND, MyHomeCommands
+
+
+class Priority(IntEnum):
+    """Request classes, most urgent first."""
+
+    CONTROL = 0
+    OUTPUT = 1
+    STATUS = 2
+    SYNC = 3
+
+
+_PRIORITIES = {
+    MyHomeCommands.ARM.code: Priority.CONTROL,
+    MyHomeCommands.DISARM.code: Priority.CONTROL,
+    MyHomeCommands.PANIC.code: Priority.CONTROL,
+    MyHomeCommands.PGM.code: Priority.OUTPUT,
+    MyHomeCommands.BYPASS.code: Priority.OUTPUT,
+    MyHomeCommands.STATUS.code: Priority.STATUS,
+    SYNC_COMMAND: Priority.SYNC,
+}
+
+
+def classify(command: int, data: bytes) -> Priority:
+    if command == MY_HOME and len(data) > 5:
+        return _PRIORITIES.get(data[5], Priority.STATUS)
+    return Priority.STATUS
+
+
+class WaitStats:
+    """Time requests of one class waited for the panel."""
+
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+
+class Scheduler:
+    """Grants the panel to one request at a time.
+
+    Waiting requests are served by priority, and round-robin across
+    requesters (client connections, the upstream link) within a priority,
+    so a requester with many queued requests can't starve the others.
+    """
+
+    def __init__(self) -> None:
+        self._busy = False
+        # Per priority, the waiters of each requester in arrival order.
+        self._queues: list[dict[Hashable, deque[asyncio.Future[None]]]] = [
+            {} for _ in Priority
+        ]
+        self.wait_stats = {priority: WaitStats() for priority in Priority}
+
+    @property
+    def queued(self) -> int:
+        return sum(len(w) for queue in self._queues for w in queue.values())
+
+    @contextlib.asynccontextmanager
+    async def slot(
+        self, priority: Priority, requester: Hashable = None
+    ) -> AsyncGenerator[None]:
+        start = time.monotonic()
+        if self._busy:
+            await self._wait(priority, requester)
+        else:
+            self._busy = True
+        self.wait_stats[priority].add(time.monotonic() - start)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _wait(self, priority: Priority, requester: Hashable) -> None:
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues[priority]
+        waiters = queue.setdefault(requester, deque())
+        waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just before the cancellation: pass it on.
+                self._release()
+            else:
+                waiters.remove(future)
+                if not waiters and queue.get(requester) is waiters:
+                    del queue[requester]
+            raise
+
+    def _release(self) -> None:
+        for queue in self._queues:
+            if not queue:
+                continue
+            # The first requester is served and moves to the back.
+            requester, waiters = next(iter(queue.items()))
+            del queue[requester]
+            future = waiters.popleft()
+            if waiters:
+                queue[requester] = waiters
+            future.set_result(None)
+            return
+        self._busy = False
@@ -0,0 +1,242 @@
+"""Multi-process mode: worker processes sharing the listener, and a broker.
+
+With WORKERS > 1 the main process only supervises: it starts WORKERS
+copies of the proxy, which accept connections on the same port through
+SO_REUSEPORT, and routes clients to the worker holding their panel. A
+worker receiving a client for a panel it doesn't have passes the client
+socket to the broker (SCM_RIGHTS), which hands it to the worker that
+registered the panel's MAC, or answers CONN_NOT_FOUND itself. A panel
+registered by a second worker, after reconnecting, is evicted from the
+first one.
+
+Each worker talks to the broker over its own SOCK_SEQPACKET socket pair;
+a message is [type] [MAC*6] [CONNECTION data...], plus the client socket
+for ROUTE and HANDOFF.
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import signal
+import socket
+import sys
+from collections import deque
+from collections.abc import AsyncIterator, Callable
+
+from an24net.protocol import CONN_NOT_FOUND
+
+_LOGGER = logging.getLogger(__name__)
+
+WORKERS = int(os.environ.get("WORKERS", "1"))
+# Set by the broker in the environment of each worker.
+WORKER_FD = os.environ.get("AN24NET_WORKER_FD", "")
+WORKER_INDEX = int(os.environ.get("AN24NET_WORKER_INDEX", "0"))
+
+# Worker → broker
+REGISTER = 1
+UNREGISTER = 2
+ROUTE = 3
+# Broker → worker
+HANDOFF = 4
+EVICT = 5
+
+_MAX_MESSAGE = 1024
+
+
+async def _receive(
+    sock: socket.socket,
+) -> AsyncIterator[tuple[bytes, list[int]]]:
+    """Messages and the descriptors passed with them, until EOF."""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue[tuple[bytes, list[int]]]()
+
+    def ready() -> None:
+        while True:
+            try:
+                message, fds, _, _ = socket.recv_fds(sock, _MAX_MESSAGE, 1)
+            except BlockingIOError:
+                return
+            except OSError:
+                message, fds = b"", []
+            queue.put_nowait((message, fds))
+            if not message:
+                loop.remove_reader(sock)
+                return
+
+    loop.add_reader(sock, ready)
+    try:
+        while True:
+            message, fds = await queue.get()
+            if not message:
+                return
+            yield message, fds
+    finally:
+        loop.remove_reader(sock)
+
+
+class WorkerLink:
+    """A worker's connection to the broker."""
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        sock.setblocking(False)
+        # Called with the MAC of a panel now registered by another worker.
+        self.on_evict: Callable[[bytes], None] = lambda mac: None
+        # Messages the socket had no room for, sent once it's writable.
+        self._backlog = deque[bytes]()
+
+    def register(self, mac: bytes) -> None:
+        self._send(bytes([REGISTER, *mac]))
+
+    def unregister(self, mac: bytes) -> None:
+        self._send(bytes([UNREGISTER, *mac]))
+
+    def _send(self, message: bytes) -> None:
+        """Send `message`, after any backlog, without blocking."""
+        if not self._backlog:
+            try:
+                self.sock.send(message)
+            except BlockingIOError:
+                asyncio.get_running_loop().add_writer(self.sock, self._flush)
+            else:
+                return
+        self._backlog.append(message)
+
+    def _flush(self) -> None:
+        while self._backlog:
+            try:
+                self.sock.send(self._backlog[0])
+            except BlockingIOError:
+                return
+            except OSError:
+                # The broker is gone, there is no one left to tell.
+                self._backlog.clear()
+                break
+            self._backlog.popleft()
+        asyncio.get_running_loop().remove_writer(self.sock)
+
+    def route(self, mac: bytes, data: bytes, client: socket.socket) -> bool:
+        """Pass a client for `mac` to the broker; the caller closes its copy.
+
+        False if the broker isn't keeping up and the client wasn't passed.
+        """
+        try:
+            socket.send_fds(self.sock, [bytes([ROUTE, *mac, *data])], [client.fileno()])
+        except BlockingIOError:
+            return False
+        return True
+
+    async def handoffs(self) -> AsyncIterator[tuple[bytes, socket.socket]]:
+        """Clients handed to this worker, with their CONNECTION data.
+
+        Evictions are handled along the way, see on_evict.
+        """
+        async for message, fds in _receive(self.sock):
+            if message[0] == HANDOFF and fds:
+                yield message[7:], socket.socket(fileno=fds[0])
+            elif message[0] == EVICT:
+                self.on_evict(message[1:7])
+
+
+def connect() -> WorkerLink | None:
+    """The link to the broker, when running as a worker."""
+    if not WORKER_FD:
+        return None
+    return WorkerLink(socket.socket(fileno=int(WORKER_FD)))
+
+
+class Broker:
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self._links: dict[int, socket.socket] = {}
+        # MAC → index of the worker its panel is connected to.
+        self.panels: dict[bytes, int] = {}
+        self._stopping = False
+
+    def _handle(self, index: int, message: bytes, fds: list[int]) -> None:
+        kind, mac = message[0], message[1:7]
+        if kind == REGISTER:
+            owner = self.panels.get(mac)
+            self.panels[mac] = index
+            if owner is not None and owner != index and owner in self._links:
+                # Reconnected to another worker: the old one drops its session.
+                try:
+                    self._links[owner].send(bytes([EVICT, *mac]))
+                except OSError:
+                    _LOGGER.exception("failed to evict alarm %s", mac.hex(":"))
+        elif kind == UNREGISTER:
+            if self.panels.get(mac) == index:
+                del self.panels[mac]
+        elif kind == ROUTE and fds:
+            owner = self.panels.get(mac)
+            link = self._links.get(owner) if owner is not None else None
+            try:
+                if link is None:
+                    _LOGGER.info("no worker has alarm %s", mac.hex(":"))
+                    os.write(fds[0], bytes([CONN_NOT_FOUND]))
+                else:
+                    socket.send_fds(link, [bytes([HANDOFF, *message[1:]])], fds[:1])
+            except OSError:
+                _LOGGER.exception("failed to route client of %s", mac.hex(":"))
+        for fd in fds:
+            os.close(fd)
+
+    async def _worker(self, index: int) -> None:
+        """Run worker `index`, restarting it when it exits."""
+        while not self._stopping:
+            parent, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+            env = {
+                **os.environ,
+                "AN24NET_WORKER_FD": str(child.fileno()),
+                "AN24NET_WORKER_INDEX": str(index),
+            }
+            # One capture file and metrics port per worker.
+            if capture := os.environ.get("CAPTURE"):
+                env["CAPTURE"] = f"{capture}.{index}"
+            if metrics_port := int(os.environ.get("METRICS_PORT", "0")):
+                env["METRICS_PORT"] = str(metrics_port + index)
+            process = await asyncio.create_subprocess_exec(
+                sys.executable,
+                "-m",
+                "an24net.main",
+                pass_fds=[child.fileno()],
+                env=env,
+            )
+            child.close()
+            parent.setblocking(False)
+            self._links[index] = parent
+            _LOGGER.info("worker %d started, pid %d", index, process.pid)
+            try:
+                async for message, fds in _receive(parent):
+                    self._handle(index, message, fds)
+                await process.wait()
+            finally:
+                del self._links[index]
+                for mac in [mac for mac, i in self.panels.items() if i == index]:
+                    del self.panels[mac]
+                parent.close()
+                if process.returncode is None:
+                    process.terminate()
+                    await process.wait()
+            if not self._stopping:
+                _LOGGER.warning(
+                    "worker %d exited with %s, restarting", index, process.returncode
+                )
+                await asyncio.sleep(1)
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        assert task is not None
+
+        def stop() -> None:
+            self._stopping = True
+            task.cancel()
+
+        loop.add_signal_handler(signal.SIGINT, stop)
+        loop.add_signal_handler(signal.SIGTERM, stop)
+        with contextlib.suppress(asyncio.CancelledError):
+            async with asyncio.TaskGroup() as tg:
+                for index in range(self.workers):
+                    tg.create_task(self._worker(index))
@@ -0,0 +1,103 @@
+"""Tests for ClientAMT request handling against a scripted proxy."""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+
+import pytest
+
+from an24net.protocol import (
+    CONN_PIPELINE,
+    CONN_PROXY,
+    CONN_SUCCESS,
+    CONNECTION_COMMAND,
+    MY_HOME,
+    PROXY_COMMAND,
+    PROXY_TIMEOUT,
+    XOR_COMMAND,
+    ClientAMT,
+    FrameDecoder,
+    encode_frame,
+)
+
+type Script = Callable[[asyncio.StreamReader, asyncio.StreamWriter], Awaitable[None]]
+
+STATUS = bytes(54) + b"\x01"
+
+
+async def _with_proxy(
+    flags: int, script: Script, requests: Callable[[ClientAMT], Awaitable[None]]
+) -> None:
+    """Connect a ClientAMT to a proxy answering `flags`, then run `script`."""
+
+    async def handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        decoder = FrameDecoder()
+        assert (await decoder.read(reader))[0] == XOR_COMMAND
+        writer.write(encode_frame(0x00))
+        assert (await decoder.read(reader))[0] == CONNECTION_COMMAND
+        writer.write(bytes([CONN_SUCCESS, flags]))
+        try:
+            await script(reader, writer)
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handler, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    client = ClientAMT("127.0.0.1", port, "00:1a:3f:aa:bb:cc", "1234")
+    connected = asyncio.Event()
+    client.watch_connection(connected.set)
+    async with server:
+        task = asyncio.create_task(client.run())
+        try:
+            async with asyncio.timeout(5):
+                await connected.wait()
+                await requests(client)
+        finally:
+            task.cancel()
+
+
+async def _read_frames(reader: asyncio.StreamReader, count: int) -> list[int]:
+    decoder = FrameDecoder()
+    commands: list[int] = []
+    while len(commands) < count:
+        command, _ = await decoder.read(reader)
+        commands.append(command)
+    return commands
+
+
+def test_pipelined_proxy_timeout() -> None:
+    async def script(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # Both requests are in flight before the first is answered.
+        assert await _read_frames(reader, 2) == [MY_HOME, MY_HOME]
+        writer.write(encode_frame(PROXY_COMMAND, bytes([PROXY_TIMEOUT, MY_HOME])))
+        writer.write(encode_frame(MY_HOME, STATUS))
+        await reader.read()
+
+    async def requests(client: ClientAMT) -> None:
+        assert client.is_proxy and client.pipelined
+        pgm, status = await asyncio.gather(
+            client.pgm(), client.status(), return_exceptions=True
+        )
+        assert isinstance(pgm, TimeoutError)
+        assert not isinstance(status, BaseException)
+        assert status.upstream_push is True
+
+    asyncio.run(_with_proxy(CONN_PROXY | CONN_PIPELINE, script, requests))
+
+
+def test_proxy_without_pipelining_is_lock_step() -> None:
+    async def script(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        decoder = FrameDecoder()
+        for _ in range(2):
+            assert (await decoder.read(reader))[0] == MY_HOME
+            # The next request waits for this response.
+            with pytest.raises(TimeoutError):
+                async with asyncio.timeout(0.2):
+                    await decoder.read(reader)
+            writer.write(encode_frame(MY_HOME, STATUS))
+        await reader.read()
+
+    async def requests(client: ClientAMT) -> None:
+        assert client.is_proxy and not client.pipelined
+        await asyncio.gather(client.pgm(), client.status())
+
+    asyncio.run(_with_proxy(CONN_PROXY, script, requests))
@@ -0,0 +1,104 @@
+"""Tests for the push log and PROXY_HISTORY answers."""
+
+import os
+from pathlib import Path
+
+import pytest
+
+from an24net.history import MAGIC, RECORD, PushLog, answer_history
+from an24net.protocol import (
+    HISTORY_MAX_PUSHES,
+    PROXY_HISTORY,
+    history_request,
+    parse_history,
+)
+
+MAC = bytes.fromhex("001a3faabbcc")
+
+
+def _fill(directory: Path, count: int, index_interval: int = 4) -> list[bytes]:
+    log = PushLog(str(directory), MAC, index_interval)
+    pushes = [bytes([i]) * (i % 30 + 1) for i in range(count)]
+    for data in pushes:
+        log.append(data)
+    log.close()
+    return pushes
+
+
+def _data(log: PushLog) -> list[bytes]:
+    return [push.data for push in log.query(limit=1000)]
+
+
+def test_reopen(tmp_path: Path) -> None:
+    pushes = _fill(tmp_path, 10)
+    log = PushLog(str(tmp_path), MAC, 4)
+    assert log.seq == 10
+    assert _data(log) == pushes
+    assert log.append(b"next").seq == 11
+    assert [push.seq for push in log.query(after=8)] == [9, 10, 11]
+
+
+def test_truncated_record(tmp_path: Path) -> None:
+    pushes = _fill(tmp_path, 10)
+    path = tmp_path / f"{MAC.hex()}.log"
+    # A crash in the middle of writing the last record.
+    os.truncate(path, path.stat().st_size - 3)
+    log = PushLog(str(tmp_path), MAC, 4)
+    assert log.seq == 9
+    assert _data(log) == pushes[:9]
+    assert log.append(b"next").seq == 10
+    log.close()
+    assert _data(PushLog(str(tmp_path), MAC, 4)) == [*pushes[:9], b"next"]
+
+
+def test_corrupted_record(tmp_path: Path) -> None:
+    pushes = _fill(tmp_path, 10)
+    path = tmp_path / f"{MAC.hex()}.log"
+    data = bytearray(path.read_bytes())
+    # Flip a data byte of the last indexed record: recovery goes back to
+    # the previous index entry, and the record and everything after go.
+    offset = len(MAGIC) + sum(RECORD.size + len(push) for push in pushes[:8])
+    data[offset + RECORD.size] ^= 0xFF
+    path.write_bytes(data)
+    log = PushLog(str(tmp_path), MAC, 4)
+    assert log.seq == 8
+    assert _data(log) == pushes[:8]
+    assert path.stat().st_size == offset
+
+
+def test_stale_index(tmp_path: Path) -> None:
+    pushes = _fill(tmp_path, 10)
+    index = tmp_path / f"{MAC.hex()}.idx"
+    # Index entries pointing past a log that lost its tail.
+    os.truncate(tmp_path / f"{MAC.hex()}.log", len(MAGIC) + RECORD.size + 1)
+    assert index.stat().st_size > 0
+    log = PushLog(str(tmp_path), MAC, 4)
+    assert log.seq == 1
+    assert _data(log) == pushes[:1]
+    assert [push.seq for push in (log.append(b"x"), log.append(b"y"))] == [2, 3]
+
+
+def test_not_a_log(tmp_path: Path) -> None:
+    (tmp_path / f"{MAC.hex()}.log").write_bytes(b"something else")
+    with pytest.raises(ValueError):
+        PushLog(str(tmp_path), MAC)
+
+
+def test_answer_history_pages(tmp_path: Path) -> None:
+    pushes = _fill(tmp_path, HISTORY_MAX_PUSHES * 2)
+    log = PushLog(str(tmp_path), MAC, 4)
+    received: list[bytes] = []
+    after = 0
+    while True:
+        more, after, page = parse_history(answer_history(log, history_request(after)))
+        received += [push.data for push in page]
+        if not more:
+            break
+    assert received == pushes
+
+
+def test_answer_history_rejects_short_request() -> None:
+    response = answer_history(None, bytes([PROXY_HISTORY, 0, 0]))
+    assert response == bytes([PROXY_HISTORY])
+    with pytest.raises(ValueError):
+        parse_history(response)
@@ -0,0 +1,26 @@
+"""Tests for the LOG_LEVEL and LOG_LEVELS parsers."""
+
+import logging
+
+import pytest
+
+from an24net.log import parse_level, parse_levels
+
+
+def test_parse_levels() -> None:
+    assert parse_levels(" *00:1a:3f:aa:bb:cc*=debug, *upstream*=WARNING,") == [
+        ("*00:1a:3f:aa:bb:cc*", logging.DEBUG),
+        ("*upstream*", logging.WARNING),
+    ]
+    assert parse_levels("") == []
+
+
+@pytest.mark.parametrize("spec", ["*=VERBOSE", "DEBUG", "*upstream*=,"])
+def test_parse_levels_invalid(spec: str) -> None:
+    with pytest.raises(ValueError):
+        parse_levels(spec)
+
+
+def test_parse_level_message() -> None:
+    with pytest.raises(ValueError, match="'WARN ING'.*DEBUG"):
+        parse_level("WARN ING")
@@ -0,0 +1,119 @@
+"""Tests for the frame codec in protocol.py."""
+
+import pytest
+
+from an24net.protocol import (
+    MY_HOME,
+    OK,
+    PING_COMMAND,
+    PUSH_COMMAND,
+    SYNC_COMMAND,
+    ChecksumError,
+    FrameDecoder,
+    checksum,
+    encode_batch,
+    encode_frame,
+    parse_batch,
+)
+
+FRAMES = [
+    (MY_HOME, b"\x21\x01\x02\x03\x04\x5a\x21"),
+    (PING_COMMAND, b""),
+    (PUSH_COMMAND, bytes(range(26))),
+    (OK, b""),
+    (MY_HOME, bytes(200)),
+]
+STREAM = b"".join(encode_frame(command, data) for command, data in FRAMES)
+
+
+@pytest.mark.parametrize("size", [0, 1, 10, 57, 512, 513, 4096])
+def test_checksum(size: int) -> None:
+    data = bytes(i * 7 & 0xFF for i in range(size))
+    expected = 0xFF
+    for byte in data:
+        expected ^= byte
+    assert checksum(data) == expected
+    assert checksum(bytearray(data)) == checksum(memoryview(data)) == expected
+
+
+def test_checksum_frame() -> None:
+    frame = encode_frame(PUSH_COMMAND, bytes(range(26)))
+    assert checksum(frame[:-1]) == frame[-1]
+    assert checksum(frame) == 0
+
+
+def _decode(data: bytes, chunk: int) -> list[tuple[int, bytes, bytes]]:
+    decoder = FrameDecoder()
+    frames: list[tuple[int, bytes, bytes]] = []
+    for i in range(0, len(data), chunk):
+        decoder.feed(data[i : i + chunk])
+        frames += [
+            (command, bytes(payload), bytes(decoder.raw))
+            for command, payload in decoder
+        ]
+    return frames
+
+
+@pytest.mark.parametrize("chunk", [1, 2, 7, 64, len(STREAM)])
+def test_decoder_chunking(chunk: int) -> None:
+    assert _decode(STREAM, chunk) == [
+        (command, data, encode_frame(command, data)) for command, data in FRAMES
+    ]
+
+
+def test_decoder_keeps_partial_frame() -> None:
+    frame = encode_frame(MY_HOME, bytes(200))
+    decoder = FrameDecoder()
+    decoder.feed(frame[:-1])
+    assert len(decoder) == 0
+    decoder.feed(frame[-1:] + encode_frame(PING_COMMAND))
+    assert [(command, bytes(payload)) for command, payload in decoder] == [
+        (MY_HOME, bytes(200)),
+        (PING_COMMAND, b""),
+    ]
+
+
+def test_decoder_checksum_error_keeps_rest() -> None:
+    bad = bytearray(encode_frame(PUSH_COMMAND, b"\x01\x02"))
+    bad[-1] ^= 0xFF
+    decoder = FrameDecoder()
+    with pytest.raises(ChecksumError):
+        decoder.feed(bytes(bad) + encode_frame(PING_COMMAND))
+    decoder.feed(b"")
+    assert [command for command, _ in decoder] == [PING_COMMAND]
+
+
+def test_decoder_sync_inner_checksum() -> None:
+    frame = bytearray(encode_frame(MY_HOME, bytes([SYNC_COMMAND, 1, 2, 3])))
+    frame[-1] ^= 0xFF
+    decoder = FrameDecoder()
+    decoder.feed(bytes(frame))
+    [(command, payload)] = list(decoder)
+    assert command == MY_HOME
+    assert bytes(payload) == bytes([SYNC_COMMAND, 1, 2, 3, frame[-1]])
+
+
+@pytest.mark.parametrize("data", [bytes([0, MY_HOME]), bytes([1, MY_HOME, 0])])
+def test_decoder_short_frame(data: bytes) -> None:
+    with pytest.raises(ChecksumError):
+        FrameDecoder().feed(data)
+
+
+def test_batch_round_trip() -> None:
+    items = [bytes([i]) * 100 for i in range(8)]
+    frames = encode_batch(7, items)
+    assert len(frames) > 1
+    decoded: list[bytes] = []
+    for frame in frames:
+        batch, total, page = parse_batch(frame)
+        assert (batch, total) == (7, len(items))
+        decoded += page
+    assert decoded == items
+
+
+@pytest.mark.parametrize(
+    "data", [b"\x04\x01", b"\x04\x01\x02\x03ab", b"\x04\x01\x01\x05"]
+)
+def test_batch_truncated(data: bytes) -> None:
+    with pytest.raises(ValueError):
+        parse_batch(data)